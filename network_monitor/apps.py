@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class NetworkMonitorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'network_monitor'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .dbconfig import configure_sqlite
+        connection_created.connect(configure_sqlite, dispatch_uid='network_monitor.configure_sqlite')
@@ -0,0 +1,401 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+OVERLOAD_POLICIES = ('block', 'sample', 'spill')
+INGEST_METRICS_KEY = 'network_monitor:ingest_metrics'
+
+# A reader's position, queued behind the alerts read before it
+Mark = namedtuple('Mark', ['sink', 'position'])
+
+
+def journal_dir():
+    return os.path.join(settings.SNORT_MONITOR_STATE_DIR, 'journal')
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot journal {type(value).__name__}")
+
+
+class AlertJournal:
+    """Append-only NDJSON segments of alerts spilled while the queue is full.
+
+    Segments are replayed oldest first and deleted once every alert in
+    them has been written, so an alert may be written twice if the monitor
+    dies mid-replay, but is not lost if it dies while alerts are spilled.
+    """
+    def __init__(self, directory, segment_alerts=10000):
+        self.directory = str(directory)
+        self.segment_alerts = segment_alerts
+        self._file = None
+        self._count = 0
+        self._lock = threading.Lock()
+        self.spilled = 0
+        self.spilled_bytes = 0
+        self.replayed = 0
+        os.makedirs(self.directory, exist_ok=True)
+        segments = self.segments()
+        self._next = int(os.path.basename(segments[-1])[7:15]) + 1 if segments else 1
+
+    def segments(self):
+        return sorted(
+            os.path.join(self.directory, name) for name in os.listdir(self.directory)
+            if name.startswith('alerts-') and name.endswith('.ndjson')
+        )
+
+    def append(self, alert_data):
+        line = json.dumps(alert_data, default=_encode) + '\n'
+        with self._lock:
+            if self._file is None:
+                path = os.path.join(self.directory, f"alerts-{self._next:08d}.ndjson")
+                self._next += 1
+                self._file = open(path, 'a', encoding='utf-8')
+            self._file.write(line)
+            self._count += 1
+            self.spilled += 1
+            self.spilled_bytes += len(line)
+            if self._count >= self.segment_alerts:
+                self._close()
+
+    def sync(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def _close(self):
+        self._file.close()
+        self._file = None
+        self._count = 0
+
+    def take(self):
+        """(path, alerts) of the oldest segment, or None if nothing is spilled"""
+        with self._lock:
+            segments = self.segments()
+            if not segments:
+                return None
+            path = segments[0]
+            if self._file is not None and self._file.name == path:
+                self._close()
+        alerts = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    alert_data = json.loads(line)
+                except ValueError:
+                    # The last line may be torn if the monitor was killed mid-write
+                    continue
+                alert_data['timestamp'] = datetime.fromisoformat(alert_data['timestamp'])
+                alerts.append(alert_data)
+        return path, alerts
+
+    def done(self, path, alerts):
+        os.unlink(path)
+        self.replayed += alerts
+
+
+class IngestQueue:
+    """Bounded queue of parsed alerts between the readers and the writer thread.
+
+    Past `high_water` (a fraction of `capacity`) the overload policy
+    applies to alerts of priority 2 and below: 'block' makes the reader
+    wait, 'sample' keeps one in every 1 / `sample_rate` and sheds the rest,
+    and 'spill' appends them to the journal for replay once the queue has
+    drained. Priority 1 alerts are never shed: they keep queueing up to
+    `capacity`, after which they are spilled or the reader waits.
+    """
+    def __init__(self, capacity=50000, high_water=0.8, policy='spill', sample_rate=0.1,
+                 journal=None):
+        if policy not in OVERLOAD_POLICIES:
+            raise ValueError(f"Unknown overload policy {policy!r}")
+        if policy == 'spill' and journal is None:
+            raise ValueError('The spill policy needs a journal')
+        self.capacity = capacity
+        self.high_water = max(int(capacity * high_water), 1)
+        self.low_water = self.high_water // 2
+        self.policy = policy
+        self.keep_every = max(round(1 / sample_rate), 1) if sample_rate else 0
+        self.journal = journal
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._sampled = 0
+        self._closed = False
+        self.overloaded = False
+        self.unfinished = 0
+        self.enqueued = 0
+        self.shed = 0
+        self.max_depth = 0
+        self.blocked_seconds = 0.0
+
+    @property
+    def depth(self):
+        return len(self._items)
+
+    def put(self, alert_data):
+        with self._cond:
+            depth = len(self._items)
+            if depth >= self.high_water and not self.overloaded:
+                self.overloaded = True
+                logger.warning(f"Ingest queue reached {depth} alerts, applying {self.policy} policy")
+            if alert_data.get('priority') == 1:
+                limit = self.capacity
+            elif depth < self.high_water or self.policy == 'block':
+                limit = self.high_water
+            elif self.policy == 'sample':
+                self._sampled += 1
+                if not self.keep_every or self._sampled % self.keep_every:
+                    self.shed += 1
+                    return
+                limit = self.capacity
+            else:
+                self.journal.append(alert_data)
+                return
+            if len(self._items) >= limit:
+                if self.policy == 'spill':
+                    self.journal.append(alert_data)
+                    return
+                self._wait_below(limit)
+            self._items.append((time.monotonic(), alert_data))
+            self.unfinished += 1
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, len(self._items))
+            self._cond.notify_all()
+
+    def put_mark(self, sink, position):
+        """Queue a read position; it is never shed and never waits for room"""
+        with self._cond:
+            self._items.append((time.monotonic(), Mark(sink, position)))
+            self.unfinished += 1
+            self._cond.notify_all()
+
+    def _wait_below(self, limit):
+        started = time.monotonic()
+        self._cond.wait_for(lambda: len(self._items) < limit or self._closed)
+        self.blocked_seconds += time.monotonic() - started
+
+    def get_many(self, max_items, timeout):
+        """Up to `max_items` (enqueued at, alert) pairs, waiting `timeout` for the first"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._items or self._closed, timeout)
+            items = [self._items.popleft() for _ in range(min(max_items, len(self._items)))]
+            if self.overloaded and len(self._items) <= self.low_water:
+                self.overloaded = False
+                logger.info(f"Ingest queue drained to {len(self._items)} alerts")
+            self._cond.notify_all()
+        return items
+
+    def task_done(self, count):
+        """Mark `count` alerts taken by get_many as handed to the writer"""
+        with self._cond:
+            self.unfinished -= count
+            self._cond.notify_all()
+
+    def wait_done(self, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: not self.unfinished, timeout)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def metrics(self):
+        metrics = {
+            'policy': self.policy,
+            'depth': len(self._items),
+            'max_depth': self.max_depth,
+            'capacity': self.capacity,
+            'high_water': self.high_water,
+            'overloaded': self.overloaded,
+            'enqueued': self.enqueued,
+            'shed': self.shed,
+            'blocked_seconds': round(self.blocked_seconds, 3),
+        }
+        if self.journal is not None:
+            metrics.update({
+                'spilled': self.journal.spilled,
+                'spilled_bytes': self.journal.spilled_bytes,
+                'replayed': self.journal.replayed,
+                'journal_segments': len(self.journal.segments()),
+            })
+        return metrics
+
+
+class QueuedAlertWriter:
+    """Run an AlertBatchWriter on its own thread, fed through an IngestQueue.
+
+    It has the writer methods the monitors call, so readers only ever
+    wait on the queue and never on the database. Read positions passed to
+    `mark` travel through the queue behind the alerts read before them,
+    so they are saved only once those alerts are written or spilled.
+    Journal segments are replayed whenever the queue is below its
+    low-water mark, and batches the database refuses are spilled there
+    too rather than dropped.
+    """
+    def __init__(self, writer, queue, metrics_interval=5.0):
+        self.writer = writer
+        self.queue = queue
+        if queue.journal is not None and writer.spill is None:
+            writer.spill = self._spill
+        self.metrics_interval = metrics_interval
+        self.queue_lag = 0.0
+        self.event_lag = None
+        self._last_metrics = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='alert-writer', daemon=True)
+        self._thread.start()
+
+    @property
+    def rows_written(self):
+        return self.writer.rows_written
+
+    @property
+    def batches_written(self):
+        return self.writer.batches_written
+
+    @property
+    def coalescer(self):
+        return self.writer.coalescer
+
+    @property
+    def pending(self):
+        # Alerts leave `unfinished` only once the writer holds them, so
+        # reading it first means neither count can miss an alert
+        unfinished = self.queue.unfinished
+        return unfinished + self.writer.pending
+
+    def add(self, alert_data):
+        self.queue.put(alert_data)
+
+    def mark(self, sink, position):
+        self.queue.put_mark(sink, position)
+
+    def time_until_due(self):
+        # Come back soon to save read positions once the writer catches up
+        return self.writer.max_latency if self.pending else None
+
+    def flush_if_due(self):
+        if self.queue.journal is not None:
+            self.queue.journal.sync()
+
+    def flush(self, timeout=None):
+        """Wait until every queued alert has been written"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending and self._thread.is_alive():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            self.queue.wait_done(0.1)
+            time.sleep(0.01)
+        return not self.pending
+
+    def close(self):
+        self.flush()
+        self._stop.set()
+        self.queue.close()
+        self._thread.join()
+        if self.queue.journal is not None and self.queue.journal.segments():
+            logger.info('Spilled alerts remain in the journal and will be replayed on next start')
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                due = self.writer.time_until_due()
+                items = self.queue.get_many(self.writer.batch_size,
+                                            self.writer.max_latency if due is None else due)
+                try:
+                    try:
+                        for enqueued_at, item in items:
+                            if isinstance(item, Mark):
+                                self._mark(item)
+                            else:
+                                self.writer.add(item)
+                    finally:
+                        self.queue.task_done(len(items))
+                    self.writer.flush_if_due()
+                    alerts = [(enqueued_at, item) for enqueued_at, item in items
+                              if not isinstance(item, Mark)]
+                    if alerts:
+                        self._record_lag(alerts)
+                    if self.queue.journal is not None and self.queue.depth <= self.queue.low_water:
+                        self._replay()
+                except Exception as e:
+                    logger.error(f"Alert writer error: {e}")
+                self._publish_metrics()
+        finally:
+            self.writer.flush()
+            connections.close_all()
+
+    def _mark(self, mark):
+        # Alerts spilled before the mark must reach the journal file first
+        if self.queue.journal is not None:
+            self.queue.journal.sync()
+        self.writer.mark(mark.sink, mark.position)
+
+    def _spill(self, batch):
+        for alert_data in batch:
+            self.queue.journal.append(alert_data)
+        self.queue.journal.sync()
+
+    def _record_lag(self, items):
+        now = time.monotonic()
+        self.queue_lag = now - items[0][0]
+        newest = max(alert_data['timestamp'] for _, alert_data in items)
+        self.event_lag = (timezone.now() - newest).total_seconds()
+
+    def _replay(self):
+        taken = self.queue.journal.take()
+        if taken is None:
+            return
+        path, alerts = taken
+        self.writer.flush()
+        written = self.writer.rows_written
+        # A failed replay keeps its segment instead of spilling or retrying a copy of it
+        spill, self.writer.spill = self.writer.spill, lambda batch: None
+        try:
+            for alert_data in alerts:
+                self.writer.add(alert_data)
+            self.writer.flush()
+        finally:
+            self.writer.spill = spill
+        if self.writer.rows_written - written == len(alerts):
+            self.queue.journal.done(path, len(alerts))
+            logger.info(f"Replayed {len(alerts)} spilled alerts from {path}")
+        else:
+            logger.error(f"Replay of {path} failed, will retry")
+
+    def metrics(self):
+        metrics = self.queue.metrics()
+        metrics.update({
+            'buffered': self.writer.pending,
+            'rows_written': self.writer.rows_written,
+            'queue_lag_seconds': round(self.queue_lag, 3),
+            'event_lag_seconds': round(self.event_lag, 3) if self.event_lag is not None else None,
+            'updated_at': timezone.now().isoformat(),
+        })
+        return metrics
+
+    def _publish_metrics(self):
+        if time.monotonic() - self._last_metrics < self.metrics_interval:
+            return
+        self._last_metrics = time.monotonic()
+        try:
+            cache.set(INGEST_METRICS_KEY, self.metrics(), self.metrics_interval * 12)
+        except Exception as e:
+            logger.warning(f"Could not publish ingest metrics: {e}")
+
+
+def ingest_metrics():
+    """The latest metrics published by snort_monitor's writer, or None"""
+    return cache.get(INGEST_METRICS_KEY)
@@ -0,0 +1,147 @@
+import logging
+import re
+import subprocess
+import time
+from collections import namedtuple
+
+from .netstate import SYSFS_NET, read_netstate
+
+logger = logging.getLogger(__name__)
+
+# Linux interface names: at most 15 bytes, no slashes or whitespace
+IFNAME_RE = re.compile(r'^[A-Za-z0-9_.:@-]{1,15}$')
+
+# ip -batch reports the failing line as "Command failed -:3"
+FAILED_LINE_RE = re.compile(r'Command failed \S*:(\d+)')
+
+BridgeResult = namedtuple('BridgeResult', ['success', 'elapsed', 'ready_after', 'error'])
+
+
+def interface_names(interfaces):
+    """Names from strings or NetworkInterface objects, validated and de-duplicated"""
+    names = []
+    for iface in interfaces or ():
+        name = getattr(iface, 'name', iface)
+        if not isinstance(name, str) or not IFNAME_RE.match(name):
+            raise ValueError(f"Invalid interface name {name!r}")
+        if name not in names:
+            names.append(name)
+    return names
+
+
+def create_steps(bridge_name, interfaces):
+    """(command, undo) pairs that build a bridge; undo is None if nothing to revert"""
+    steps = [(f"link add name {bridge_name} type bridge",
+              f"link delete dev {bridge_name} type bridge")]
+    for iface in interfaces:
+        steps += [
+            (f"link set dev {iface} down", f"link set dev {iface} up"),
+            (f"link set dev {iface} master {bridge_name}", f"link set dev {iface} nomaster"),
+            (f"link set dev {iface} up", None),
+        ]
+    steps.append((f"link set dev {bridge_name} up", None))
+    return steps
+
+
+def delete_steps(bridge_name, interfaces):
+    """(command, undo) pairs that tear a bridge down"""
+    steps = [(f"link set dev {bridge_name} down", f"link set dev {bridge_name} up")]
+    for iface in interfaces:
+        steps += [
+            (f"link set dev {iface} nomaster", f"link set dev {iface} master {bridge_name}"),
+            (f"link set dev {iface} up", None),
+        ]
+    steps.append((f"link delete dev {bridge_name} type bridge", None))
+    return steps
+
+
+def rollback_commands(steps, error):
+    """Undo, newest first, the steps that ran before the one ip reported failing"""
+    match = FAILED_LINE_RE.search(error or '')
+    done = steps[:int(match.group(1)) - 1] if match else steps
+    return [undo for command, undo in reversed(done) if undo]
+
+
+class IpBatchExecutor:
+    """Run a list of ip(8) commands in one `ip -batch` process"""
+    def __init__(self, run=subprocess.run, sudo=True):
+        self.run = run
+        self.sudo = sudo
+
+    def execute(self, commands, force=False):
+        """Return None on success or the error output.
+
+        Without `force` ip stops at the first failing command; with it,
+        every command is attempted, which is what a rollback wants.
+        """
+        argv = ['sudo', 'ip'] if self.sudo else ['ip']
+        if force:
+            argv.append('-force')
+        argv += ['-batch', '-']
+        try:
+            result = self.run(argv, input='\n'.join(commands) + '\n',
+                              capture_output=True, text=True)
+        except OSError as e:
+            return str(e)
+        if result.returncode == 0:
+            return None
+        return (result.stderr or result.stdout or f"exit status {result.returncode}").strip()
+
+
+class BridgeManager:
+    """Build or tear down a bridge with one ip batch, rolling back on failure.
+
+    Time to ready is measured until sysfs shows the bridge up with every
+    port attached (or, for deletion, the bridge gone).
+    """
+    def __init__(self, executor=None, sysfs_root=SYSFS_NET, ready_timeout=10.0,
+                 poll_interval=0.05):
+        self.executor = executor or IpBatchExecutor()
+        self.sysfs_root = sysfs_root
+        self.ready_timeout = ready_timeout
+        self.poll_interval = poll_interval
+
+    def create(self, bridge_name, interfaces):
+        bridge_name, = interface_names([bridge_name])
+        ports = interface_names(interfaces)
+        return self._apply('create', bridge_name, ports, create_steps(bridge_name, ports))
+
+    def delete(self, bridge_name, interfaces):
+        bridge_name, = interface_names([bridge_name])
+        ports = interface_names(interfaces)
+        return self._apply('delete', bridge_name, ports, delete_steps(bridge_name, ports))
+
+    def _apply(self, action, bridge_name, ports, steps):
+        started = time.monotonic()
+        error = self.executor.execute([command for command, undo in steps])
+        if error is not None:
+            logger.error(f"Bridge {action} failed, rolling back: {error}")
+            rollback = rollback_commands(steps, error)
+            if rollback:
+                rollback_error = self.executor.execute(rollback, force=True)
+                if rollback_error is not None:
+                    logger.error(f"Bridge {action} rollback incomplete: {rollback_error}")
+            return BridgeResult(False, time.monotonic() - started, None, error)
+        ready = self._wait_ready(action, bridge_name, ports, started)
+        elapsed = time.monotonic() - started
+        if ready is None:
+            logger.warning(f"Bridge {bridge_name} not ready {elapsed:.2f}s after {action}")
+        else:
+            logger.info(f"Bridge {bridge_name} {action} ready after {ready:.2f}s")
+        return BridgeResult(True, elapsed, ready, None)
+
+    def _wait_ready(self, action, bridge_name, ports, started):
+        deadline = started + self.ready_timeout
+        while True:
+            state = read_netstate(self.sysfs_root)
+            bridge = state.interfaces.get(bridge_name)
+            if action == 'delete':
+                ready = bridge is None
+            else:
+                ready = (bridge is not None and bridge.operstate == 'up'
+                         and set(ports) <= set(state.bridges.get(bridge_name, ())))
+            if ready:
+                return time.monotonic() - started
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
@@ -0,0 +1,194 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+MAX_PUSHED_ALERTS = 20
+MAX_DATAGRAM = 60 * 1024
+PUSHED_ALERT_FIELDS = ('id', 'timestamp', 'priority', 'classification',
+                       'source_ip', 'destination_ip', 'message')
+
+
+def socket_dir():
+    return str(getattr(settings, 'SNORT_PUSH_SOCKET_DIR', '/run/riotdtp'))
+
+
+class Subscription:
+    """A subscriber's bounded event queue, bound to its event loop"""
+    def __init__(self, loop, max_queue):
+        self.loop = loop
+        self.queue = asyncio.Queue(max_queue)
+        self.dropped = 0
+
+    def put(self, event):
+        if self.queue.full():
+            # Slow consumers lose the oldest events rather than stall the broker
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class LocalBroker:
+    """In-process publish/subscribe for live alert events.
+
+    Subscribers are SSE responses running on the ASGI event loop. Events
+    from snort_monitor, a separate process, arrive through a Unix datagram
+    socket that this broker binds on first subscription, so no external
+    message broker is needed.
+    """
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._relay = None
+        self.published = 0
+        self.latency_count = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def subscribe(self):
+        loop = asyncio.get_running_loop()
+        self._ensure_relay(loop)
+        subscription = Subscription(loop, self.max_queue)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, event):
+        """Fan an event out to every subscriber; safe to call from any thread"""
+        self.published += 1
+        if 'published_at' in event:
+            latency = max(time.time() - event['published_at'], 0.0)
+            self.latency_count += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+            event['latency_ms'] = round(latency * 1000, 1)
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.put, event)
+
+    def metrics(self):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        return {
+            'subscribers': len(subscriptions),
+            'published': self.published,
+            'dropped': sum(subscription.dropped for subscription in subscriptions),
+            'latency_avg_ms': round(self.latency_total / self.latency_count * 1000, 1)
+                              if self.latency_count else None,
+            'latency_max_ms': round(self.latency_max * 1000, 1),
+        }
+
+    def _ensure_relay(self, loop):
+        if self._relay is not None:
+            return
+        directory = socket_dir()
+        path = os.path.join(directory, f"{os.getpid()}.sock")
+        try:
+            os.makedirs(directory, exist_ok=True)
+            if os.path.exists(path):
+                os.unlink(path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(path)
+            sock.setblocking(False)
+        except OSError as e:
+            logger.error(f"Could not listen for alert events on {path}: {e}")
+            return
+        loop.add_reader(sock.fileno(), self._receive, sock)
+        self._relay = sock
+
+    def _receive(self, sock):
+        while True:
+            try:
+                data = sock.recv(MAX_DATAGRAM)
+            except BlockingIOError:
+                return
+            try:
+                self.publish(json.loads(data))
+            except ValueError as e:
+                logger.warning(f"Ignoring malformed alert event: {e}")
+
+
+_broker = LocalBroker()
+
+
+def get_broker():
+    return _broker
+
+
+def _send(event):
+    """Deliver an event to every web worker listening for alert events"""
+    directory = socket_dir()
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith('.sock')]
+    except FileNotFoundError:
+        return
+    data = json.dumps(event, cls=DjangoJSONEncoder).encode('utf-8')
+    if len(data) > MAX_DATAGRAM:
+        logger.warning(f"Alert event of {len(data)} bytes too large to push")
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.setblocking(False)
+        for name in names:
+            path = os.path.join(directory, name)
+            try:
+                sock.sendto(data, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # The worker that bound this socket has exited
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            except BlockingIOError:
+                logger.debug(f"Alert event dropped, {path} is not keeping up")
+            except OSError as e:
+                logger.warning(f"Could not push alert event to {path}: {e}")
+
+
+def publish_alerts(batch, alerts):
+    """Push newly written alerts and the resulting stat deltas to live dashboards.
+
+    The deltas count every parsed alert in `batch`, including repeats
+    folded into existing rows; `alerts` are the new SnortAlert rows.
+    """
+    if not batch:
+        return
+    delta = {'total_alerts': len(batch), 'high_priority': 0,
+             'medium_priority': 0, 'low_priority': 0}
+    keys = {1: 'high_priority', 2: 'medium_priority', 3: 'low_priority'}
+    for alert_data in batch:
+        key = keys.get(alert_data.get('priority'))
+        if key:
+            delta[key] += 1
+    newest = sorted(alerts, key=lambda alert: alert.timestamp)[-MAX_PUSHED_ALERTS:]
+    event = {
+        'type': 'alerts',
+        'published_at': time.time(),
+        'stats_delta': delta,
+        'alerts': [
+            {field: getattr(alert, field) for field in PUSHED_ALERT_FIELDS}
+            for alert in reversed(newest)
+        ],
+    }
+    for alert in event['alerts']:
+        alert['message'] = alert['message'][:200]
+    try:
+        _send(event)
+    except OSError as e:
+        logger.warning(f"Could not push alert events: {e}")
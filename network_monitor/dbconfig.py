@@ -0,0 +1,76 @@
+import contextvars
+import logging
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+logger = logging.getLogger(__name__)
+
+WRITER_DB = 'writer'
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 268435456,
+}
+
+_writer_scope = contextvars.ContextVar('alert_writer_scope', default=False)
+
+
+def writer_alias():
+    """The dedicated alert writer database, or default if none is configured"""
+    return WRITER_DB if WRITER_DB in settings.DATABASES else DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def alert_writer():
+    """Run the block in one transaction on the alert writer connection.
+
+    Every query made in the block, through any model, is routed there.
+    """
+    token = _writer_scope.set(True)
+    try:
+        with transaction.atomic(using=writer_alias()):
+            yield
+    finally:
+        _writer_scope.reset(token)
+
+
+class AlertWriterRouter:
+    """Send queries made inside alert_writer() to the writer connection.
+
+    The writer alias is the same SQLite file opened with IMMEDIATE
+    transactions, so ingest takes the write lock when its transaction
+    begins and waits on busy_timeout instead of failing part way through.
+    Everything else keeps using the default alias.
+    """
+    def db_for_read(self, model, **hints):
+        return writer_alias() if _writer_scope.get() else None
+
+    def db_for_write(self, model, **hints):
+        return writer_alias() if _writer_scope.get() else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, WRITER_DB}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Same database as default; migrating it twice would fail
+        return False if db == WRITER_DB else None
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """connection_created hook applying SQLITE_PRAGMAS to every SQLite connection"""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_SQLITE_PRAGMAS)
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            try:
+                cursor.execute(f"PRAGMA {name} = {value}")
+            except Exception as e:
+                # journal_mode can't change while another connection is in a transaction
+                logger.warning(f"Could not set PRAGMA {name} on {connection.alias}: {e}")
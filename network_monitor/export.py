@@ -0,0 +1,187 @@
+import csv
+import io
+import json
+import zlib
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from .payloads import decode_payload
+
+EXPORT_FIELDS = ('id', 'timestamp', 'priority', 'classification', 'source_ip',
+                 'destination_ip', 'message', 'packet_data', 'gid', 'sid', 'rev',
+                 'count', 'last_seen')
+ROWS_PER_CHUNK = 1000
+ROWS_PER_BATCH = 50000
+# packet_data lives in PacketPayload and is joined in by alert_rows
+PAYLOAD_INDEX = EXPORT_FIELDS.index('packet_data')
+ALERT_FIELDS = EXPORT_FIELDS[:PAYLOAD_INDEX] + EXPORT_FIELDS[PAYLOAD_INDEX + 1:]
+
+
+def alert_rows(queryset, chunk_size=2000, payloads=True):
+    """Iterate alert tuples without building model instances or caching results.
+
+    Packet data is decompressed into its column, or left None without
+    `payloads`, which also skips the join to the payload table.
+    """
+    fields = ALERT_FIELDS + ('payload__codec', 'payload__data') if payloads else ALERT_FIELDS
+    for row in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+        if payloads:
+            row, packet_data = row[:-2], decode_payload(*row[-2:])
+        else:
+            packet_data = None
+        yield row[:PAYLOAD_INDEX] + (packet_data,) + row[PAYLOAD_INDEX:]
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ndjson_chunks(rows):
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    for batch in _batched(rows, ROWS_PER_CHUNK):
+        lines = []
+        for row in batch:
+            record = dict(zip(EXPORT_FIELDS, row))
+            record['timestamp'] = record['timestamp'].isoformat()
+            if record['last_seen'] is not None:
+                record['last_seen'] = record['last_seen'].isoformat()
+            lines.append(dumps(record))
+        lines.append('')
+        yield '\n'.join(lines).encode('utf-8')
+
+
+def csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for batch in _batched(rows, ROWS_PER_CHUNK):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _arrow_schema():
+    return pyarrow.schema([
+        ('id', pyarrow.int64()),
+        ('timestamp', pyarrow.timestamp('us', tz='UTC')),
+        ('priority', pyarrow.int32()),
+        ('classification', pyarrow.string()),
+        ('source_ip', pyarrow.string()),
+        ('destination_ip', pyarrow.string()),
+        ('message', pyarrow.string()),
+        ('packet_data', pyarrow.string()),
+        ('gid', pyarrow.int32()),
+        ('sid', pyarrow.int64()),
+        ('rev', pyarrow.int32()),
+        ('count', pyarrow.int64()),
+        ('last_seen', pyarrow.timestamp('us', tz='UTC')),
+    ])
+
+
+def _arrow_batches(rows, schema):
+    for batch in _batched(rows, ROWS_PER_BATCH):
+        columns = list(zip(*batch))
+        yield pyarrow.record_batch(
+            [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)],
+            schema=schema,
+        )
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands written bytes back to a generator"""
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def arrow_chunks(rows):
+    """Arrow IPC stream, one record batch at a time"""
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    with pyarrow.ipc.new_stream(sink, schema) as writer:
+        for batch in _arrow_batches(rows, schema):
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def parquet_chunks(rows):
+    """Parquet file written one row group at a time"""
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    with pyarrow.parquet.ParquetWriter(sink, schema, compression='zstd') as writer:
+        for batch in _arrow_batches(rows, schema):
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def gzip_chunks(chunks):
+    """Gzip a byte stream on the fly"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def accepts_gzip(accept_encoding):
+    """Whether an Accept-Encoding header allows gzip.
+
+    An explicit gzip entry wins over `*`; either is refused with q=0.
+    """
+    qualities = {}
+    for item in accept_encoding.split(','):
+        coding, *params = [part.strip() for part in item.split(';')]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    return qualities.get('gzip', qualities.get('*', 0.0)) > 0
+
+
+# format: (generator, content type, file extension, worth gzipping)
+EXPORT_FORMATS = {
+    'ndjson': (ndjson_chunks, 'application/x-ndjson', 'ndjson', True),
+    'csv': (csv_chunks, 'text/csv', 'csv', True),
+    'arrow': (arrow_chunks, 'application/vnd.apache.arrow.stream', 'arrows', True),
+    'parquet': (parquet_chunks, 'application/vnd.apache.parquet', 'parquet', False),
+}
+COLUMNAR_FORMATS = ('arrow', 'parquet')
@@ -0,0 +1,305 @@
+import logging
+import time
+from collections import Counter, OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router
+
+from .broker import publish_alerts
+from .dbconfig import alert_writer
+from .models import PacketPayload, SnortAlert
+from .payloads import encode_payload
+from .stats import invalidate_stats, update_rollups, update_rule_hits
+from .talkers import get_aggregator
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_COALESCE_FIELDS = ('message', 'source_ip', 'destination_ip')
+
+
+def build_alert(alert_data, payloads):
+    """A SnortAlert for parsed alert data, adding its payload to `payloads`"""
+    fields = dict(alert_data)
+    packet_data = fields.pop('packet_data', None)
+    if packet_data:
+        digest, codec, blob, size = encode_payload(packet_data)
+        if digest not in payloads:
+            payloads[digest] = PacketPayload(digest=digest, codec=codec, data=blob, size=size)
+        fields['payload_id'] = digest
+    row = SnortAlert(**fields)
+    row.last_seen = row.timestamp
+    row.pack_addresses()
+    return row
+
+
+def build_alerts(batch):
+    """SnortAlerts for parsed alerts, plus the distinct payloads they reference"""
+    payloads = {}
+    rows = [build_alert(alert_data, payloads) for alert_data in batch]
+    return rows, list(payloads.values())
+
+
+def add_repeats(repeats):
+    """Add coalesced repeats to saved rows, one executemany for the batch.
+
+    bulk_update would write a CASE per row for every column; incrementing
+    in place is one short statement per row, and leaves the count right
+    even if the row changed since it was read.
+    """
+    if not repeats:
+        return
+    connection = connections[router.db_for_write(SnortAlert)]
+    least, greatest = ('MIN', 'MAX') if connection.vendor == 'sqlite' else ('LEAST', 'GREATEST')
+    qn = connection.ops.quote_name
+    table, count, timestamp, last_seen, pk = (
+        qn(name) for name in (SnortAlert._meta.db_table, 'count', 'timestamp', 'last_seen', 'id'))
+    sql = (f"UPDATE {table} SET {count} = {count} + %s, "
+           f"{timestamp} = {least}({timestamp}, %s), "
+           f"{last_seen} = {greatest}(COALESCE({last_seen}, {timestamp}), %s) WHERE {pk} = %s")
+    adapt = connection.ops.adapt_datetimefield_value
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(added, adapt(first), adapt(last), row_id)
+                                 for added, first, last, row_id in repeats])
+
+
+class AlertCoalescer:
+    """Collapse repeats of an alert into one row per suppression window.
+
+    Alerts that agree on `fields` within `window` seconds of the first one
+    become a single SnortAlert whose count and last_seen grow as repeats
+    arrive. Open windows live in an LRU of at most `max_open`; a window
+    pushed out of it starts a new row on its next repeat.
+    """
+    def __init__(self, fields=DEFAULT_COALESCE_FIELDS, window=60, max_open=10000):
+        self.fields = tuple(fields)
+        self.window = timedelta(seconds=window)
+        self.max_open = max_open
+        self._open = OrderedDict()
+        self.coalesced = 0
+
+    def coalesce(self, batch):
+        """Return (new rows, payloads, repeats) for a batch.
+
+        Repeats are (alerts added, first seen, last seen, pk) for each saved
+        row that grew, ready for add_repeats.
+        """
+        rows, payloads, updated, added = [], {}, {}, Counter()
+        for alert_data in batch:
+            key = tuple(alert_data.get(field) for field in self.fields)
+            timestamp = alert_data['timestamp']
+            row = self._open.get(key)
+            if row is not None and max(row.last_seen, timestamp) - min(row.timestamp, timestamp) \
+                    <= self.window:
+                row.count += 1
+                row.timestamp = min(row.timestamp, timestamp)
+                row.last_seen = max(row.last_seen, timestamp)
+                self._open.move_to_end(key)
+                if row.pk is not None:
+                    updated[row.pk] = row
+                    added[row.pk] += 1
+                self.coalesced += 1
+                continue
+            row = build_alert(alert_data, payloads)
+            rows.append(row)
+            self._open[key] = row
+            self._open.move_to_end(key)
+            if len(self._open) > self.max_open:
+                self._open.popitem(last=False)
+        repeats = [(added[pk], row.timestamp, row.last_seen, pk) for pk, row in updated.items()]
+        return rows, list(payloads.values()), repeats
+
+    def saved(self):
+        """Forget windows whose new row got no primary key back from the insert"""
+        for key in [key for key, row in self._open.items() if row.pk is None]:
+            del self._open[key]
+
+    def reset(self):
+        """Forget every open window, e.g. after a failed write"""
+        self._open.clear()
+
+
+def coalescer_from_settings(window=None):
+    """The coalescer configured by SNORT_COALESCE_*, or None to keep raw rows"""
+    if window is None:
+        window = getattr(settings, 'SNORT_COALESCE_WINDOW', 60)
+    if not window:
+        return None
+    return AlertCoalescer(
+        fields=getattr(settings, 'SNORT_COALESCE_FIELDS', DEFAULT_COALESCE_FIELDS),
+        window=window,
+        max_open=getattr(settings, 'SNORT_COALESCE_MAX_OPEN', 10000),
+    )
+
+
+class AlertBatchWriter:
+    """Buffer parsed alerts and write them with one bulk insert per batch.
+
+    A batch is flushed when it reaches `batch_size` rows or when its oldest
+    row has waited `max_latency` seconds, whichever comes first. Throughput
+    is logged every `report_interval` seconds so batch sizes can be tuned
+    against real traffic. With a `coalescer`, repeated alerts update the
+    count on an existing row instead of adding rows. A batch that fails to
+    write is handed to `spill` if one is given; otherwise it stays buffered
+    and is retried every `retry_interval` seconds. Past `max_retained`
+    buffered alerts it is dropped, and read positions are no longer saved
+    so a restart reads the dropped alerts again. With `publish`
+    off, written batches are not pushed to dashboards, the top talker
+    sketches or the stats cache, e.g. when benchmarking.
+
+    Readers report how far they have read with `mark`; the position is
+    passed back to them once the alerts before it are stored, so they only
+    ever save read positions for alerts that can no longer be lost.
+    """
+    def __init__(self, batch_size=500, max_latency=1.0, report_interval=60, coalescer=None,
+                 spill=None, publish=True, retry_interval=5.0, max_retained=None):
+        self.batch_size = batch_size
+        self.coalescer = coalescer
+        self.spill = spill
+        self.publish = publish
+        self.max_latency = max_latency
+        self.report_interval = report_interval
+        self.retry_interval = retry_interval
+        self.max_retained = max_retained or batch_size * 100
+        self._retry_at = None
+        self._dropped = False
+        self._buffer = []
+        self._in_flight = 0
+        self._marks = {}
+        self._oldest = None
+        self.rows_written = 0
+        self.batches_written = 0
+        self._window_start = time.monotonic()
+        self._window_rows = 0
+        self._window_batches = 0
+        self._window_db_time = 0.0
+
+    @property
+    def pending(self):
+        """Alerts buffered or being written, i.e. not yet committed or spilled"""
+        return len(self._buffer) + self._in_flight
+
+    def add(self, alert_data):
+        """Queue one parsed alert, flushing if the batch is full"""
+        if not self._buffer:
+            self._oldest = time.monotonic()
+        self._buffer.append(alert_data)
+        if len(self._buffer) >= self.batch_size and self._retry_at is None:
+            self.flush()
+
+    def mark(self, sink, position):
+        """Call sink.commit(position) once every alert added so far is stored"""
+        if not self.pending:
+            self._commit_marks({sink: position})
+        else:
+            # Only the newest position per reader matters
+            self._marks[sink] = position
+
+    def _commit_marks(self, marks):
+        if self._dropped:
+            return
+        for sink, position in marks.items():
+            try:
+                sink.commit(position)
+            except Exception as e:
+                logger.error(f"Could not save read position {position}: {e}")
+
+    def time_until_due(self):
+        """Seconds until the buffered batch must be flushed, or None if empty"""
+        if not self._buffer:
+            return None
+        due = self._oldest + self.max_latency
+        if self._retry_at is not None:
+            due = max(due, self._retry_at)
+        return max(due - time.monotonic(), 0)
+
+    def flush_if_due(self):
+        if self._buffer and self.time_until_due() == 0:
+            self.flush()
+
+    def flush(self):
+        """Write every buffered alert in a single transaction"""
+        if not self._buffer:
+            return 0
+        # Counted before the buffer is emptied so pending never reads 0 early
+        self._in_flight = len(self._buffer)
+        batch, self._buffer = self._buffer, []
+        marks, self._marks = self._marks, {}
+        self._oldest = None
+        try:
+            return self._write(batch, marks)
+        finally:
+            self._in_flight = 0
+
+    def _write(self, batch, marks):
+        started = time.monotonic()
+        if self.coalescer is not None:
+            rows, payloads, updated = self.coalescer.coalesce(batch)
+        else:
+            (rows, payloads), updated = build_alerts(batch), []
+        try:
+            with alert_writer():
+                # Payloads already stored by an earlier batch are left alone
+                PacketPayload.objects.bulk_create(payloads, batch_size=self.batch_size,
+                                                  ignore_conflicts=True)
+                SnortAlert.objects.bulk_create(rows, batch_size=self.batch_size)
+                add_repeats(updated)
+                # Rollups and rule hits count every alert, coalesced or not
+                update_rollups(batch)
+                update_rule_hits(batch)
+        except Exception as e:
+            if self.spill is not None:
+                logger.error(f"Spilling batch of {len(batch)} alerts that failed to write: {e}")
+                self.spill(batch)
+                self._commit_marks(marks)
+            else:
+                self._retain(batch, marks, e)
+            if self.coalescer is not None:
+                self.coalescer.reset()
+            return 0
+        self._retry_at = None
+        if self.coalescer is not None:
+            self.coalescer.saved()
+        self._commit_marks(marks)
+        if self.publish:
+            invalidate_stats()
+            get_aggregator().add(batch)
+            publish_alerts(batch, rows)
+        self._record(len(batch), time.monotonic() - started)
+        return len(batch)
+
+    def _retain(self, batch, marks, error):
+        """Put a failed batch back in front of the buffer, or drop it if too much is held"""
+        if len(batch) + len(self._buffer) > self.max_retained:
+            # Every later position is past the dropped alerts, so none is saved again
+            logger.error(f"Dropping batch of {len(batch)} alerts after repeated failures, "
+                         f"read positions will not be saved until restart: {error}")
+            self._dropped = True
+            self._retry_at = None
+            return
+        logger.error(f"Batch of {len(batch)} alerts failed to write, retrying in "
+                     f"{self.retry_interval}s: {error}")
+        self._buffer[:0] = batch
+        self._marks = {**marks, **self._marks}
+        # Already past max_latency, so the retry waits only on retry_interval
+        self._oldest = time.monotonic() - self.max_latency
+        self._retry_at = time.monotonic() + self.retry_interval
+
+    def _record(self, rows, db_time):
+        self.rows_written += rows
+        self.batches_written += 1
+        self._window_rows += rows
+        self._window_batches += 1
+        self._window_db_time += db_time
+        elapsed = time.monotonic() - self._window_start
+        if elapsed >= self.report_interval:
+            logger.info(
+                f"Ingested {self._window_rows} alerts in {self._window_batches} batches "
+                f"over {elapsed:.1f}s ({self._window_rows / elapsed:.1f} rows/s, "
+                f"{self._window_rows / max(self._window_db_time, 1e-9):.1f} rows/s in DB)"
+            )
+            self._window_start = time.monotonic()
+            self._window_rows = 0
+            self._window_batches = 0
+            self._window_db_time = 0.0
@@ -0,0 +1,229 @@
+import fcntl
+import logging
+import os
+import socket
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .bridge import BridgeManager
+from .models import BridgeConfiguration, ControlJob
+from .netstate import get_collector
+from .utils import SnortRuleManager
+
+logger = logging.getLogger(__name__)
+
+JOB_HANDLERS = {}
+
+
+def job_handler(kind):
+    """Register a function to run jobs of `kind`; it returns a result dict"""
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def report_progress(job, message):
+    job.progress = message[:200]
+    ControlJob.objects.filter(pk=job.pk).update(progress=job.progress)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobRunner:
+    """Thread pool that runs ControlJobs outside the request.
+
+    Jobs for the same target (a bridge, or Snort itself) run one at a
+    time in submission order; within a process they queue per target,
+    and a lock file per target keeps separate worker processes apart.
+    """
+    def __init__(self, workers=2, lock_dir=None):
+        self.lock_dir = str(lock_dir or os.path.join(settings.SNORT_MONITOR_STATE_DIR, 'locks'))
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix='control-job')
+        self._queues = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, target, **params):
+        """Record a job and queue it once the surrounding transaction commits"""
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind {kind!r}")
+        job = ControlJob.objects.create(kind=kind, target=target, params=params,
+                                        worker=worker_id())
+        transaction.on_commit(lambda: self._enqueue(job.pk, target))
+        return job
+
+    def _enqueue(self, job_id, target):
+        with self._lock:
+            queue = self._queues.setdefault(target, deque())
+            queue.append(job_id)
+            if len(queue) == 1:
+                self._pool.submit(self._drain, target)
+
+    def _drain(self, target):
+        while True:
+            with self._lock:
+                job_id = self._queues[target][0]
+            try:
+                self._run(job_id)
+            except Exception as e:
+                # Raised before the handler ran, e.g. the database was locked
+                logger.exception(f"Control job {job_id} could not be run")
+                self._fail(job_id, str(e))
+            finally:
+                close_old_connections()
+                with self._lock:
+                    queue = self._queues[target]
+                    queue.popleft()
+                    done = not queue
+                    if done:
+                        del self._queues[target]
+            if done:
+                return
+
+    def _fail(self, job_id, error):
+        try:
+            ControlJob.objects.filter(
+                pk=job_id, status__in=[ControlJob.QUEUED, ControlJob.RUNNING],
+            ).update(status=ControlJob.FAILED, error=error, finished_at=timezone.now())
+        except Exception as e:
+            logger.error(f"Could not mark control job {job_id} failed: {e}")
+
+    def _run(self, job_id):
+        job = ControlJob.objects.get(pk=job_id)
+        os.makedirs(self.lock_dir, exist_ok=True)
+        lock_path = os.path.join(self.lock_dir, f"{job.target.replace('/', '_')}.lock")
+        with open(lock_path, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            job.status = ControlJob.RUNNING
+            job.started_at = timezone.now()
+            job.save(update_fields=['status', 'started_at'])
+            try:
+                job.result = JOB_HANDLERS[job.kind](job, **job.params)
+                job.status = ControlJob.SUCCEEDED if job.result.get('success', True) \
+                    else ControlJob.FAILED
+                job.error = job.result.get('error') or ''
+            except Exception as e:
+                logger.exception(f"Control job {job.pk} ({job.kind}) failed")
+                job.status = ControlJob.FAILED
+                job.error = str(e)
+            job.finished_at = timezone.now()
+            job.save(update_fields=['status', 'result', 'error', 'progress', 'finished_at'])
+        logger.info(f"Control job {job.pk} ({job.kind} on {job.target}) {job.status}")
+
+    def fail_orphaned(self):
+        """Mark unfinished jobs whose worker process on this host has died"""
+        host = socket.gethostname()
+        unfinished = ControlJob.objects.filter(
+            status__in=[ControlJob.QUEUED, ControlJob.RUNNING],
+            worker__startswith=f"{host}:",
+        )
+        for job in unfinished:
+            pid = int(job.worker.rsplit(':', 1)[1])
+            if pid != os.getpid() and not _pid_alive(pid):
+                ControlJob.objects.filter(pk=job.pk, status=job.status).update(
+                    status=ControlJob.FAILED, error='Worker exited before the job finished',
+                    finished_at=timezone.now(),
+                )
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_runner():
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+            try:
+                _runner.fail_orphaned()
+            except Exception as e:
+                logger.warning(f"Could not check for orphaned control jobs: {e}")
+    return _runner
+
+
+def bridge_target(bridge_name):
+    return f"bridge:{bridge_name}"
+
+
+def _bridge_result(result):
+    return {
+        'success': result.success,
+        'elapsed': round(result.elapsed, 3),
+        'ready_after': round(result.ready_after, 3) if result.ready_after is not None else None,
+        'error': result.error,
+    }
+
+
+@job_handler('bridge.create')
+def create_bridge(job, bridge_name, interfaces, config_id=None):
+    report_progress(job, f"Creating {bridge_name} with {', '.join(interfaces)}")
+    try:
+        result = BridgeManager().create(bridge_name, interfaces)
+    finally:
+        get_collector().invalidate()
+    if config_id is not None:
+        BridgeConfiguration.objects.filter(pk=config_id).update(is_active=result.success)
+    report_progress(job, 'Bridge ready' if result.success else 'Bridge creation rolled back')
+    return _bridge_result(result)
+
+
+@job_handler('bridge.delete')
+def delete_bridge(job, bridge_name, interfaces, config_id=None, delete_config=False):
+    report_progress(job, f"Deleting {bridge_name}")
+    try:
+        result = BridgeManager().delete(bridge_name, interfaces)
+    finally:
+        get_collector().invalidate()
+    if config_id is not None and result.success:
+        configs = BridgeConfiguration.objects.filter(pk=config_id)
+        if delete_config:
+            configs.delete()
+        else:
+            configs.update(is_active=False)
+    report_progress(job, 'Bridge deleted' if result.success else 'Bridge deletion rolled back')
+    return _bridge_result(result)
+
+
+@job_handler('rules.add')
+def add_rule(job, rule_content):
+    report_progress(job, 'Writing rules and reloading Snort')
+    manager = SnortRuleManager()
+    success = manager.add_rule(rule_content)
+    return _reload_result(manager, success)
+
+
+@job_handler('rules.remove')
+def remove_rule(job, rule_content):
+    report_progress(job, 'Writing rules and reloading Snort')
+    manager = SnortRuleManager()
+    success = manager.remove_rule(rule_content)
+    return _reload_result(manager, success)
+
+
+def _reload_result(manager, success):
+    reload = manager.controller.last_result
+    return {
+        'success': success,
+        'mode': reload.mode if reload else None,
+        'interruption': round(reload.interruption, 3)
+                        if reload and reload.interruption is not None else None,
+        'error': None if success else 'Snort failed to reload',
+    }
@@ -0,0 +1,158 @@
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+from network_monitor.dbconfig import writer_alias
+from network_monitor.ingest import AlertBatchWriter
+from network_monitor.models import SnortAlert
+from network_monitor.pagination import keyset_page
+from network_monitor.stats import approximate_alert_count, compute_stats
+
+READ_QUERIES = {
+    'dashboard_stats': compute_stats,
+    'alert_page': lambda: list(keyset_page(SnortAlert.objects.all(), None, 50).object_list),
+    'alert_count': approximate_alert_count,
+}
+
+
+def synthetic_alert(i, timestamp=None):
+    return {
+        'timestamp': timestamp or timezone.now(),
+        'priority': i % 3 + 1,
+        'classification': 'benchmark',
+        'source_ip': f"198.51.100.{i % 254 + 1}",
+        'destination_ip': f"203.0.113.{i % 7 + 1}",
+        'message': f"benchmark alert {i}",
+        'packet_data': None,
+        'gid': None,
+        'sid': None,
+        'rev': None,
+    }
+
+
+def percentile(samples, pct):
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method='inclusive')[pct - 1]
+
+
+class Command(BaseCommand):
+    help = ('Measure read latency of the dashboard and alert list queries while '
+            'alerts are ingested at a target rate, on a scratch copy of the schema')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rate', type=int, default=1000,
+                            help='Alerts per second to ingest')
+        parser.add_argument('--duration', type=float, default=30.0,
+                            help='Seconds to run for')
+        parser.add_argument('--readers', type=int, default=4,
+                            help='Threads running read queries concurrently')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Ingest batch size, as for snort_monitor')
+        parser.add_argument('--seed', type=int, default=100000,
+                            help='Alerts written before the run so reads have a table to scan')
+
+    def handle(self, *args, **options):
+        # The configured aliases are pointed at a temporary file, so nothing
+        # reaches the real database, dashboards, talker sketches or stats cache
+        aliases = {DEFAULT_DB_ALIAS, writer_alias()}
+        names = {alias: connections.settings[alias]['NAME'] for alias in aliases}
+        with tempfile.TemporaryDirectory() as directory:
+            connections.close_all()
+            for alias in aliases:
+                connections.settings[alias]['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+            try:
+                call_command('migrate', verbosity=0, interactive=False)
+                self._seed(options['seed'])
+                self._benchmark(options)
+            finally:
+                connections.close_all()
+                for alias, name in names.items():
+                    connections.settings[alias]['NAME'] = name
+
+    def _seed(self, count):
+        self.stdout.write(f"Writing {count} alerts to a scratch database...")
+        writer = AlertBatchWriter(batch_size=5000, report_interval=3600, publish=False)
+        start = timezone.now() - timedelta(days=7)
+        step = timedelta(days=7) / max(count, 1)
+        for i in range(count):
+            writer.add(synthetic_alert(i, start + step * i))
+        writer.flush()
+
+    def _benchmark(self, options):
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode, = cursor.fetchone()
+        self.stdout.write(f"journal_mode={journal_mode}, writer alias {writer_alias()!r}, "
+                          f"{options['rate']} alerts/s for {options['duration']}s, "
+                          f"{options['readers']} readers")
+
+        stop = threading.Event()
+        writer = AlertBatchWriter(batch_size=options['batch_size'], report_interval=3600,
+                                  publish=False)
+        latencies = {name: [] for name in READ_QUERIES}
+        errors = {name: 0 for name in READ_QUERIES}
+        lock = threading.Lock()
+
+        ingest = threading.Thread(target=self._ingest, args=(writer, options['rate'], stop))
+        readers = [threading.Thread(target=self._read, args=(latencies, errors, lock, stop))
+                   for _ in range(options['readers'])]
+        started = time.monotonic()
+        ingest.start()
+        for reader in readers:
+            reader.start()
+        time.sleep(options['duration'])
+        stop.set()
+        ingest.join()
+        for reader in readers:
+            reader.join()
+        elapsed = time.monotonic() - started
+
+        self.stdout.write(f"Ingested {writer.rows_written} alerts in {writer.batches_written} batches "
+                          f"({writer.rows_written / elapsed:.0f}/s)")
+        for name, samples in latencies.items():
+            samples = [sample * 1000 for sample in samples]
+            self.stdout.write(
+                f"{name}: {len(samples)} queries, p50 {percentile(samples, 50):.1f}ms, "
+                f"p95 {percentile(samples, 95):.1f}ms, p99 {percentile(samples, 99):.1f}ms, "
+                f"max {max(samples, default=0):.1f}ms, {errors[name]} errors"
+            )
+
+    def _ingest(self, writer, rate, stop):
+        sent = 0
+        started = time.monotonic()
+        try:
+            while not stop.is_set():
+                due = int((time.monotonic() - started) * rate)
+                while sent < due:
+                    writer.add(synthetic_alert(sent))
+                    sent += 1
+                writer.flush_if_due()
+                time.sleep(0.01)
+            writer.flush()
+        finally:
+            connections.close_all()
+
+    def _read(self, latencies, errors, lock, stop):
+        try:
+            while not stop.is_set():
+                for name, query in READ_QUERIES.items():
+                    started = time.perf_counter()
+                    try:
+                        query()
+                    except Exception as e:
+                        with lock:
+                            errors[name] += 1
+                        self.stderr.write(f"{name}: {e}")
+                        continue
+                    with lock:
+                        latencies[name].append(time.perf_counter() - started)
+        finally:
+            connections.close_all()
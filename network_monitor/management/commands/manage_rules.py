@@ -1,23 +1,40 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import EmptyPage, Paginator
 from network_monitor.utils import SnortRuleManager
 from network_monitor.models import SnortRule
+from network_monitor.rules import (RuleConflictError, RuleSyntaxError, filter_rules,
+                                   read_rule_lines)
 
 class Command(BaseCommand):
     help = 'Manage Snort rules'
 
     def add_arguments(self, parser):
-        parser.add_argument('action', type=str, choices=['add', 'delete', 'list'])
+        parser.add_argument('action', type=str,
+                            choices=['add', 'delete', 'list', 'import', 'sync', 'bulk-delete'])
         parser.add_argument('--rule-content', type=str, help='Rule content for add action')
-        parser.add_argument('--rule-id', type=int, help='Rule ID for delete action')
+        parser.add_argument('--rule-id', type=int, nargs='+',
+                            help='Rule ID for delete, or IDs for bulk-delete')
+        parser.add_argument('--file', type=str,
+                            help='Rules file for import, sync and bulk-delete actions')
+        parser.add_argument('--category', type=str, default='',
+                            help='Category recorded for added rules, or to filter list')
+        parser.add_argument('--force', action='store_true',
+                            help='Push rules even if they duplicate existing sids or rules')
+        parser.add_argument('--sid', type=int, help='Filter list by sid')
+        parser.add_argument('--gid', type=int, help='Filter list by gid')
+        parser.add_argument('--classtype', type=str, help='Filter list by classtype')
+        parser.add_argument('--protocol', type=str, help='Filter list by protocol')
+        parser.add_argument('--port', type=str, help='Filter list by destination port')
+        parser.add_argument('--msg', type=str, help='Filter list by message text')
+        parser.add_argument('--page', type=int, default=1)
+        parser.add_argument('--page-size', type=int, default=50)
 
     def handle(self, *args, **options):
         action = options['action']
         rule_manager = SnortRuleManager()
 
         if action == 'list':
-            rules = SnortRule.objects.all()
-            for rule in rules:
-                self.stdout.write(f"ID: {rule.id} - {rule.rule_content}")
+            self.list_rules(options)
             return
 
         if action == 'add':
@@ -25,27 +42,79 @@ class Command(BaseCommand):
             if not content:
                 self.stderr.write('Rule content is required for add action')
                 return
-            
-            success = rule_manager.add_rule(content)
+
+            try:
+                success = rule_manager.add_rule(content, options['category'], options['force'])
+            except (RuleSyntaxError, RuleConflictError) as e:
+                raise CommandError(f"Rule not added: {e}")
             if success:
-                SnortRule.objects.create(rule_content=content)
                 self.stdout.write('Rule added successfully')
             else:
                 self.stderr.write('Failed to add rule')
 
         if action == 'delete':
-            rule_id = options['rule_id']
-            if not rule_id:
+            rule_ids = options['rule_id']
+            if not rule_ids:
                 self.stderr.write('Rule ID is required for delete action')
                 return
-            
+            if len(rule_ids) > 1:
+                raise CommandError('delete takes one --rule-id; use bulk-delete to remove '
+                                   'several rules with one reload')
+
             try:
-                rule = SnortRule.objects.get(id=rule_id)
+                rule = SnortRule.objects.get(id=rule_ids[0])
                 success = rule_manager.remove_rule(rule.rule_content)
                 if success:
-                    rule.delete()
                     self.stdout.write('Rule deleted successfully')
                 else:
                     self.stderr.write('Failed to delete rule')
             except SnortRule.DoesNotExist:
-                self.stderr.write('Rule not found')
\ No newline at end of file
+                self.stderr.write('Rule not found')
+
+        if action in ('import', 'sync', 'bulk-delete'):
+            self.apply_batch(action, rule_manager, options)
+
+    def list_rules(self, options):
+        rules = filter_rules(SnortRule.objects.all(), options)
+        paginator = Paginator(rules, max(options['page_size'], 1))
+        try:
+            page = paginator.page(options['page'])
+        except EmptyPage:
+            raise CommandError(f"Page {options['page']} is out of range")
+        for rule in page:
+            self.stdout.write(f"ID: {rule.id} - {rule.gid}:{rule.sid}:{rule.rev} "
+                              f"[{rule.classtype}] {rule.rule_content}")
+        self.stdout.write(f"Page {page.number} of {paginator.num_pages} "
+                          f"({paginator.count} rules)")
+
+    def apply_batch(self, action, rule_manager, options):
+        """Apply a whole feed or deletion list with one file write and one reload"""
+        path = options['file']
+        if action in ('import', 'sync') and not path:
+            raise CommandError(f"--file is required for {action}")
+        if action == 'bulk-delete' and not (path or options['rule_id']):
+            raise CommandError('--file or --rule-id is required for bulk-delete')
+        try:
+            contents = read_rule_lines(path) if path else []
+        except OSError as e:
+            raise CommandError(f"Could not read {path}: {e}")
+
+        try:
+            with rule_manager.transaction(options['category'], options['force']) as txn:
+                if action == 'import':
+                    for content in contents:
+                        txn.add(content)
+                elif action == 'sync':
+                    txn.replace_all(contents)
+                else:
+                    if options['rule_id']:
+                        rules = SnortRule.objects.filter(id__in=options['rule_id'])
+                        contents += [rule.rule_content for rule in rules]
+                    for content in contents:
+                        txn.remove(content)
+        except (RuleSyntaxError, RuleConflictError) as e:
+            raise CommandError(f"No rules changed: {e}")
+
+        self.stdout.write(f"{len(txn.added)} rules added, {len(txn.removed)} rules removed")
+        if not txn.reloaded:
+            self.stderr.write('Rules were written but Snort failed to reload')
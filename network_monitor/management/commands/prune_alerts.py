@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from network_monitor.retention import expired_days, prune_alerts, vacuum
+
+class Command(BaseCommand):
+    help = 'Archive and delete alerts older than the retention period, one day at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            default=getattr(settings, 'SNORT_ALERT_RETENTION_DAYS', 30),
+                            help='Days of alerts to keep in the database')
+        parser.add_argument('--no-archive', action='store_true',
+                            help='Delete expired alerts without archiving them')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Alerts deleted per transaction (SNORT_PRUNE_BATCH_SIZE)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='List the days that would be pruned')
+        parser.add_argument('--vacuum', action='store_true',
+                            help='VACUUM the database afterwards to reclaim space')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            for day in expired_days(options['days']):
+                self.stdout.write(f"Would prune {day}")
+            return
+
+        total = 0
+        for result in prune_alerts(options['days'], archive=not options['no_archive'],
+                                   batch_size=options['batch_size']):
+            total += result.rows
+            if not result.rows:
+                continue
+            if result.archive:
+                self.stdout.write(f"{result.day}: {result.rows} alerts archived to "
+                                  f"{result.archive.path} ({result.archive.size} bytes)")
+            else:
+                self.stdout.write(f"{result.day}: {result.rows} alerts deleted")
+        self.stdout.write(f"Pruned {total} alerts")
+
+        if options['vacuum'] and total:
+            self.stdout.write('Vacuuming database...')
+            vacuum()
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from network_monitor.netstate import SYSFS_NET
+from network_monitor.telemetry import TelemetrySampler
+
+class Command(BaseCommand):
+    help = ('Sample interface byte, packet, drop and error counters at a fixed cadence '
+            'and publish them for the dashboard')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            default=getattr(settings, 'SNORT_TELEMETRY_INTERVAL', 1.0),
+                            help='Seconds between samples')
+        parser.add_argument('--root', type=str, default=SYSFS_NET,
+                            help='The /sys/class/net tree to read counters from')
+
+    def handle(self, *args, **options):
+        sampler = TelemetrySampler(root=options['root'], interval=options['interval'])
+        sampler.load()
+        self.stdout.write(f"Sampling interface counters every {sampler.interval}s...")
+        try:
+            sampler.run()
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping interface telemetry...')
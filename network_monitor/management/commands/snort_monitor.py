@@ -1,27 +1,103 @@
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
-from network_monitor.utils import monitor_snort_alerts
-import time
+from network_monitor.backpressure import (OVERLOAD_POLICIES, AlertJournal, IngestQueue,
+                                          QueuedAlertWriter, journal_dir)
+from network_monitor.ingest import AlertBatchWriter, coalescer_from_settings
+from network_monitor.sensors import MultiSensorMonitor, expand_alert_files
+from network_monitor.unified2 import Unified2Spool
+from network_monitor.utils import monitor_unified2_alerts
 
 class Command(BaseCommand):
     help = 'Monitor Snort alerts'
 
     def add_arguments(self, parser):
         parser.add_argument('--interval', type=int, default=10, 
-                          help='Monitoring interval in seconds')
-        parser.add_argument('--alert-file', type=str, 
-                          default='/var/log/snort/alert',
-                          help='Path to Snort alert file')
+                          help='Maximum seconds to wait for new alerts between passes')
+        parser.add_argument('--alert-file', type=str, nargs='+',
+                          default=['/var/log/snort/alert'],
+                          help='Snort alert files or globs, one per sensor')
+        parser.add_argument('--state-file', type=str,
+                          help='Where to persist the read offset of a single alert file '
+                               '(defaults to SNORT_MONITOR_STATE_DIR)')
+        parser.add_argument('--parse-workers', type=int,
+                          help='Parser processes (defaults to one per alert file, up to the CPU count)')
+        parser.add_argument('--max-in-flight', type=int, default=4,
+                          help='Chunks a single sensor may have queued before its reader blocks')
+        parser.add_argument('--unified2-dir', type=str,
+                          help='Read unified2 spool files from this directory instead of --alert-file')
+        parser.add_argument('--unified2-base', type=str, default='snort.u2',
+                          help='Spool file name prefix, as configured in the unified2 output plugin')
+        parser.add_argument('--waldo-file', type=str,
+                          help='Where to persist the unified2 bookmark (defaults to SNORT_MONITOR_STATE_DIR)')
+        parser.add_argument('--batch-size', type=int, default=500,
+                          help='Write alerts to the database in batches of this many rows')
+        parser.add_argument('--max-latency', type=float, default=1.0,
+                          help='Maximum seconds an alert may wait in a partial batch')
+        parser.add_argument('--coalesce-window', type=int,
+                          help='Fold repeats of an alert within this many seconds into one row; '
+                               '0 keeps every raw alert (defaults to SNORT_COALESCE_WINDOW)')
+        parser.add_argument('--queue-size', type=int,
+                          default=getattr(settings, 'SNORT_INGEST_QUEUE_SIZE', 50000),
+                          help='Alerts that may wait for the database writer; 0 writes from the '
+                               'reader loop as before')
+        parser.add_argument('--overload-policy', choices=OVERLOAD_POLICIES,
+                          default=getattr(settings, 'SNORT_INGEST_OVERLOAD_POLICY', 'spill'),
+                          help='What to do with priority 2+ alerts once the queue passes its '
+                               'high-water mark; priority 1 alerts are never shed')
+        parser.add_argument('--sample-rate', type=float,
+                          default=getattr(settings, 'SNORT_INGEST_SAMPLE_RATE', 0.1),
+                          help='Fraction of priority 2+ alerts kept under the sample policy')
 
     def handle(self, *args, **options):
         interval = options['interval']
-        alert_file = options['alert_file']
+        writer = AlertBatchWriter(batch_size=options['batch_size'],
+                                  max_latency=options['max_latency'],
+                                  coalescer=coalescer_from_settings(options['coalesce_window']))
+        if options['queue_size']:
+            queue = IngestQueue(options['queue_size'],
+                                high_water=getattr(settings, 'SNORT_INGEST_HIGH_WATER', 0.8),
+                                policy=options['overload_policy'],
+                                sample_rate=options['sample_rate'],
+                                journal=AlertJournal(journal_dir()))
+            writer = QueuedAlertWriter(writer, queue)
         
         self.stdout.write('Starting Snort alert monitor...')
         
         try:
-            while True:
-                monitor_snort_alerts(alert_file)
-                time.sleep(interval)
+            if options['unified2_dir']:
+                self.monitor_unified2(writer, interval, options)
+            else:
+                self.monitor_alert_files(writer, interval, options)
         except KeyboardInterrupt:
-            self.stdout.write('Stopping Snort alert monitor...')
\ No newline at end of file
+            self.stdout.write('Stopping Snort alert monitor...')
+        finally:
+            if isinstance(writer, QueuedAlertWriter):
+                writer.close()
+        self.stdout.write(f"Wrote {writer.rows_written} alerts in {writer.batches_written} batches")
+        if writer.coalescer is not None:
+            self.stdout.write(f"{writer.coalescer.coalesced} repeats were folded into existing rows")
+
+    def monitor_alert_files(self, writer, interval, options):
+        paths = expand_alert_files(options['alert_file'])
+        if not paths:
+            raise CommandError('No alert files matched')
+        if options['state_file'] and len(paths) > 1:
+            raise CommandError('--state-file can only be used with a single alert file')
+        monitor = MultiSensorMonitor(paths, writer, workers=options['parse_workers'],
+                                     max_in_flight=options['max_in_flight'],
+                                     state_file=options['state_file'])
+        self.stdout.write(f"Tailing {len(paths)} alert file(s): {', '.join(paths)}")
+        monitor.run(interval)
+
+    def monitor_unified2(self, writer, interval, options):
+        spool = Unified2Spool(options['unified2_dir'], options['unified2_base'],
+                              waldo_file=options['waldo_file'])
+        try:
+            while True:
+                monitor_unified2_alerts(spool, writer)
+                due = writer.time_until_due()
+                spool.wait(interval if due is None else min(interval, due))
+        finally:
+            writer.flush()
+            spool.close()
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NetworkInterface',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('is_bridged', models.BooleanField(default=False)),
+                ('mac_address', models.CharField(max_length=17)),
+                ('ip_address', models.GenericIPAddressField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SnortAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('priority', models.IntegerField()),
+                ('classification', models.CharField(max_length=100)),
+                ('source_ip', models.GenericIPAddressField()),
+                ('destination_ip', models.GenericIPAddressField()),
+                ('message', models.TextField()),
+                ('packet_data', models.TextField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SnortRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rule_content', models.TextField()),
+                ('is_active', models.BooleanField(default=True)),
+                ('category', models.CharField(max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BridgeConfiguration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('is_active', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('interfaces', models.ManyToManyField(to='network_monitor.networkinterface')),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network_monitor', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='snortalert',
+            index=models.Index(fields=['timestamp'], name='snortalert_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='snortalert',
+            index=models.Index(fields=['priority', 'timestamp'], name='snortalert_priority_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='snortalert',
+            index=models.Index(fields=['source_ip', 'timestamp'], name='snortalert_source_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='snortalert',
+            index=models.Index(fields=['destination_ip'], name='snortalert_destination_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:33
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncMinute
+
+
+def backfill_rollups(apps, schema_editor):
+    SnortAlert = apps.get_model('network_monitor', 'SnortAlert')
+    AlertRollup = apps.get_model('network_monitor', 'AlertRollup')
+    buckets = (SnortAlert.objects
+               .annotate(bucket=TruncMinute('timestamp'))
+               .values('bucket', 'priority', 'classification')
+               .annotate(count=Count('id'))
+               .order_by())
+    AlertRollup.objects.bulk_create(
+        (AlertRollup(**bucket) for bucket in buckets.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network_monitor', '0002_snortalert_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('priority', models.IntegerField()),
+                ('classification', models.CharField(max_length=100)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'priority', 'classification'), name='alertrollup_bucket_unique')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:39
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_rule_hashes(apps, schema_editor):
+    SnortRule = apps.get_model('network_monitor', 'SnortRule')
+    rules = list(SnortRule.objects.all())
+    for rule in rules:
+        normalized = ' '.join(rule.rule_content.split())
+        rule.rule_hash = hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+    SnortRule.objects.bulk_update(rules, ['rule_hash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network_monitor', '0003_alertrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snortrule',
+            name='rule_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=40),
+        ),
+        migrations.RunPython(backfill_rule_hashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+from network_monitor.rules import rule_fields
+
+
+def backfill_rule_fields(apps, schema_editor):
+    SnortRule = apps.get_model('network_monitor', 'SnortRule')
+    rules = []
+    for rule in SnortRule.objects.all():
+        for name, value in rule_fields(rule.rule_content).items():
+            setattr(rule, name, value)
+        rules.append(rule)
+    SnortRule.objects.bulk_update(
+        rules, ['gid', 'sid', 'rev', 'msg', 'classtype', 'protocol',
+                'source_port', 'destination_port'],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network_monitor', '0004_snortrule_rule_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snortrule',
+            name='classtype',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='snortrule',
+            name='destination_port',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='snortrule',
+            name='gid',
+            field=models.IntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='snortrule',
+            name='msg',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='snortrule',
+            name='protocol',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+        migrations.AddField(
+            model_name='snortrule',
+            name='rev',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='snortrule',
+            name='sid',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='snortrule',
+            name='source_port',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='snortrule',
+            index=models.Index(fields=['sid', 'gid'], name='snortrule_sid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='snortrule',
+            index=models.Index(fields=['classtype'], name='snortrule_classtype_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='snortrule',
+            index=models.Index(fields=['protocol', 'destination_port'], name='snortrule_proto_port_idx'),
+        ),
+        migrations.RunPython(backfill_rule_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network_monitor', '0005_snortrule_parsed_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RuleHitStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('gid', models.IntegerField()),
+                ('sid', models.IntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='snortalert',
+            name='gid',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='snortalert',
+            name='rev',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='snortalert',
+            name='sid',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='snortalert',
+            index=models.Index(fields=['sid', 'gid', 'timestamp'], name='snortalert_rule_ts_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='rulehitstat',
+            constraint=models.UniqueConstraint(fields=('bucket', 'gid', 'sid'), name='rulehitstat_bucket_unique'),
+        ),
+    ]
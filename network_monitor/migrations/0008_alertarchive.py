@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network_monitor', '0007_controljob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True)),
+                ('path', models.CharField(max_length=255, unique=True)),
+                ('format', models.CharField(max_length=10)),
+                ('rows', models.PositiveIntegerField()),
+                ('size', models.PositiveBigIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
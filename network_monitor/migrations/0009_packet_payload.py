@@ -0,0 +1,66 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from network_monitor.payloads import decode_payload, encode_payload
+
+
+def move_packet_data(apps, schema_editor):
+    SnortAlert = apps.get_model('network_monitor', 'SnortAlert')
+    PacketPayload = apps.get_model('network_monitor', 'PacketPayload')
+    payloads, alerts = {}, []
+
+    def save():
+        PacketPayload.objects.bulk_create(payloads.values(), batch_size=500,
+                                          ignore_conflicts=True)
+        SnortAlert.objects.bulk_update(alerts, ['payload'], batch_size=500)
+        payloads.clear()
+        alerts.clear()
+
+    rows = SnortAlert.objects.exclude(packet_data=None).values_list('id', 'packet_data')
+    for alert_id, packet_data in rows.iterator(chunk_size=2000):
+        digest, codec, blob, size = encode_payload(packet_data)
+        payloads[digest] = PacketPayload(digest=digest, codec=codec, data=blob, size=size)
+        alerts.append(SnortAlert(id=alert_id, payload_id=digest))
+        if len(alerts) >= 5000:
+            save()
+    save()
+
+
+def restore_packet_data(apps, schema_editor):
+    SnortAlert = apps.get_model('network_monitor', 'SnortAlert')
+    alerts = []
+    rows = SnortAlert.objects.exclude(payload=None).values_list('id', 'payload__codec', 'payload__data')
+    for alert_id, codec, blob in rows.iterator(chunk_size=2000):
+        alerts.append(SnortAlert(id=alert_id, packet_data=decode_payload(codec, blob)))
+    SnortAlert.objects.bulk_update(alerts, ['packet_data'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network_monitor', '0008_alertarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PacketPayload',
+            fields=[
+                ('digest', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('codec', models.CharField(max_length=8)),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='snortalert',
+            name='payload',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.DO_NOTHING, to='network_monitor.packetpayload'),
+        ),
+        migrations.RunPython(move_packet_data, restore_packet_data),
+        migrations.RemoveField(
+            model_name='snortalert',
+            name='packet_data',
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:51
+
+from django.db import migrations, models
+
+from network_monitor.ipindex import pack_ip
+
+PACKED_FIELDS = ['source_ip_hi', 'source_ip_lo', 'destination_ip_hi', 'destination_ip_lo']
+
+
+def backfill_packed_ips(apps, schema_editor):
+    SnortAlert = apps.get_model('network_monitor', 'SnortAlert')
+    alerts = []
+    rows = SnortAlert.objects.values_list('id', 'source_ip', 'destination_ip')
+    for alert_id, source_ip, destination_ip in rows.iterator(chunk_size=2000):
+        alert = SnortAlert(id=alert_id)
+        alert.source_ip_hi, alert.source_ip_lo = pack_ip(source_ip)
+        alert.destination_ip_hi, alert.destination_ip_lo = pack_ip(destination_ip)
+        alerts.append(alert)
+        if len(alerts) >= 5000:
+            SnortAlert.objects.bulk_update(alerts, PACKED_FIELDS, batch_size=500)
+            alerts = []
+    SnortAlert.objects.bulk_update(alerts, PACKED_FIELDS, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network_monitor', '0009_packet_payload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snortalert',
+            name='destination_ip_hi',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='snortalert',
+            name='destination_ip_lo',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='snortalert',
+            name='source_ip_hi',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='snortalert',
+            name='source_ip_lo',
+            field=models.BigIntegerField(null=True),
+        ),
+        # Backfill before indexing so the indexes are built once
+        migrations.RunPython(backfill_packed_ips, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='snortalert',
+            index=models.Index(fields=['source_ip_hi', 'source_ip_lo'], name='snortalert_src_num_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='snortalert',
+            index=models.Index(fields=['destination_ip_hi', 'destination_ip_lo'], name='snortalert_dst_num_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:53
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_last_seen(apps, schema_editor):
+    SnortAlert = apps.get_model('network_monitor', 'SnortAlert')
+    SnortAlert.objects.update(last_seen=F('timestamp'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network_monitor', '0010_snortalert_packed_ip'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='snortalert',
+            name='count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='snortalert',
+            name='last_seen',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(backfill_last_seen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('network_monitor', '0011_snortalert_coalescing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alertarchive',
+            name='last_id',
+            field=models.BigIntegerField(null=True),
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
 
+from .ipindex import pack_ip
+from .payloads import decode_payload
+
 class NetworkInterface(models.Model):
     name = models.CharField(max_length=50)
     is_bridged = models.BooleanField(default=False)
@@ -12,18 +15,151 @@ class BridgeConfiguration(models.Model):
     is_active = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+class PacketPayload(models.Model):
+    """Compressed packet data, stored once per distinct payload and keyed by its digest"""
+    digest = models.CharField(max_length=32, primary_key=True)
+    codec = models.CharField(max_length=8)
+    data = models.BinaryField()
+    size = models.PositiveIntegerField()
+
+    def text(self):
+        return decode_payload(self.codec, self.data)
+
 class SnortAlert(models.Model):
     timestamp = models.DateTimeField()
     priority = models.IntegerField()
     classification = models.CharField(max_length=100)
     source_ip = models.GenericIPAddressField()
     destination_ip = models.GenericIPAddressField()
+    # Numeric forms of the addresses for subnet range scans, see ipindex
+    source_ip_hi = models.BigIntegerField(null=True)
+    source_ip_lo = models.BigIntegerField(null=True)
+    destination_ip_hi = models.BigIntegerField(null=True)
+    destination_ip_lo = models.BigIntegerField(null=True)
     message = models.TextField()
-    packet_data = models.TextField(null=True)
+    # Shared by every alert with the same packet data; retention.prune_payloads
+    # deletes payloads once nothing refers to them
+    payload = models.ForeignKey(PacketPayload, null=True, blank=True, on_delete=models.DO_NOTHING)
+    gid = models.IntegerField(null=True)
+    sid = models.IntegerField(null=True)
+    rev = models.IntegerField(null=True)
+    # Repeats folded into this row by ingest.AlertCoalescer; timestamp is
+    # the first occurrence and last_seen the latest
+    count = models.PositiveIntegerField(default=1)
+    last_seen = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp'], name='snortalert_timestamp_idx'),
+            models.Index(fields=['sid', 'gid', 'timestamp'], name='snortalert_rule_ts_idx'),
+            models.Index(fields=['priority', 'timestamp'], name='snortalert_priority_ts_idx'),
+            models.Index(fields=['source_ip', 'timestamp'], name='snortalert_source_ts_idx'),
+            models.Index(fields=['destination_ip'], name='snortalert_destination_idx'),
+            models.Index(fields=['source_ip_hi', 'source_ip_lo'], name='snortalert_src_num_idx'),
+            models.Index(fields=['destination_ip_hi', 'destination_ip_lo'],
+                         name='snortalert_dst_num_idx'),
+        ]
+
+    def pack_addresses(self):
+        """Fill in the numeric address fields; bulk_create skips save(), so call it first"""
+        self.source_ip_hi, self.source_ip_lo = pack_ip(self.source_ip)
+        self.destination_ip_hi, self.destination_ip_lo = pack_ip(self.destination_ip)
+
+    def save(self, *args, **kwargs):
+        self.pack_addresses()
+        super().save(*args, **kwargs)
+
+    @property
+    def packet_data(self):
+        """Decompressed packet data; fetches the payload row on first use"""
+        return self.payload.text() if self.payload_id else None
+
+class AlertRollup(models.Model):
+    """Alert counts per minute, priority and classification, kept up to date at ingest"""
+    bucket = models.DateTimeField()
+    priority = models.IntegerField()
+    classification = models.CharField(max_length=100)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['bucket', 'priority', 'classification'],
+                                    name='alertrollup_bucket_unique'),
+        ]
+
+class AlertArchive(models.Model):
+    """A day of alerts moved out of SnortAlert into a compressed file by prune_alerts"""
+    day = models.DateField(db_index=True)
+    path = models.CharField(max_length=255, unique=True)
+    format = models.CharField(max_length=10)
+    rows = models.PositiveIntegerField()
+    size = models.PositiveBigIntegerField()
+    # Highest SnortAlert id in the file, so an interrupted prune doesn't archive rows twice
+    last_id = models.BigIntegerField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+class RuleHitStat(models.Model):
+    """Alerts per minute for each rule, kept up to date at ingest"""
+    bucket = models.DateTimeField()
+    gid = models.IntegerField()
+    sid = models.IntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['bucket', 'gid', 'sid'],
+                                    name='rulehitstat_bucket_unique'),
+        ]
+
+class ControlJob(models.Model):
+    """A bridge or Snort control action run in the background by jobs.JobRunner"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=50)
+    target = models.CharField(max_length=50)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.CharField(max_length=200, blank=True)
+    result = models.JSONField(null=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='controljob_status_idx'),
+        ]
 
 class SnortRule(models.Model):
     rule_content = models.TextField()
+    rule_hash = models.CharField(max_length=40, db_index=True, blank=True)
     is_active = models.BooleanField(default=True)
     category = models.CharField(max_length=50)
     created_at = models.DateTimeField(auto_now_add=True)
+    gid = models.IntegerField(default=1)
+    sid = models.IntegerField(null=True)
+    rev = models.IntegerField(null=True)
+    msg = models.CharField(max_length=255, blank=True)
+    classtype = models.CharField(max_length=100, blank=True)
+    protocol = models.CharField(max_length=10, blank=True)
+    source_port = models.CharField(max_length=100, blank=True)
+    destination_port = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sid', 'gid'], name='snortrule_sid_idx'),
+            models.Index(fields=['classtype'], name='snortrule_classtype_idx'),
+            models.Index(fields=['protocol', 'destination_port'], name='snortrule_proto_port_idx'),
+        ]
 # Create your models here.
@@ -0,0 +1,166 @@
+import logging
+import os
+import socket
+import threading
+import time
+from collections import namedtuple
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+SYSFS_NET = '/sys/class/net'
+
+InterfaceState = namedtuple('InterfaceState', [
+    'name', 'mac', 'operstate', 'carrier', 'mtu', 'master', 'is_bridge', 'ip',
+])
+NetState = namedtuple('NetState', ['interfaces', 'bridges', 'taken_at'])
+
+
+def _read(path, default=None):
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        # carrier and friends raise EINVAL while the link is down
+        return default
+
+
+def _read_int(path):
+    value = _read(path)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def read_ipv4_addresses(net_if_addrs=psutil.net_if_addrs):
+    """First IPv4 address of each interface, from one getifaddrs() call"""
+    addresses = {}
+    for name, addrs in net_if_addrs().items():
+        ip = next((addr.address for addr in addrs if addr.family == socket.AF_INET), None)
+        if ip:
+            addresses[name] = ip
+    return addresses
+
+
+def read_netstate(root=SYSFS_NET, addresses=None):
+    """Snapshot every interface and bridge under a /sys/class/net tree"""
+    addresses = addresses or {}
+    interfaces = {}
+    bridges = {}
+    try:
+        names = sorted(os.listdir(root))
+    except OSError as e:
+        logger.error(f"Could not list interfaces in {root}: {e}")
+        names = []
+    for name in names:
+        path = os.path.join(root, name)
+        master = os.path.join(path, 'master')
+        is_bridge = os.path.isdir(os.path.join(path, 'bridge'))
+        interfaces[name] = InterfaceState(
+            name=name,
+            mac=_read(os.path.join(path, 'address')),
+            operstate=_read(os.path.join(path, 'operstate'), 'unknown'),
+            carrier=_read_int(os.path.join(path, 'carrier')),
+            mtu=_read_int(os.path.join(path, 'mtu')),
+            master=os.path.basename(os.readlink(master)) if os.path.islink(master) else None,
+            is_bridge=is_bridge,
+            ip=addresses.get(name),
+        )
+        if is_bridge:
+            try:
+                bridges[name] = sorted(os.listdir(os.path.join(path, 'brif')))
+            except OSError:
+                bridges[name] = []
+    return NetState(interfaces, bridges, time.time())
+
+
+class NetStateCollector:
+    """Interface and bridge state served from a cached sysfs snapshot.
+
+    The snapshot is re-read when it is older than `ttl` seconds, and
+    start() keeps it fresh from a background thread so callers never wait
+    on a read. `root` points at /sys/class/net or a fake tree for tests.
+    """
+    def __init__(self, root=SYSFS_NET, ttl=2.0, net_if_addrs=psutil.net_if_addrs):
+        self.root = root
+        self.ttl = ttl
+        self.net_if_addrs = net_if_addrs
+        self._state = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def refresh(self):
+        try:
+            addresses = read_ipv4_addresses(self.net_if_addrs)
+        except OSError as e:
+            logger.warning(f"Could not read interface addresses: {e}")
+            addresses = {}
+        state = read_netstate(self.root, addresses)
+        self._state = state
+        return state
+
+    def snapshot(self):
+        state = self._state
+        if state is not None and time.time() - state.taken_at < self.ttl:
+            return state
+        with self._lock:
+            # Another caller may have refreshed while we waited
+            state = self._state
+            if state is None or time.time() - state.taken_at >= self.ttl:
+                state = self.refresh()
+        return state
+
+    def invalidate(self):
+        """Forget the snapshot, e.g. after reconfiguring a bridge"""
+        self._state = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='netstate', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.ttl / 2):
+            try:
+                with self._lock:
+                    self.refresh()
+            except Exception as e:
+                logger.error(f"Could not refresh interface state: {e}")
+
+    def bridge_status(self, bridge_name='br0'):
+        state = self.snapshot()
+        bridge = state.interfaces.get(bridge_name)
+        if bridge is None or not bridge.is_bridge:
+            return {'active': False, 'interfaces': []}
+        return {
+            'active': True,
+            'interfaces': state.bridges.get(bridge_name, []),
+            'operstate': bridge.operstate,
+        }
+
+    def interfaces(self, include_loopback=False):
+        return [
+            iface for name, iface in self.snapshot().interfaces.items()
+            if include_loopback or name != 'lo'
+        ]
+
+
+_collector = None
+_collector_lock = threading.Lock()
+
+
+def get_collector():
+    """The process-wide collector, refreshed in the background"""
+    global _collector
+    with _collector_lock:
+        if _collector is None:
+            _collector = NetStateCollector()
+            _collector.start()
+    return _collector
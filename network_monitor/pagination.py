@@ -0,0 +1,108 @@
+import base64
+import binascii
+from collections import namedtuple
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+KeysetPage = namedtuple('KeysetPage', ['object_list', 'next_cursor', 'previous_cursor'])
+
+
+def encode_cursor(direction, obj):
+    """Opaque cursor pointing just past `obj` in the given direction"""
+    raw = f"{direction}|{obj.timestamp.isoformat()}|{obj.pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (direction, timestamp, pk), raising ValueError if malformed"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        direction, timestamp, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+    except (TypeError, UnicodeDecodeError, binascii.Error):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    if direction not in ('n', 'p'):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    return direction, datetime.fromisoformat(timestamp), int(pk)
+
+
+def keyset_page(queryset, cursor=None, page_size=50):
+    """Return one page of `queryset` ordered newest first by (timestamp, id).
+
+    Pages are found with an indexed range condition on the last row seen
+    rather than OFFSET, so deep pages cost the same as the first one.
+    """
+    newest_first = queryset.order_by('-timestamp', '-id')
+    direction = 'n'
+    if cursor is None:
+        rows = list(newest_first[:page_size + 1])
+    else:
+        direction, timestamp, pk = decode_cursor(cursor)
+        if direction == 'n':
+            rows = list(newest_first.filter(
+                Q(timestamp__lt=timestamp) | Q(id__lt=pk), timestamp__lte=timestamp,
+            )[:page_size + 1])
+        else:
+            rows = list(queryset.order_by('timestamp', 'id').filter(
+                Q(timestamp__gt=timestamp) | Q(id__gt=pk), timestamp__gte=timestamp,
+            )[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == 'p':
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, cursor is not None
+    return KeysetPage(
+        rows,
+        encode_cursor('n', rows[-1]) if rows and has_next else None,
+        encode_cursor('p', rows[0]) if rows and has_previous else None,
+    )
+
+
+class AlertCursorPagination(BasePagination):
+    """Keyset pagination over (timestamp, id) for alert API endpoints.
+
+    Responses carry an approximate total from the rollup table instead of
+    running COUNT(*) over the alert table.
+    """
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.approximate_count = getattr(view, 'approximate_count', lambda: None)()
+        try:
+            page = keyset_page(queryset, request.query_params.get(self.cursor_query_param),
+                               self.get_page_size(request))
+        except ValueError:
+            raise NotFound('Invalid cursor')
+        self.page = page
+        return page.object_list
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self._link(self.page.next_cursor),
+            'previous': self._link(self.page.previous_cursor),
+            'approximate_count': self.approximate_count,
+            'results': data,
+        })
@@ -0,0 +1,234 @@
+import re
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+# 01/15-10:23:45.123456  [**] [1:1000001:1] Message [**] [Classification: x] [Priority: 2] {TCP} 10.0.0.1:1234 -> 10.0.0.2:80
+FAST_ALERT_RE = re.compile(
+    r'(?P<timestamp>\d\d/\d\d(?:/\d\d)?-\d\d:\d\d:\d\d\.\d+)\s+'
+    r'\[\*\*\]\s+\[(?P<gid>\d+):(?P<sid>\d+):(?P<rev>\d+)\]\s+(?P<message>.*?)\s+\[\*\*\]'
+    r'(?:\s+\[Classification:\s*(?P<classification>[^\]]*)\])?'
+    r'(?:\s+\[Priority:\s*(?P<priority>\d+)\])?'
+    r'\s+\{(?P<protocol>[^}]*)\}\s+(?P<source>\S+)\s+->\s+(?P<destination>\S+)'
+)
+
+# Full alerts span several lines and end with a blank line:
+#   [**] [1:1000001:1] Message [**]
+#   [Classification: x] [Priority: 2]
+#   01/15-10:23:45.123456 10.0.0.1:1234 -> 10.0.0.2:80
+#   TCP TTL:64 TOS:0x0 ID:1 IpLen:20 DgmLen:60 DF
+#   ...
+FULL_HEADER_RE = re.compile(
+    r'\[\*\*\]\s+\[(?P<gid>\d+):(?P<sid>\d+):(?P<rev>\d+)\]\s+(?P<message>.*?)\s+\[\*\*\]'
+)
+FULL_PRIORITY_RE = re.compile(
+    r'(?:\[Classification:\s*(?P<classification>[^\]]*)\]\s*)?\[Priority:\s*(?P<priority>\d+)\]'
+)
+FULL_ADDRESS_RE = re.compile(
+    r'(?P<timestamp>\d\d/\d\d(?:/\d\d)?-\d\d:\d\d:\d\d\.\d+)\s+'
+    r'(?P<source>\S+)\s+->\s+(?P<destination>\S+)(?P<link>\s+type:0x)?'
+)
+FULL_LINK_ADDRESS_RE = re.compile(r'(?P<source>\S+)\s+->\s+(?P<destination>\S+)')
+
+DEFAULT_PRIORITY = 3
+
+
+def split_endpoint(endpoint):
+    """Split a Snort `addr[:port]` token into its address and port"""
+    if endpoint.startswith('['):
+        address, _, port = endpoint[1:].partition(']')
+        return address, port.lstrip(':') or None
+    colons = endpoint.count(':')
+    if colons == 0:
+        return endpoint, None
+    if colons == 1:
+        address, _, port = endpoint.partition(':')
+        return address, port
+    # Snort 2 appends the port to IPv6 addresses without brackets
+    address, _, port = endpoint.rpartition(':')
+    if port.isdigit() and not address.endswith(':'):
+        return address, port
+    return endpoint, None
+
+
+class TimestampDecoder:
+    """Decode Snort `MM/DD[/YY]-HH:MM:SS.ffffff` timestamps.
+
+    Alerts arrive in bursts within the same second, so the datetime for the
+    whole-second prefix is cached and only the fraction is decoded per line.
+    Timestamps without a year are placed in the most recent matching year,
+    so 02/29 goes to the last leap year. Dates that don't exist raise
+    ValueError.
+    """
+    def __init__(self, tz=None):
+        self.tz = tz or timezone.get_default_timezone()
+        self._prefix = None
+        self._base = None
+
+    def __call__(self, value):
+        prefix, _, fraction = value.partition('.')
+        if prefix != self._prefix:
+            self._base = self._decode_prefix(prefix)
+            self._prefix = prefix
+        return self._base.replace(microsecond=int(fraction[:6].ljust(6, '0')))
+
+    def _decode_prefix(self, prefix):
+        month, day = int(prefix[0:2]), int(prefix[3:5])
+        if prefix[5] == '/':
+            year, clock = 2000 + int(prefix[6:8]), prefix[9:]
+        else:
+            year, clock = None, prefix[6:]
+        hour, minute, second = int(clock[0:2]), int(clock[3:5]), int(clock[6:8])
+        if year is not None:
+            return datetime(year, month, day, hour, minute, second, tzinfo=self.tz)
+        now = timezone.now().astimezone(self.tz)
+        year = now.year
+        while True:
+            try:
+                value = datetime(year, month, day, hour, minute, second, tzinfo=self.tz)
+            except ValueError:
+                # Leap years can be eight apart across a century
+                if (month, day) != (2, 29) or now.year - year >= 8:
+                    raise
+                year -= 1
+                continue
+            if value <= now + timedelta(days=1):
+                return value
+            year -= 1
+
+
+class SnortAlertParser:
+    """Parse Snort fast-alert and full-alert output into SnortAlert fields.
+
+    Fast alerts are one line each. Full alerts span several lines, so a
+    parser keeps an unfinished record between calls to `parse_many`;
+    call `flush` to emit it once no more input is expected.
+    """
+    def __init__(self, tz=None):
+        self.decode_timestamp = TimestampDecoder(tz)
+        self._pending = None
+
+    def parse_line(self, line):
+        """Parse a single fast-alert line, returning None if it doesn't match"""
+        match = FAST_ALERT_RE.match(line)
+        if match is None:
+            return None
+        try:
+            timestamp = self.decode_timestamp(match.group('timestamp'))
+        except ValueError:
+            return None
+        source_ip, _ = split_endpoint(match.group('source'))
+        destination_ip, _ = split_endpoint(match.group('destination'))
+        priority = match.group('priority')
+        return {
+            'timestamp': timestamp,
+            'priority': int(priority) if priority else DEFAULT_PRIORITY,
+            'classification': match.group('classification') or '',
+            'source_ip': source_ip,
+            'destination_ip': destination_ip,
+            'message': match.group('message').strip('"'),
+            'packet_data': None,
+            'gid': int(match.group('gid')),
+            'sid': int(match.group('sid')),
+            'rev': int(match.group('rev')),
+        }
+
+    def parse_many(self, lines):
+        """Yield an alert dict for every complete alert in `lines`"""
+        pending = self._pending
+        for line in lines:
+            if pending is not None:
+                if not line.strip():
+                    alert = self._parse_full(pending)
+                    pending = None
+                    if alert:
+                        yield alert
+                    continue
+                if not line.startswith('[**]'):
+                    pending.append(line)
+                    continue
+                alert = self._parse_full(pending)
+                pending = None
+                if alert:
+                    yield alert
+            if line.startswith('[**]'):
+                pending = [line]
+                continue
+            alert = self.parse_line(line)
+            if alert:
+                yield alert
+        self._pending = pending
+
+    def flush(self):
+        """Return the unfinished full alert, if any, and forget it"""
+        pending, self._pending = self._pending, None
+        return self._parse_full(pending) if pending else None
+
+    def _parse_full(self, lines):
+        header = FULL_HEADER_RE.match(lines[0])
+        if header is None:
+            return None
+        body = lines[1:]
+        classification, priority = '', DEFAULT_PRIORITY
+        if body:
+            match = FULL_PRIORITY_RE.match(body[0])
+            if match:
+                classification = match.group('classification') or ''
+                priority = int(match.group('priority'))
+                body = body[1:]
+        if not body:
+            return None
+        address = FULL_ADDRESS_RE.match(body[0])
+        if address is None:
+            return None
+        try:
+            timestamp = self.decode_timestamp(address.group('timestamp'))
+        except ValueError:
+            return None
+        body = body[1:]
+        source, destination = address.group('source'), address.group('destination')
+        if address.group('link') and body:
+            # -e output puts MAC addresses first and the IPs on the next line
+            link = FULL_LINK_ADDRESS_RE.match(body[0])
+            if link is None:
+                return None
+            source, destination = link.group('source'), link.group('destination')
+            body[0] = body[0][link.end():].lstrip()
+        source_ip, _ = split_endpoint(source)
+        destination_ip, _ = split_endpoint(destination)
+        return {
+            'timestamp': timestamp,
+            'priority': priority,
+            'classification': classification,
+            'source_ip': source_ip,
+            'destination_ip': destination_ip,
+            'message': header.group('message').strip('"'),
+            'packet_data': '\n'.join(body) or None,
+            'gid': int(header.group('gid')),
+            'sid': int(header.group('sid')),
+            'rev': int(header.group('rev')),
+        }
+
+
+def split_records(lines):
+    """Split lines into complete alerts and a trailing unfinished full alert"""
+    for index in range(len(lines) - 1, -1, -1):
+        line = lines[index]
+        if not line.strip():
+            break
+        if line.startswith('[**]'):
+            return lines[:index], lines[index:]
+    return lines, []
+
+
+def parse_many(lines, tz=None):
+    """Parse an iterable of alert-file lines, returning a list of alert dicts.
+
+    This is a plain module-level function so it can run in worker processes.
+    """
+    parser = SnortAlertParser(tz)
+    alerts = list(parser.parse_many(lines))
+    last = parser.flush()
+    if last:
+        alerts.append(last)
+    return alerts
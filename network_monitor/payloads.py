@@ -0,0 +1,54 @@
+import hashlib
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Payloads this small are stored as-is; compression would only add overhead
+MIN_COMPRESS_SIZE = 64
+
+
+def payload_digest(data):
+    """Content address of a payload: 128-bit BLAKE2b of its bytes, as hex"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def compress_payload(data):
+    """Return (codec, blob) for `data`, using zstd when available, else zlib"""
+    if len(data) >= MIN_COMPRESS_SIZE:
+        if zstandard is not None:
+            codec, blob = 'zstd', zstandard.ZstdCompressor(level=3).compress(data)
+        else:
+            codec, blob = 'zlib', zlib.compress(data, 6)
+        if len(blob) < len(data):
+            return codec, blob
+    return 'raw', data
+
+
+def decompress_payload(codec, blob):
+    blob = bytes(blob)
+    if codec == 'raw':
+        return blob
+    if codec == 'zlib':
+        return zlib.decompress(blob)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('Reading zstd payloads requires zstandard')
+        return zstandard.ZstdDecompressor().decompress(blob)
+    raise ValueError(f"Unknown payload codec {codec!r}")
+
+
+def decode_payload(codec, blob):
+    """Packet data text for a stored payload, None if there is none"""
+    if blob is None:
+        return None
+    return decompress_payload(codec, blob).decode('utf-8')
+
+
+def encode_payload(text):
+    """(digest, codec, blob, size) for packet data text"""
+    data = text.encode('utf-8')
+    codec, blob = compress_payload(data)
+    return payload_digest(data), codec, blob, len(data)
@@ -0,0 +1,212 @@
+import gzip
+import json
+import logging
+import os
+from collections import namedtuple
+from datetime import datetime, time as datetime_time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .dbconfig import alert_writer
+from .export import EXPORT_FIELDS, alert_rows, gzip_chunks, ndjson_chunks, parquet_chunks, pyarrow
+from .models import AlertArchive, PacketPayload, SnortAlert
+
+logger = logging.getLogger(__name__)
+
+PruneResult = namedtuple('PruneResult', ['day', 'rows', 'archive'])
+# Fields that can be filtered on when querying an archive
+ARCHIVE_FILTERS = ('priority', 'classification', 'source_ip', 'destination_ip', 'gid', 'sid')
+INTEGER_FILTERS = ('priority', 'gid', 'sid')
+
+
+class ArchiveMissingError(FileNotFoundError):
+    """An AlertArchive whose file has been deleted or moved"""
+
+
+def archive_dir():
+    return str(getattr(settings, 'SNORT_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'var', 'archive')))
+
+
+def archive_format():
+    return 'parquet' if pyarrow is not None else 'ndjson.gz'
+
+
+def day_range(day):
+    """[start, end) of a UTC day, the unit alerts are archived and pruned in"""
+    start = datetime.combine(day, datetime_time.min, tzinfo=dt_timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def expired_days(retention_days, now=None):
+    """UTC days holding alerts older than the retention period, oldest first"""
+    now = now or timezone.now()
+    cutoff = (now - timedelta(days=retention_days)).astimezone(dt_timezone.utc).date()
+    oldest = SnortAlert.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+    if oldest is None:
+        return []
+    day = oldest.astimezone(dt_timezone.utc).date()
+    days = []
+    while day < cutoff:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def day_alerts(day):
+    start, end = day_range(day)
+    return SnortAlert.objects.filter(timestamp__gte=start, timestamp__lt=end)
+
+
+def _archive_path(day, extension):
+    directory = archive_dir()
+    base = os.path.join(directory, f"alerts-{day.isoformat()}")
+    path, part = f"{base}.{extension}", 1
+    # Alerts that arrive late for an archived day go into another part
+    while os.path.exists(path) or AlertArchive.objects.filter(path=path).exists():
+        part += 1
+        path = f"{base}-{part}.{extension}"
+    return path
+
+
+def write_archive(day, alerts):
+    """Write a day's `alerts` to a compressed file, returning (path, rows)"""
+    os.makedirs(archive_dir(), exist_ok=True)
+    extension = archive_format()
+    path = _archive_path(day, extension)
+    counted = [0]
+
+    def rows():
+        for row in alert_rows(alerts.order_by('timestamp', 'id')):
+            counted[0] += 1
+            yield row
+
+    chunks = parquet_chunks(rows()) if extension == 'parquet' else gzip_chunks(ndjson_chunks(rows()))
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return path, counted[0]
+
+
+def prune_batch_size():
+    return getattr(settings, 'SNORT_PRUNE_BATCH_SIZE', 5000)
+
+
+def delete_in_batches(alerts, batch_size):
+    """Delete `alerts` one id range at a time, each in its own writer transaction.
+
+    A batch holds the write lock only while it deletes `batch_size` rows,
+    so ingest waits on one batch instead of the whole day.
+    """
+    deleted = 0
+    while True:
+        ids = list(alerts.order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with alert_writer():
+            count, _ = alerts.filter(id__gte=ids[0], id__lte=ids[-1]).delete()
+        deleted += count
+
+
+def prune_day(day, archive=True, batch_size=None):
+    """Archive a day of alerts if asked, then delete it in bounded batches.
+
+    The archive records the last id it holds; a prune interrupted part way
+    through deletes those rows on the next run rather than archiving them
+    again.
+    """
+    # Alerts that arrive while the day is archived wait for the next run
+    last = day_alerts(day).order_by('-id').values_list('id', flat=True).first()
+    if last is None:
+        return PruneResult(day, 0, None)
+    alerts = day_alerts(day).filter(id__lte=last)
+    record = None
+    if archive:
+        record = AlertArchive.objects.filter(day=day, last_id__isnull=False) \
+            .order_by('-last_id').first()
+        unarchived = alerts.filter(id__gt=record.last_id) if record else alerts
+        if unarchived.exists():
+            path, rows = write_archive(day, unarchived)
+            with alert_writer():
+                record = AlertArchive.objects.create(day=day, path=path, format=archive_format(),
+                                                     rows=rows, size=os.path.getsize(path),
+                                                     last_id=last)
+    deleted = delete_in_batches(alerts, batch_size or prune_batch_size())
+    logger.info(f"Pruned {deleted} alerts from {day}" +
+                (f", archived to {record.path}" if record else ''))
+    return PruneResult(day, deleted, record)
+
+
+def prune_payloads():
+    """Delete packet payloads no remaining alert refers to"""
+    deleted, _ = PacketPayload.objects.filter(snortalert__isnull=True).delete()
+    if deleted:
+        logger.info(f"Deleted {deleted} unreferenced packet payloads")
+    return deleted
+
+
+def prune_alerts(retention_days, archive=True, batch_size=None):
+    """Archive and delete every expired day, yielding a PruneResult per day"""
+    pruned = False
+    for day in expired_days(retention_days):
+        result = prune_day(day, archive, batch_size)
+        pruned = pruned or result.rows > 0
+        yield result
+    if pruned:
+        prune_payloads()
+
+
+def vacuum():
+    """Return the space freed by pruning to the filesystem (SQLite only)"""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM')
+
+
+def _matches(record, filters):
+    return all(record.get(field) == value for field, value in filters.items())
+
+
+def query_archive(archive, filters=None, limit=100):
+    """Rows from an archive file matching exact-value `filters`, as dicts"""
+    filters = {
+        field: int(value) if field in INTEGER_FILTERS else value
+        for field, value in (filters or {}).items()
+        if field in ARCHIVE_FILTERS and value not in (None, '')
+    }
+    try:
+        return _read_archive(archive, filters, limit)
+    except FileNotFoundError:
+        raise ArchiveMissingError(f"Archive file {archive.path} is missing")
+
+
+def _read_archive(archive, filters, limit):
+    if archive.format == 'parquet':
+        if pyarrow is None:
+            raise RuntimeError('Reading parquet archives requires pyarrow')
+        # Archives written before a column was added simply lack it
+        names = pyarrow.parquet.read_schema(archive.path).names
+        table = pyarrow.parquet.read_table(
+            archive.path, columns=[field for field in EXPORT_FIELDS if field in names],
+            filters=[(field, '=', value) for field, value in filters.items()] or None,
+        )
+        return table.slice(0, limit).to_pylist()
+    results = []
+    with gzip.open(archive.path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if _matches(record, filters):
+                results.append(record)
+                if len(results) >= limit:
+                    break
+    return results
@@ -0,0 +1,499 @@
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from collections import namedtuple
+
+from django.db import transaction
+
+from .models import SnortRule
+
+logger = logging.getLogger(__name__)
+
+# Snort 3 service rules ("alert http (...)") have no addresses or ports
+RULE_RE = re.compile(
+    r'^(?P<action>\w+)\s+(?P<protocol>\w+)\s+'
+    r'(?:(?P<source>\S+)\s+(?P<source_port>\S+)\s+(?P<direction>->|<>)\s+'
+    r'(?P<destination>\S+)\s+(?P<destination_port>\S+)\s*)?'
+    r'\((?P<options>.*)\)$'
+)
+# Options that describe a rule rather than what it matches
+METADATA_OPTIONS = {'msg', 'sid', 'rev', 'gid', 'classtype', 'priority',
+                    'reference', 'metadata'}
+# Rule hashes per query when syncing, below SQLite's bound-parameter limit
+SYNC_CHUNK_SIZE = 500
+
+ParsedRule = namedtuple('ParsedRule', [
+    'action', 'protocol', 'source', 'source_port', 'direction', 'destination',
+    'destination_port', 'gid', 'sid', 'rev', 'msg', 'classtype', 'options',
+])
+RuleConflict = namedtuple('RuleConflict', ['kind', 'rule', 'other'])
+
+
+class RuleSyntaxError(ValueError):
+    pass
+
+
+class RuleConflictError(Exception):
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super().__init__('; '.join(describe_conflict(conflict) for conflict in conflicts))
+
+
+def normalize_rule(content):
+    return ' '.join(content.split())
+
+
+def rule_hash(content):
+    """Identity of a rule, ignoring whitespace differences"""
+    return hashlib.sha1(normalize_rule(content).encode('utf-8')).hexdigest()
+
+
+def is_rule_line(line):
+    stripped = line.strip()
+    return bool(stripped) and not stripped.startswith('#')
+
+
+def read_rule_lines(path):
+    """Rule lines from a rules file, skipping comments and blank lines"""
+    with open(path, 'r') as f:
+        return [line.strip() for line in f if is_rule_line(line)]
+
+
+class RuleSet:
+    """The lines of a rules file, with rules indexed by hash.
+
+    Comments and blank lines keep their place so the file round-trips;
+    adding and removing a rule are dictionary operations.
+    """
+    def __init__(self, lines=()):
+        self.entries = {}
+        for n, line in enumerate(lines):
+            line = line.rstrip('\n')
+            if is_rule_line(line):
+                self.entries.setdefault(rule_hash(line), line.strip())
+            else:
+                self.entries[('line', n)] = line
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, 'r') as f:
+                return cls(f)
+        except FileNotFoundError:
+            return cls()
+
+    def rules(self):
+        return {key: line for key, line in self.entries.items() if isinstance(key, str)}
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def add(self, content):
+        key = rule_hash(content)
+        if key in self.entries:
+            return None
+        self.entries[key] = content.strip()
+        return key
+
+    def remove(self, key):
+        return self.entries.pop(key, None)
+
+    def render(self):
+        return ''.join(f"{line}\n" for line in self.entries.values())
+
+
+def split_options(text):
+    """Split a rule body into (name, value) pairs, honouring quotes and \\; escapes"""
+    options = []
+    current = []
+    quoted = escaped = False
+    for char in text:
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif char == ';' and not quoted:
+            options.append(''.join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    if ''.join(current).strip():
+        options.append(''.join(current).strip())
+    pairs = []
+    for option in filter(None, options):
+        name, _, value = option.partition(':')
+        pairs.append((name.strip(), value.strip()))
+    return pairs
+
+
+def _int_option(options, name, default=None):
+    value = options.get(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise RuleSyntaxError(f"Invalid {name} {value!r}")
+
+
+def parse_rule(content):
+    """Parse a Snort rule into its header fields and identifying options"""
+    match = RULE_RE.match(content.strip())
+    if not match:
+        raise RuleSyntaxError(f"Not a Snort rule: {content[:80]!r}")
+    pairs = split_options(match.group('options'))
+    options = dict(pairs)
+    msg = options.get('msg', '')
+    if len(msg) >= 2 and msg[0] == msg[-1] == '"':
+        msg = msg[1:-1]
+    return ParsedRule(
+        action=match.group('action'),
+        protocol=match.group('protocol').lower(),
+        source=match.group('source') or 'any',
+        source_port=match.group('source_port') or 'any',
+        direction=match.group('direction') or '->',
+        destination=match.group('destination') or 'any',
+        destination_port=match.group('destination_port') or 'any',
+        gid=_int_option(options, 'gid', 1),
+        sid=_int_option(options, 'sid'),
+        rev=_int_option(options, 'rev'),
+        msg=msg,
+        classtype=options.get('classtype', ''),
+        options=tuple(pair for pair in pairs if pair[0] not in METADATA_OPTIONS),
+    )
+
+
+def rule_fields(content):
+    """Indexed SnortRule fields for a rule, empty if it cannot be parsed"""
+    try:
+        rule = parse_rule(content)
+    except RuleSyntaxError:
+        return {}
+    return {
+        'gid': rule.gid,
+        'sid': rule.sid,
+        'rev': rule.rev,
+        'msg': rule.msg[:255],
+        'classtype': rule.classtype[:100],
+        'protocol': rule.protocol[:10],
+        'source_port': rule.source_port[:100],
+        'destination_port': rule.destination_port[:100],
+    }
+
+
+def _port_range(port):
+    """(low, high) for 'any', 80, 1024: or :1023; None for lists and variables"""
+    if port == 'any':
+        return (0, 65535)
+    low, sep, high = port.partition(':')
+    try:
+        if not sep:
+            return (int(port), int(port))
+        return (int(low) if low else 0, int(high) if high else 65535)
+    except ValueError:
+        return None
+
+
+def _covers(outer, inner, ports=False):
+    if outer == inner or outer == 'any':
+        return True
+    if ports:
+        outer_range, inner_range = _port_range(outer), _port_range(inner)
+        if outer_range and inner_range:
+            return outer_range[0] <= inner_range[0] and inner_range[1] <= outer_range[1]
+    return False
+
+
+def rule_covers(outer, inner):
+    """True if `outer` matches every packet `inner` matches"""
+    return (outer.direction == inner.direction
+            and _covers(outer.source, inner.source)
+            and _covers(outer.source_port, inner.source_port, ports=True)
+            and _covers(outer.destination, inner.destination)
+            and _covers(outer.destination_port, inner.destination_port, ports=True))
+
+
+def describe_conflict(conflict):
+    rule, other = conflict.rule, conflict.other
+    if conflict.kind == 'sid':
+        return f"sid {rule.gid}:{rule.sid} is used by two different rules"
+    if conflict.kind == 'duplicate':
+        return f"sid {rule.gid}:{rule.sid} duplicates sid {other.gid}:{other.sid}"
+    return f"sid {rule.gid}:{rule.sid} overlaps sid {other.gid}:{other.sid}"
+
+
+class RuleIndex:
+    """Parsed rules indexed by (gid, sid) and by detection signature.
+
+    The signature is the protocol, action and matching options with the
+    descriptive ones (msg, sid, rev, ...) left out, so rules that detect
+    the same thing under different ids land in the same bucket.
+    """
+    def __init__(self, rules=()):
+        self.by_sid = {}
+        self.by_signature = {}
+        self.invalid = []
+        for content in rules:
+            self.add(content)
+
+    @staticmethod
+    def signature(rule):
+        return (rule.action, rule.protocol, rule.options)
+
+    def add(self, content):
+        try:
+            rule = parse_rule(content)
+        except RuleSyntaxError:
+            self.invalid.append(content)
+            return None
+        if rule.sid is not None:
+            self.by_sid[(rule.gid, rule.sid)] = rule
+        self.by_signature.setdefault(self.signature(rule), []).append(rule)
+        return rule
+
+    def lookup(self, sid, gid=1):
+        return self.by_sid.get((gid, sid))
+
+    def __len__(self):
+        return len(self.by_sid)
+
+    def conflicts(self, rule):
+        """Conflicts between `rule` and the indexed rules.
+
+        'sid' means a different rule already uses the gid:sid, 'duplicate'
+        that an indexed rule matches exactly the same traffic, and 'overlap'
+        that one rule's addresses and ports contain the other's.
+        """
+        found = []
+        existing = self.by_sid.get((rule.gid, rule.sid))
+        if rule.sid is not None and existing is not None and existing != rule:
+            found.append(RuleConflict('sid', rule, existing))
+        for other in self.by_signature.get(self.signature(rule), ()):
+            if other == rule or (other.gid, other.sid) == (rule.gid, rule.sid):
+                continue
+            if rule_covers(other, rule) and rule_covers(rule, other):
+                found.append(RuleConflict('duplicate', rule, other))
+            elif rule_covers(other, rule) or rule_covers(rule, other):
+                found.append(RuleConflict('overlap', rule, other))
+        return found
+
+
+_indexes = {}
+
+
+def load_rule_index(path):
+    """RuleIndex for a rules file, cached until the file changes"""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return RuleIndex()
+    cached = _indexes.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = _indexes[path] = (mtime, RuleIndex(read_rule_lines(path)))
+    return cached[1]
+
+
+RULE_FILTERS = {
+    'sid': 'sid',
+    'gid': 'gid',
+    'classtype': 'classtype',
+    'protocol': 'protocol',
+    'port': 'destination_port',
+    'category': 'category',
+    'msg': 'msg__icontains',
+}
+
+
+def filter_rules(queryset, params):
+    """Filter SnortRule rows by the indexed fields named in `params`"""
+    filters = {}
+    for param, lookup in RULE_FILTERS.items():
+        value = params.get(param)
+        if value in (None, ''):
+            continue
+        if param in ('sid', 'gid'):
+            try:
+                value = int(value)
+            except ValueError:
+                continue
+        filters[lookup] = value
+    return queryset.filter(**filters).order_by('sid', 'id')
+
+
+def chunked(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def write_atomic(path, content):
+    """Replace `path` with `content` so readers never see a partial file"""
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class RuleTransaction:
+    """A batch of rule adds and removes applied as one unit of work.
+
+    Changes are made against the in-memory rule set. On commit the
+    SnortRule table is synced and the rules file is rewritten once,
+    inside a single database transaction, then Snort is reloaded once.
+    Use it through SnortRuleManager.transaction().
+    """
+    def __init__(self, manager, category='', force=False):
+        self.manager = manager
+        self.category = category
+        self.force = force
+        self.conflicts = []
+        self._lock = None
+        self.ruleset = None
+        self.added = {}
+        self.removed = {}
+        self.categories = {}
+        self.full_sync = False
+        self.reloaded = None
+
+    def __enter__(self):
+        self.begin()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.commit()
+        finally:
+            self.release()
+        return False
+
+    def begin(self):
+        # Serialize writers: the dashboard and manage_rules may edit at once
+        self._lock = open(f"{self.manager.rules_file}.lock", 'w')
+        fcntl.flock(self._lock, fcntl.LOCK_EX)
+        self.ruleset = RuleSet.load(self.manager.rules_file)
+
+    def release(self):
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+    def add(self, content, category=None):
+        parse_rule(content)
+        key = self.ruleset.add(content)
+        if key is None:
+            return False
+        if self.removed.pop(key, None) is None:
+            self.added[key] = content.strip()
+        self.categories[key] = self.category if category is None else category
+        return True
+
+    def remove(self, content):
+        return self.remove_hash(rule_hash(content))
+
+    def remove_hash(self, key):
+        line = self.ruleset.remove(key)
+        if line is None:
+            return False
+        if self.added.pop(key, None) is None:
+            self.removed[key] = line
+        return True
+
+    def replace_all(self, contents, category=None):
+        """Make the rule set exactly `contents`, keeping comments"""
+        self.full_sync = True
+        wanted = {rule_hash(content): content for content in contents}
+        for key in list(self.ruleset.rules()):
+            if key not in wanted:
+                self.remove_hash(key)
+        for content in wanted.values():
+            self.add(content, category)
+
+    @property
+    def changed(self):
+        return bool(self.added or self.removed)
+
+    def check(self):
+        """Find rules being added that collide with the rest of the set"""
+        rules = self.ruleset.rules()
+        index = RuleIndex(content for key, content in rules.items() if key not in self.added)
+        self.conflicts = []
+        for content in self.added.values():
+            rule = parse_rule(content)
+            self.conflicts.extend(index.conflicts(rule))
+            index.add(content)
+        return self.conflicts
+
+    def commit(self):
+        """Sync the database and rules file, then reload Snort once.
+
+        Raises RuleConflictError, leaving everything untouched, if an added
+        rule reuses a sid or duplicates another rule, unless `force` is set.
+        Overlapping rules are only logged.
+        """
+        for conflict in self.check():
+            logger.warning(f"Rule conflict: {describe_conflict(conflict)}")
+        blocking = [conflict for conflict in self.conflicts if conflict.kind != 'overlap']
+        if blocking and not self.force:
+            raise RuleConflictError(blocking)
+        rules = self.ruleset.rules()
+        with transaction.atomic():
+            self._sync_table(rules)
+            if self.changed:
+                write_atomic(self.manager.rules_file, self.ruleset.render())
+        if not self.changed:
+            self.reloaded = True
+            return True
+        logger.info(f"Rules updated: {len(self.added)} added, {len(self.removed)} removed")
+        self.reloaded = self.manager.reload_snort()
+        return self.reloaded
+
+    def _sync_table(self, rules):
+        """Bring the SnortRule rows for the rules this transaction touched into line.
+
+        A full sync (replace_all) checks every row, which also repairs rows
+        that have drifted from the file; other commits only look up the
+        rules they added or removed.
+        """
+        if self.full_sync:
+            keys = None
+            rows = SnortRule.objects.values_list('rule_hash', 'is_active')
+        else:
+            keys = set(self.added) | set(self.removed)
+            rows = (row for chunk in chunked(sorted(keys), SYNC_CHUNK_SIZE)
+                    for row in SnortRule.objects.filter(rule_hash__in=chunk)
+                    .values_list('rule_hash', 'is_active'))
+        known = {}
+        for key, is_active in rows:
+            known[key] = known.get(key, False) or is_active
+        # Rows for rules no longer in the file, including any that had drifted
+        stale = {key for key, is_active in known.items() if is_active and key not in rules}
+        stale.update(key for key in self.removed if key in known)
+        for chunk in chunked(sorted(stale), SYNC_CHUNK_SIZE):
+            SnortRule.objects.filter(rule_hash__in=chunk).delete()
+        present = rules if keys is None else [key for key in keys if key in rules]
+        inactive = [key for key in present if known.get(key) is False]
+        for chunk in chunked(inactive, SYNC_CHUNK_SIZE):
+            SnortRule.objects.filter(rule_hash__in=chunk).update(is_active=True)
+        SnortRule.objects.bulk_create(
+            [SnortRule(rule_content=rules[key], rule_hash=key,
+                       category=self.categories.get(key, self.category),
+                       **rule_fields(rules[key]))
+             for key in present if key not in known],
+            batch_size=500,
+        )
@@ -0,0 +1,208 @@
+import glob
+import logging
+import os
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.utils import timezone
+
+from .parsers import parse_many, split_records
+from .tailer import AlertFileTailer
+
+logger = logging.getLogger(__name__)
+
+
+def ignore_interrupts():
+    """Pool worker initializer: Ctrl-C is handled by the monitor, which shuts the pool down"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def expand_alert_files(patterns):
+    """Expand globs, keeping literal paths that don't exist yet"""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        for path in matches:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+class Sensor:
+    """One Snort alert file, tailed by its own reader thread.
+
+    The reader hands chunks of complete alerts to the shared parser pool.
+    At most `max_in_flight` chunks per sensor may be parsed or waiting for
+    the writer at once; beyond that the reader blocks, so a noisy sensor
+    slows only itself.
+    """
+    def __init__(self, path, pool, ready, state_file=None, max_in_flight=4,
+                 chunk_bytes=256 * 1024, interval=1.0, tz=None):
+        self.path = path
+        self.tailer = AlertFileTailer(path, state_file=state_file)
+        self.pool = pool
+        self.ready = ready
+        self.chunk_bytes = chunk_bytes
+        self.interval = interval
+        self.tz = tz
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._chunks = deque()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"sensor {path}", daemon=True)
+        self._processed = None
+        self._saved = self.tailer.position
+        self.lines_read = 0
+        self.alerts_written = 0
+        self.backpressure_seconds = 0.0
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.tailer.close()
+
+    def _run(self):
+        carry = []
+        while not self._stop.is_set():
+            lines = self.tailer.read_lines(max_bytes=self.chunk_bytes)
+            if not lines:
+                self.tailer.wait(self.interval)
+                continue
+            self.lines_read += len(lines)
+            complete, carry = split_records(carry + lines)
+            if not complete:
+                continue
+            carry_bytes = sum(len(line.encode('utf-8')) + 1 for line in carry)
+            inode, offset = self.tailer.position
+            if not self._acquire_slot():
+                return
+            future = self.pool.submit(parse_many, complete, self.tz)
+            with self._lock:
+                self._chunks.append((future, (inode, offset - carry_bytes), time.monotonic()))
+            future.add_done_callback(lambda _: self.ready.set())
+
+    def _acquire_slot(self):
+        started = time.monotonic()
+        while not self._slots.acquire(timeout=self.interval):
+            if self._stop.is_set():
+                return False
+        self.backpressure_seconds += time.monotonic() - started
+        return True
+
+    def take_ready(self):
+        """Pop parsed chunks in read order, stopping at the first unfinished one"""
+        ready = []
+        with self._lock:
+            while self._chunks and self._chunks[0][0].done():
+                ready.append(self._chunks.popleft())
+        return ready
+
+    def processed(self, position, alerts):
+        """Record that a chunk has been handed to the writer"""
+        self._processed = position
+        self.alerts_written += alerts
+        self._slots.release()
+
+    def commit(self, position):
+        """Persist a position the writer has stored every alert before"""
+        if position != self._saved:
+            self.tailer.save(position)
+            self._saved = position
+
+    def metrics(self):
+        with self._lock:
+            in_flight = len(self._chunks)
+            oldest = self._chunks[0][2] if self._chunks else None
+        inode, offset = self._processed or self._saved
+        try:
+            st = os.stat(self.path)
+            lag_bytes = st.st_size - offset if st.st_ino == inode else st.st_size
+        except FileNotFoundError:
+            lag_bytes = 0
+        return {
+            'path': self.path,
+            'lines_read': self.lines_read,
+            'alerts_written': self.alerts_written,
+            'chunks_in_flight': in_flight,
+            'lag_bytes': max(lag_bytes, 0),
+            'lag_seconds': time.monotonic() - oldest if oldest else 0.0,
+            'backpressure_seconds': round(self.backpressure_seconds, 3),
+        }
+
+
+class MultiSensorMonitor:
+    """Tail several alert files at once and feed one batched writer.
+
+    Parsing is fanned out to a process pool; all parsed rows are written
+    by the calling thread through `writer`, which keeps the database work
+    on a single connection. Each chunk's end position is marked on the
+    writer, which saves it once the chunk's alerts are stored.
+    """
+    def __init__(self, paths, writer, workers=None, max_in_flight=4, state_file=None,
+                 metrics_interval=60):
+        self.writer = writer
+        self.metrics_interval = metrics_interval
+        self.pool = ProcessPoolExecutor(max_workers=workers or min(len(paths), os.cpu_count() or 1),
+                                        initializer=ignore_interrupts)
+        self.ready = threading.Event()
+        tz = timezone.get_default_timezone()
+        self.sensors = [
+            Sensor(path, self.pool, self.ready, state_file=state_file,
+                   max_in_flight=max_in_flight, tz=tz)
+            for path in paths
+        ]
+        self._last_metrics = time.monotonic()
+
+    def run(self, interval=10):
+        for sensor in self.sensors:
+            sensor.start()
+        try:
+            while True:
+                due = self.writer.time_until_due()
+                self.ready.wait(interval if due is None else min(interval, due))
+                self.ready.clear()
+                self.drain()
+        finally:
+            self.shutdown()
+
+    def drain(self):
+        """Write every parsed chunk that is ready, visiting sensors in turn"""
+        for sensor in self.sensors:
+            for future, position, _ in sensor.take_ready():
+                try:
+                    alerts = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to parse chunk from {sensor.path}: {e}")
+                    alerts = []
+                for alert_data in alerts:
+                    self.writer.add(alert_data)
+                sensor.processed(position, len(alerts))
+                self.writer.mark(sensor, position)
+        self.writer.flush_if_due()
+        if time.monotonic() - self._last_metrics >= self.metrics_interval:
+            self.log_metrics()
+
+    def log_metrics(self):
+        self._last_metrics = time.monotonic()
+        for metrics in self.metrics():
+            logger.info(
+                f"{metrics['path']}: {metrics['alerts_written']} alerts written, "
+                f"{metrics['chunks_in_flight']} chunks in flight, lag {metrics['lag_bytes']} bytes "
+                f"/ {metrics['lag_seconds']:.1f}s, blocked {metrics['backpressure_seconds']}s"
+            )
+
+    def metrics(self):
+        return [sensor.metrics() for sensor in self.sensors]
+
+    def shutdown(self):
+        for sensor in self.sensors:
+            sensor.stop()
+        self.pool.shutdown(wait=True)
+        self.drain()
+        self.writer.flush()
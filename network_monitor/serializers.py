@@ -1,6 +1,6 @@
 # serializers.py
 from rest_framework import serializers
-from .models import NetworkInterface, SnortAlert, SnortRule, BridgeConfiguration
+from .models import NetworkInterface, SnortAlert, SnortRule, BridgeConfiguration, ControlJob
 
 class NetworkInterfaceSerializer(serializers.ModelSerializer):
     class Meta:
@@ -8,19 +8,32 @@ class NetworkInterfaceSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'mac_address', 'ip_address', 'is_bridged']
 
 class SnortAlertSerializer(serializers.ModelSerializer):
+    first_seen = serializers.DateTimeField(source='timestamp', read_only=True)
+
     class Meta:
         model = SnortAlert
         fields = ['id', 'timestamp', 'priority', 'classification', 
-                 'source_ip', 'destination_ip', 'message', 'packet_data']
+                 'source_ip', 'destination_ip', 'message', 'payload',
+                 'gid', 'sid', 'rev', 'count', 'first_seen', 'last_seen']
+        # payload is the digest only; packet data is served by the payload action
+        read_only_fields = ['payload', 'count', 'last_seen']
 
 class SnortRuleSerializer(serializers.ModelSerializer):
     class Meta:
         model = SnortRule
-        fields = ['id', 'rule_content', 'is_active', 'category', 'created_at']
+        fields = ['id', 'rule_content', 'is_active', 'category', 'created_at',
+                  'gid', 'sid', 'rev', 'msg', 'classtype', 'protocol',
+                  'source_port', 'destination_port']
 
 class BridgeConfigurationSerializer(serializers.ModelSerializer):
     interfaces = NetworkInterfaceSerializer(many=True, read_only=True)
 
     class Meta:
         model = BridgeConfiguration
-        fields = ['id', 'name', 'interfaces', 'is_active', 'created_at']
\ No newline at end of file
+        fields = ['id', 'name', 'interfaces', 'is_active', 'created_at']
+
+class ControlJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ControlJob
+        fields = ['id', 'kind', 'target', 'params', 'status', 'progress', 'result',
+                  'error', 'created_at', 'started_at', 'finished_at']
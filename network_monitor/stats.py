@@ -0,0 +1,132 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Max, Min, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import AlertRollup, RuleHitStat, SnortAlert, SnortRule
+
+STATS_CACHE_KEY = 'network_monitor:snort_stats'
+RECENT_ALERT_FIELDS = ('id', 'timestamp', 'priority', 'classification',
+                       'source_ip', 'destination_ip', 'message')
+
+
+def rollup_key(alert_data):
+    """(minute bucket, priority, classification) an alert is counted under"""
+    return (
+        alert_data['timestamp'].replace(second=0, microsecond=0),
+        alert_data['priority'],
+        (alert_data.get('classification') or '')[:100],
+    )
+
+
+def update_rollups(alerts):
+    """Add a batch of alerts to the per-minute rollup table.
+
+    Call inside the transaction that inserts the alerts, so the rollup
+    never disagrees with the alert table.
+    """
+    for (bucket, priority, classification), count in Counter(map(rollup_key, alerts)).items():
+        updated = AlertRollup.objects.filter(
+            bucket=bucket, priority=priority, classification=classification,
+        ).update(count=F('count') + count)
+        if not updated:
+            AlertRollup.objects.create(bucket=bucket, priority=priority,
+                                       classification=classification, count=count)
+
+
+def rule_hit_key(alert_data):
+    """(minute bucket, gid, sid) an alert is counted under"""
+    return (
+        alert_data['timestamp'].replace(second=0, microsecond=0),
+        alert_data.get('gid') or 1,
+        alert_data['sid'],
+    )
+
+
+def update_rule_hits(alerts):
+    """Add a batch of alerts to the per-rule hit table, like update_rollups"""
+    hits = Counter(rule_hit_key(alert) for alert in alerts if alert.get('sid') is not None)
+    for (bucket, gid, sid), count in hits.items():
+        updated = RuleHitStat.objects.filter(
+            bucket=bucket, gid=gid, sid=sid,
+        ).update(count=F('count') + count)
+        if not updated:
+            RuleHitStat.objects.create(bucket=bucket, gid=gid, sid=sid, count=count)
+
+
+def top_noisy_rules(minutes=60, limit=20):
+    """Rules with the most alerts over the last `minutes`, noisiest first.
+
+    Each entry carries its hit count, rate, share of all alerts in the
+    window and, when the rule is managed here, its SnortRule details.
+    """
+    since = timezone.now() - timedelta(minutes=minutes)
+    hits = list(
+        RuleHitStat.objects.filter(bucket__gte=since)
+        .values('gid', 'sid')
+        .annotate(hits=Sum('count'), first_seen=Min('bucket'), last_seen=Max('bucket'))
+        .order_by('-hits', 'gid', 'sid')[:limit]
+    )
+    total = AlertRollup.objects.filter(bucket__gte=since).aggregate(
+        total=Coalesce(Sum('count'), 0))['total']
+    rules = {
+        (rule.gid, rule.sid): rule
+        for rule in SnortRule.objects.filter(sid__in=[hit['sid'] for hit in hits])
+    }
+    for hit in hits:
+        rule = rules.get((hit['gid'], hit['sid']))
+        hit['rate_per_minute'] = round(hit['hits'] / minutes, 2)
+        hit['share'] = round(hit['hits'] / total, 4) if total else None
+        hit['rule_id'] = rule.id if rule else None
+        hit['classtype'] = rule.classtype if rule else None
+        if rule and rule.msg:
+            hit['msg'] = rule.msg
+        else:
+            # Rules from packaged rule files have no SnortRule row
+            hit['msg'] = (SnortAlert.objects.filter(gid=hit['gid'], sid=hit['sid'])
+                          .order_by('-timestamp').values_list('message', flat=True).first())
+    return hits
+
+
+def compute_stats():
+    """Totals from the rollup table plus the latest alerts, in two indexed queries"""
+    stats = AlertRollup.objects.aggregate(
+        total_alerts=Coalesce(Sum('count'), 0),
+        high_priority=Coalesce(Sum('count', filter=Q(priority=1)), 0),
+        medium_priority=Coalesce(Sum('count', filter=Q(priority=2)), 0),
+        low_priority=Coalesce(Sum('count', filter=Q(priority=3)), 0),
+    )
+    stats['recent_alerts'] = list(
+        SnortAlert.objects.order_by('-timestamp').values(*RECENT_ALERT_FIELDS)[:10]
+    )
+    return stats
+
+
+def approximate_alert_count(priority=None, start=None, end=None):
+    """Number of alerts matching the filters, counted from the rollup table.
+
+    Bounds are applied to whole minutes, so counts near the edges of a
+    time range are approximate.
+    """
+    rollups = AlertRollup.objects.all()
+    if priority:
+        rollups = rollups.filter(priority=priority)
+    if start:
+        rollups = rollups.filter(bucket__gte=start)
+    if end:
+        rollups = rollups.filter(bucket__lte=end)
+    return rollups.aggregate(count=Coalesce(Sum('count'), 0))['count']
+
+
+def cached_stats():
+    """Dashboard statistics, cached for SNORT_STATS_CACHE_TTL seconds"""
+    return cache.get_or_set(STATS_CACHE_KEY, compute_stats,
+                            getattr(settings, 'SNORT_STATS_CACHE_TTL', 5))
+
+
+def invalidate_stats():
+    cache.delete(STATS_CACHE_KEY)
@@ -0,0 +1,221 @@
+import ctypes
+import ctypes.util
+import json
+import logging
+import os
+import select
+import struct
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+IN_MODIFY = 0x00000002
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+_INOTIFY_EVENT = struct.Struct('iIII')
+
+READ_CHUNK = 64 * 1024
+
+
+def default_state_file(path, suffix='.offset'):
+    """State file used to remember how far into `path` we have read"""
+    state_dir = getattr(settings, 'SNORT_MONITOR_STATE_DIR', '/var/lib/riotdtp')
+    name = os.path.abspath(path).strip('/').replace('/', '_')
+    return os.path.join(state_dir, f"{name}{suffix}")
+
+
+class Inotify:
+    """Minimal inotify watch for files in `path`'s directory named like `path`"""
+    def __init__(self, path):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.name = os.fsencode(os.path.basename(path))
+        directory = os.fsencode(os.path.dirname(os.path.abspath(path)))
+        mask = IN_MODIFY | IN_CREATE | IN_MOVED_TO | IN_DELETE
+        if libc.inotify_add_watch(self.fd, directory, mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, 'inotify_add_watch failed')
+
+    def wait(self, timeout):
+        """Block until the watched file changes or `timeout` seconds pass"""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if not ready:
+                return False
+            if self._drain():
+                return True
+
+    def _drain(self):
+        """Consume queued events, reporting whether any concern our file"""
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return False
+        pos = 0
+        while pos + _INOTIFY_EVENT.size <= len(data):
+            _, _, _, length = _INOTIFY_EVENT.unpack_from(data, pos)
+            pos += _INOTIFY_EVENT.size
+            name = data[pos:pos + length].rstrip(b'\0')
+            pos += length
+            if name.startswith(self.name):
+                return True
+        return False
+
+    def close(self):
+        os.close(self.fd)
+
+
+class AlertFileTailer:
+    """Follow a Snort alert file across monitor restarts and log rotation.
+
+    Only bytes appended since the last read are consumed. The inode and the
+    offset of the last complete line are persisted to `state_file` so a
+    restarted monitor resumes where it stopped instead of re-reading the file.
+    """
+    def __init__(self, path, state_file=None):
+        self.path = path
+        self.state_file = state_file or default_state_file(path)
+        self.inode = None
+        self.offset = 0
+        self._file = None
+        self._partial = b''
+        self._inotify = None
+        self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable tailer state {self.state_file}: {e}")
+            return
+        self.inode = state.get('inode')
+        self.offset = state.get('offset', 0)
+
+    @property
+    def position(self):
+        """(inode, offset) of the end of the last complete line read"""
+        return self.inode, self.offset
+
+    def save(self, position=None):
+        """Persist `position`, or the current position if not given"""
+        inode, offset = position or self.position
+        os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+        tmp_path = f"{self.state_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'path': self.path, 'inode': inode, 'offset': offset}, f)
+        os.replace(tmp_path, self.state_file)
+
+    def _open(self):
+        try:
+            self._file = open(self.path, 'rb')
+        except FileNotFoundError:
+            return False
+        st = os.fstat(self._file.fileno())
+        if st.st_ino != self.inode:
+            if self.inode is not None:
+                logger.info(f"{self.path} was rotated while stopped, reading new file from start")
+            self.offset = 0
+        elif st.st_size < self.offset:
+            logger.info(f"{self.path} was truncated while stopped, reading from start")
+            self.offset = 0
+        self.inode = st.st_ino
+        self._partial = b''
+        self._file.seek(self.offset)
+        return True
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _drain(self, max_bytes=None):
+        """Read complete lines from the open file, returning (lines, at_eof)"""
+        lines = []
+        read = 0
+        while max_bytes is None or read < max_bytes:
+            chunk = self._file.read(READ_CHUNK)
+            if not chunk:
+                return lines, True
+            read += len(chunk)
+            data = self._partial + chunk
+            complete, sep, self._partial = data.rpartition(b'\n')
+            if sep:
+                self.offset += len(complete) + 1
+                lines.extend(line.decode('utf-8', 'replace')
+                             for line in complete.split(b'\n'))
+        return lines, False
+
+    def _check_rotation(self):
+        """Return True if the file was replaced or truncated and has been reopened"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if st.st_ino != self.inode:
+            logger.info(f"{self.path} rotated, switching to new file")
+            self._close()
+            self.inode = None
+            return self._open()
+        if st.st_size < self.offset:
+            logger.info(f"{self.path} truncated, reading from start")
+            self.offset = 0
+            self._partial = b''
+            self._file.seek(0)
+            return True
+        return False
+
+    def read_lines(self, max_bytes=None):
+        """Return the complete lines appended since the previous call.
+
+        A rotated file is drained to EOF before switching to its
+        replacement, so no alerts written just before rotation are lost.
+        """
+        if self._file is None and not self._open():
+            return []
+        lines, at_eof = self._drain(max_bytes)
+        if at_eof and self._check_rotation():
+            more, _ = self._drain(max_bytes)
+            lines.extend(more)
+        return lines
+
+    def pending_bytes(self):
+        """Bytes written to the alert file that have not been consumed yet"""
+        try:
+            return max(os.stat(self.path).st_size - self.offset, 0)
+        except FileNotFoundError:
+            return 0
+
+    def wait(self, timeout):
+        """Sleep until the alert file changes, or at most `timeout` seconds.
+
+        Uses inotify where available and falls back to plain polling.
+        """
+        if self._inotify is None:
+            try:
+                self._inotify = Inotify(self.path)
+            except (OSError, AttributeError) as e:
+                logger.info(f"inotify unavailable ({e}), polling {self.path}")
+                self._inotify = False
+        if self._inotify:
+            self._inotify.wait(timeout)
+        else:
+            time.sleep(timeout)
+
+    def close(self):
+        self._close()
+        if self._inotify:
+            self._inotify.close()
+        self._inotify = None
@@ -0,0 +1,227 @@
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+
+from .models import SnortAlert
+
+logger = logging.getLogger(__name__)
+
+PANE_SECONDS = 60
+PANE_CACHE_KEY = 'network_monitor:talkers:{}'
+# dimension: the alert fields its keys are made of
+TALKER_DIMENSIONS = {
+    'source_ip': ('source_ip',),
+    'destination_ip': ('destination_ip',),
+    'pair': ('source_ip', 'destination_ip'),
+    'classification': ('classification',),
+}
+
+
+def window_minutes():
+    return getattr(settings, 'SNORT_TALKER_WINDOW_MINUTES', 60)
+
+
+def pane_start(timestamp):
+    """Epoch second at which the one-minute pane holding `timestamp` starts"""
+    seconds = timestamp if isinstance(timestamp, (int, float)) else timestamp.timestamp()
+    return int(seconds // PANE_SECONDS) * PANE_SECONDS
+
+
+def window_panes(minutes, now=None):
+    """Starts of the panes covering the last `minutes`, the current one first"""
+    current = pane_start(now if now is not None else time.time())
+    return [current - i * PANE_SECONDS for i in range(minutes)]
+
+
+def window_start(minutes, now=None):
+    """The time a `minutes` window begins, aligned to the panes it covers"""
+    return datetime.fromtimestamp(window_panes(minutes, now)[-1], dt_timezone.utc)
+
+
+class SpaceSaving:
+    """Space-Saving heavy-hitter sketch over at most `capacity` counters.
+
+    Every key whose true count exceeds total / capacity is kept. A key's
+    count overestimates its true count by at most its error.
+    """
+    def __init__(self, capacity, counters=None):
+        self.capacity = capacity
+        self.counters = counters or {}
+
+    def add(self, key, count=1):
+        counter = self.counters.get(key)
+        if counter is not None:
+            counter[0] += count
+        elif len(self.counters) < self.capacity:
+            self.counters[key] = [count, 0]
+        else:
+            victim = min(self.counters, key=lambda k: self.counters[k][0])
+            floor = self.counters.pop(victim)[0]
+            self.counters[key] = [floor + count, floor]
+
+    def floor(self):
+        """Most a key missing from a full sketch can have been seen"""
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(count for count, error in self.counters.values())
+
+    def state(self):
+        return (self.capacity, {key: tuple(counter) for key, counter in self.counters.items()})
+
+    @classmethod
+    def from_state(cls, state):
+        capacity, counters = state
+        return cls(capacity, {key: list(counter) for key, counter in counters.items()})
+
+
+def merge_sketches(sketches):
+    """Sum sketches from several panes into {key: [count, error]}.
+
+    A key missing from a full pane may still have been seen there up to
+    that pane's floor, which is added to the key's error.
+    """
+    merged = {}
+    floors = []
+    for sketch in sketches:
+        floor = sketch.floor()
+        floors.append(floor)
+        for key, (count, error) in sketch.counters.items():
+            total = merged.setdefault(key, [0, 0, 0])
+            total[0] += count
+            total[1] += error
+            total[2] += floor
+    missing = sum(floors)
+    return {key: [count, error + missing - present]
+            for key, (count, error, present) in merged.items()}
+
+
+class TalkerPane:
+    """One minute of sketches, per dimension for all alerts and per priority"""
+    def __init__(self, start, capacity, sketches=None):
+        self.start = start
+        self.capacity = capacity
+        self.sketches = sketches or {}
+
+    def add(self, dimension, priority, key, count):
+        for sketch_key in ((dimension, None), (dimension, priority)):
+            sketch = self.sketches.get(sketch_key)
+            if sketch is None:
+                sketch = self.sketches[sketch_key] = SpaceSaving(self.capacity)
+            sketch.add(key, count)
+
+    def state(self):
+        return {sketch_key: sketch.state() for sketch_key, sketch in self.sketches.items()}
+
+    @classmethod
+    def from_state(cls, start, capacity, state):
+        return cls(start, capacity, {sketch_key: SpaceSaving.from_state(sketch)
+                                     for sketch_key, sketch in state.items()})
+
+
+class TalkerAggregator:
+    """Top source IPs, destination IPs, pairs and classifications at ingest.
+
+    Alerts are counted into one-minute panes of Space-Saving sketches,
+    keeping `window` minutes. Panes changed by a batch are written to the
+    cache, so any process can answer top-K queries without touching
+    SnortAlert; on start, panes already in the cache are picked up again.
+    """
+    def __init__(self, capacity=256, window=None):
+        self.capacity = capacity
+        self.window = window or window_minutes()
+        self.panes = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _load(self):
+        self._loaded = True
+        states = cache.get_many([PANE_CACHE_KEY.format(start) for start in window_panes(self.window)])
+        for state in states.values():
+            start, capacity, sketches = state
+            self.panes[start] = TalkerPane.from_state(start, capacity, sketches)
+
+    def add(self, alerts):
+        """Count a batch of parsed alerts and publish the panes they touched"""
+        counts = Counter()
+        for alert in alerts:
+            start = pane_start(alert['timestamp'])
+            for dimension, fields in TALKER_DIMENSIONS.items():
+                key = tuple(alert.get(field) or '' for field in fields)
+                counts[start, dimension, alert['priority'], key] += 1
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            oldest = window_panes(self.window)[-1]
+            touched = set()
+            for (start, dimension, priority, key), count in counts.items():
+                if start < oldest:
+                    continue
+                pane = self.panes.get(start)
+                if pane is None:
+                    pane = self.panes[start] = TalkerPane(start, self.capacity)
+                pane.add(dimension, priority, key, count)
+                touched.add(start)
+            for start in [start for start in self.panes if start < oldest]:
+                del self.panes[start]
+            states = {
+                PANE_CACHE_KEY.format(start): (start, self.capacity, self.panes[start].state())
+                for start in touched
+            }
+        try:
+            cache.set_many(states, (self.window + 1) * PANE_SECONDS)
+        except Exception as e:
+            logger.warning(f"Could not publish top talker sketches: {e}")
+
+
+_aggregator = None
+_aggregator_lock = threading.Lock()
+
+
+def get_aggregator():
+    global _aggregator
+    with _aggregator_lock:
+        if _aggregator is None:
+            _aggregator = TalkerAggregator(getattr(settings, 'SNORT_TALKER_CAPACITY', 256))
+    return _aggregator
+
+
+def _results(by, ranked, limit):
+    fields = TALKER_DIMENSIONS[by]
+    return [dict(zip(fields, key), count=count, error=error)
+            for key, (count, error) in ranked[:limit]]
+
+
+def top_talkers(by, minutes=15, priority=None, limit=10, now=None):
+    """Top `by` keys over the last `minutes` from the published sketches.
+
+    Counts are estimates; each result's error bounds how far off it can be.
+    """
+    if by not in TALKER_DIMENSIONS:
+        raise ValueError(f"Unknown dimension {by!r}")
+    states = cache.get_many([PANE_CACHE_KEY.format(start) for start in window_panes(minutes, now)])
+    sketches = []
+    for start, capacity, pane in states.values():
+        sketch = pane.get((by, priority))
+        if sketch is not None:
+            sketches.append(SpaceSaving.from_state(sketch))
+    ranked = sorted(merge_sketches(sketches).items(), key=lambda item: (-item[1][0], item[0]))
+    return _results(by, ranked, limit)
+
+
+def exact_top_talkers(by, minutes=15, priority=None, limit=10, now=None):
+    """The same top-K as top_talkers, counted exactly from SnortAlert"""
+    if by not in TALKER_DIMENSIONS:
+        raise ValueError(f"Unknown dimension {by!r}")
+    fields = TALKER_DIMENSIONS[by]
+    alerts = SnortAlert.objects.filter(timestamp__gte=window_start(minutes, now))
+    if priority is not None:
+        alerts = alerts.filter(priority=priority)
+    # A coalesced row stands for `count` alerts
+    rows = alerts.values_list(*fields).annotate(total=Sum('count')).order_by('-total', *fields)
+    return _results(by, [(row[:-1], (row[-1], 0)) for row in rows[:limit]], limit)
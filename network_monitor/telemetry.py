@@ -0,0 +1,261 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from django.core.cache import cache
+
+from .netstate import SYSFS_NET
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ('rx_bytes', 'tx_bytes', 'rx_packets', 'tx_packets',
+            'rx_dropped', 'tx_dropped', 'rx_errors', 'tx_errors')
+RATE_FIELDS = ('rx_bytes_s', 'tx_bytes_s', 'rx_packets_s', 'tx_packets_s',
+               'drops_s', 'errors_s')
+RESOLUTIONS = ('1s', '1m', '1h')
+TELEMETRY_CACHE_KEY = 'network_monitor:telemetry:{}'
+
+
+def read_counters(root=SYSFS_NET):
+    """Counters from /sys/class/net/*/statistics for every interface but lo"""
+    counters = {}
+    try:
+        names = os.listdir(root)
+    except OSError as e:
+        logger.error(f"Could not list interfaces in {root}: {e}")
+        return counters
+    for name in names:
+        if name == 'lo':
+            continue
+        statistics = os.path.join(root, name, 'statistics')
+        try:
+            values = []
+            for counter in COUNTERS:
+                with open(os.path.join(statistics, counter), 'r') as f:
+                    values.append(int(f.read()))
+        except (OSError, ValueError):
+            continue
+        counters[name] = tuple(values)
+    return counters
+
+
+def counter_rates(previous, current, elapsed):
+    """Per-second rates between two counter readings, None if they were reset"""
+    deltas = [now - before for before, now in zip(previous, current)]
+    if elapsed <= 0 or any(delta < 0 for delta in deltas):
+        return None
+    rx_bytes, tx_bytes, rx_packets, tx_packets, rx_dropped, tx_dropped, \
+        rx_errors, tx_errors = (delta / elapsed for delta in deltas)
+    return (rx_bytes, tx_bytes, rx_packets, tx_packets,
+            rx_dropped + tx_dropped, rx_errors + tx_errors)
+
+
+def format_points(resolution, points):
+    """Stored points as dicts of RATE_FIELDS; rolled-up points also carry their peaks"""
+    if resolution == '1s':
+        return [dict(zip(RATE_FIELDS, rates), t=timestamp) for timestamp, rates in points]
+    formatted = []
+    for timestamp, means, peaks in points:
+        point = dict(zip(RATE_FIELDS, means), t=timestamp)
+        point['peak'] = dict(zip(RATE_FIELDS, peaks))
+        formatted.append(point)
+    return formatted
+
+
+class RollupRing:
+    """Mean and peak rates over fixed periods, keeping the newest `size`"""
+    def __init__(self, period, size):
+        self.period = period
+        self.points = deque(maxlen=size)
+        self._bucket = None
+        self._count = 0
+        self._sums = None
+        self._peaks = None
+
+    def add(self, timestamp, rates):
+        """Add a sample, returning True if it closed the previous period"""
+        bucket = int(timestamp // self.period) * self.period
+        closed = bool(self._count and bucket != self._bucket)
+        if closed:
+            self._close()
+        if not self._count:
+            self._bucket = bucket
+            self._sums = list(rates)
+            self._peaks = list(rates)
+        else:
+            for i, rate in enumerate(rates):
+                self._sums[i] += rate
+                self._peaks[i] = max(self._peaks[i], rate)
+        self._count += 1
+        return closed
+
+    def _close(self):
+        means = tuple(total / self._count for total in self._sums)
+        self.points.append((self._bucket, means, tuple(self._peaks)))
+        self._count = 0
+
+    def open_period(self):
+        """The period still being filled, as (bucket, count, sums, peaks), or None"""
+        if not self._count:
+            return None
+        return (self._bucket, self._count, tuple(self._sums), tuple(self._peaks))
+
+    def restore(self, points, open_period=None):
+        self.points.extend(points)
+        if open_period is not None:
+            self._bucket, self._count, sums, peaks = open_period
+            self._sums, self._peaks = list(sums), list(peaks)
+
+
+class InterfaceSeries:
+    """Rates for one interface at 1s, 1m and 1h resolution in bounded memory"""
+    def __init__(self, raw_points=300, minute_points=1440, hour_points=720):
+        self.raw = deque(maxlen=raw_points)
+        self.minutes = RollupRing(60, minute_points)
+        self.hours = RollupRing(3600, hour_points)
+
+    def add(self, timestamp, rates):
+        """Add a sample, returning the resolutions that gained a point"""
+        self.raw.append((timestamp, rates))
+        changed = {'1s'}
+        if self.minutes.add(timestamp, rates):
+            changed.add('1m')
+        if self.hours.add(timestamp, rates):
+            changed.add('1h')
+        return changed
+
+    def history(self, resolution='1s'):
+        if resolution == '1s':
+            return list(self.raw)
+        return list((self.minutes if resolution == '1m' else self.hours).points)
+
+    def points(self, resolution='1s'):
+        return format_points(resolution, self.history(resolution))
+
+
+class TelemetrySampler:
+    """Sample interface counters every `interval` seconds into downsampling rings.
+
+    Every interface under `root` is sampled, bridges included, so the
+    bridge and its ports can be compared to spot a saturating tap.
+    Interfaces that disappear are dropped along with their history.
+
+    One sampler runs in the sample_telemetry command. After each sample
+    it writes the resolutions that gained a point to the cache, where
+    every web worker reads them, and on start it picks up the history
+    already there, so a restart loses only the samples it missed.
+    """
+    def __init__(self, root=SYSFS_NET, interval=1.0, raw_points=300,
+                 minute_points=1440, hour_points=720):
+        self.root = root
+        self.interval = interval
+        self.sizes = (raw_points, minute_points, hour_points)
+        self.series = {}
+        self._previous = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def sample(self):
+        """Read the counters once, returning the resolutions that changed"""
+        now = time.time()
+        clock = time.monotonic()
+        counters = read_counters(self.root)
+        changed = set()
+        with self._lock:
+            for name in set(self.series) - set(counters):
+                del self.series[name]
+                changed.update(RESOLUTIONS)
+            for name, values in counters.items():
+                previous = self._previous.get(name)
+                if previous is None:
+                    continue
+                rates = counter_rates(previous[1], values, clock - previous[0])
+                if rates is None:
+                    continue
+                if name not in self.series:
+                    self.series[name] = InterfaceSeries(*self.sizes)
+                changed |= self.series[name].add(now, rates)
+            self._previous = {name: (clock, values) for name, values in counters.items()}
+        return changed
+
+    def points(self, resolution='1s', interface=None):
+        with self._lock:
+            return {
+                name: series.points(resolution)
+                for name, series in sorted(self.series.items())
+                if interface is None or name == interface
+            }
+
+    def publish(self, resolutions):
+        """Write the history of `resolutions` to the cache for the web workers"""
+        raw_points, minute_points, hour_points = self.sizes
+        spans = {'1s': raw_points * self.interval, '1m': minute_points * 60,
+                 '1h': hour_points * 3600}
+        with self._lock:
+            states = {resolution: {
+                'interval': self.interval,
+                'updated_at': time.time(),
+                'interfaces': {name: series.history(resolution)
+                               for name, series in self.series.items()},
+                # Periods still filling ride along with the per-second key
+                'open': {name: (series.minutes.open_period(), series.hours.open_period())
+                         for name, series in self.series.items()} if resolution == '1s' else None,
+            } for resolution in resolutions}
+        for resolution, state in states.items():
+            try:
+                cache.set(TELEMETRY_CACHE_KEY.format(resolution), state, spans[resolution])
+            except Exception as e:
+                logger.warning(f"Could not publish {resolution} interface telemetry: {e}")
+
+    def load(self):
+        """Pick up the history published by an earlier run"""
+        states = cache.get_many([TELEMETRY_CACHE_KEY.format(resolution)
+                                 for resolution in RESOLUTIONS])
+        raw = states.get(TELEMETRY_CACHE_KEY.format('1s')) or {}
+        open_periods = raw.get('open') or {}
+        with self._lock:
+            for resolution in RESOLUTIONS:
+                state = states.get(TELEMETRY_CACHE_KEY.format(resolution))
+                for name, points in (state or {}).get('interfaces', {}).items():
+                    series = self.series.get(name)
+                    if series is None:
+                        series = self.series[name] = InterfaceSeries(*self.sizes)
+                    if resolution == '1s':
+                        series.raw.extend(points)
+                    elif resolution == '1m':
+                        series.minutes.restore(points, open_periods.get(name, (None, None))[0])
+                    else:
+                        series.hours.restore(points, open_periods.get(name, (None, None))[1])
+
+    def run(self):
+        """Sample at a fixed cadence until stop() is called"""
+        deadline = time.monotonic()
+        while True:
+            try:
+                self.publish(self.sample())
+            except Exception as e:
+                logger.error(f"Interface telemetry sample failed: {e}")
+            # Keep a fixed cadence, but don't try to catch up after a stall
+            deadline = max(deadline + self.interval, time.monotonic())
+            if self._stop.wait(max(deadline - time.monotonic(), 0)):
+                return
+
+    def stop(self):
+        self._stop.set()
+
+
+def telemetry_points(resolution='1s', interface=None):
+    """Published rates per interface at `resolution`, as (interval, points), or None.
+
+    None means nothing has been published, i.e. sample_telemetry is not running.
+    """
+    state = cache.get(TELEMETRY_CACHE_KEY.format(resolution))
+    if state is None:
+        return None
+    return state['interval'], {
+        name: format_points(resolution, points)
+        for name, points in sorted(state['interfaces'].items())
+        if interface is None or name == interface
+    }
@@ -0,0 +1,45 @@
+import os
+
+
+class FakeSysfs:
+    """A /sys/class/net tree in a temporary directory.
+
+    Interfaces get the attribute files netstate reads; bridges also get a
+    bridge directory and brif links, and enslaved ports a master link.
+    """
+    def __init__(self, root):
+        self.root = root
+
+    def add_interface(self, name, mac='00:00:00:00:00:01', operstate='up', carrier=1, mtu=1500):
+        path = os.path.join(self.root, name)
+        os.makedirs(path, exist_ok=True)
+        self.write(name, 'address', mac)
+        self.write(name, 'operstate', operstate)
+        self.write(name, 'mtu', mtu)
+        if carrier is not None:
+            self.write(name, 'carrier', carrier)
+        else:
+            self.remove(name, 'carrier')
+        return path
+
+    def add_bridge(self, name, ports=(), **attributes):
+        path = self.add_interface(name, **attributes)
+        os.makedirs(os.path.join(path, 'bridge'), exist_ok=True)
+        os.makedirs(os.path.join(path, 'brif'), exist_ok=True)
+        for port in ports:
+            self.enslave(port, name)
+        return path
+
+    def enslave(self, port, bridge):
+        os.symlink(os.path.join(self.root, port), os.path.join(self.root, bridge, 'brif', port))
+        os.symlink(os.path.join(self.root, bridge), os.path.join(self.root, port, 'master'))
+
+    def write(self, name, attribute, value):
+        with open(os.path.join(self.root, name, attribute), 'w') as f:
+            f.write(f"{value}\n")
+
+    def remove(self, name, attribute):
+        try:
+            os.unlink(os.path.join(self.root, name, attribute))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,169 @@
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.test import SimpleTestCase
+
+from network_monitor.bridge import (
+    BridgeManager, IpBatchExecutor, create_steps, delete_steps, interface_names,
+    rollback_commands,
+)
+from network_monitor.tests.sysfs import FakeSysfs
+
+
+class FakeIp:
+    """Executor applying ip link commands to a FakeSysfs tree.
+
+    `fail_at` makes the first batch fail on that line, as ip -batch does,
+    after the lines before it have taken effect.
+    """
+    def __init__(self, sysfs, fail_at=None):
+        self.sysfs = sysfs
+        self.fail_at = fail_at
+        self.batches = []
+
+    def execute(self, commands, force=False):
+        self.batches.append((commands, force))
+        for line, command in enumerate(commands, 1):
+            if line == self.fail_at and len(self.batches) == 1:
+                return f"RTNETLINK answers: Operation not permitted\nCommand failed -:{line}"
+            self.apply(command.split())
+        return None
+
+    def apply(self, words):
+        sysfs = self.sysfs
+        if words[:3] == ['link', 'add', 'name']:
+            sysfs.add_bridge(words[3], operstate='down')
+        elif words[:2] == ['link', 'delete']:
+            shutil.rmtree(os.path.join(sysfs.root, words[3]))
+        elif words[-2] == 'master':
+            sysfs.enslave(words[3], words[-1])
+        elif words[-1] == 'nomaster':
+            master = os.path.join(sysfs.root, words[3], 'master')
+            os.unlink(os.path.join(os.readlink(master), 'brif', words[3]))
+            os.unlink(master)
+        elif words[-1] in ('up', 'down'):
+            sysfs.write(words[3], 'operstate', words[-1])
+
+
+class BridgeStepsTests(SimpleTestCase):
+    def test_interface_names(self):
+        self.assertEqual(interface_names(['eth0', 'eth1', 'eth0']), ['eth0', 'eth1'])
+        for name in ('eth0; reboot', 'a' * 16, '', 'eth0/1', None):
+            with self.assertRaises(ValueError):
+                interface_names([name])
+
+    def test_create_steps(self):
+        self.assertEqual([command for command, _ in create_steps('br0', ['eth0', 'eth1'])], [
+            'link add name br0 type bridge',
+            'link set dev eth0 down',
+            'link set dev eth0 master br0',
+            'link set dev eth0 up',
+            'link set dev eth1 down',
+            'link set dev eth1 master br0',
+            'link set dev eth1 up',
+            'link set dev br0 up',
+        ])
+
+    def test_delete_steps(self):
+        self.assertEqual([command for command, _ in delete_steps('br0', ['eth0'])], [
+            'link set dev br0 down',
+            'link set dev eth0 nomaster',
+            'link set dev eth0 up',
+            'link delete dev br0 type bridge',
+        ])
+
+    def test_rollback_undoes_steps_before_the_failed_line(self):
+        steps = create_steps('br0', ['eth0', 'eth1'])
+        # Line 6 (eth1 master br0) failed; eth1 was taken down on line 5
+        self.assertEqual(rollback_commands(steps, 'Command failed -:6'), [
+            'link set dev eth1 up',
+            'link set dev eth0 nomaster',
+            'link set dev eth0 up',
+            'link delete dev br0 type bridge',
+        ])
+
+    def test_rollback_of_first_line_is_empty(self):
+        self.assertEqual(rollback_commands(create_steps('br0', ['eth0']), 'Command failed -:1'),
+                         [])
+
+    def test_rollback_without_line_undoes_everything(self):
+        steps = delete_steps('br0', ['eth0'])
+        self.assertEqual(rollback_commands(steps, 'sudo: a password is required'), [
+            'link set dev eth0 master br0',
+            'link set dev br0 up',
+        ])
+
+
+class IpBatchExecutorTests(SimpleTestCase):
+    def test_commands_are_piped_to_one_batch(self):
+        calls = []
+
+        def run(argv, **kwargs):
+            calls.append((argv, kwargs['input']))
+            return subprocess.CompletedProcess(argv, 1, '', 'Command failed -:2\n')
+
+        error = IpBatchExecutor(run=run).execute(['link add', 'link set'], force=True)
+        self.assertEqual(error, 'Command failed -:2')
+        self.assertEqual(calls, [(['sudo', 'ip', '-force', '-batch', '-'], 'link add\nlink set\n')])
+
+
+class BridgeManagerTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.sysfs = FakeSysfs(directory.name)
+        for name in ('eth0', 'eth1'):
+            self.sysfs.add_interface(name)
+
+    def manager(self, executor):
+        return BridgeManager(executor, sysfs_root=self.sysfs.root, ready_timeout=0.5,
+                             poll_interval=0.01)
+
+    def test_create_and_delete(self):
+        ip = FakeIp(self.sysfs)
+        result = self.manager(ip).create('br0', ['eth0', 'eth1'])
+        self.assertTrue(result.success)
+        self.assertIsNotNone(result.ready_after)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.sysfs.root, 'br0', 'brif'))),
+                         ['eth0', 'eth1'])
+
+        result = self.manager(ip).delete('br0', ['eth0', 'eth1'])
+        self.assertTrue(result.success)
+        self.assertIsNotNone(result.ready_after)
+        self.assertEqual(sorted(os.listdir(self.sysfs.root)), ['eth0', 'eth1'])
+        self.assertEqual([force for _, force in ip.batches], [False, False])
+
+    def test_failed_create_is_rolled_back(self):
+        ip = FakeIp(self.sysfs, fail_at=6)
+        result = self.manager(ip).create('br0', ['eth0', 'eth1'])
+        self.assertFalse(result.success)
+        self.assertIn('Command failed -:6', result.error)
+        (_, force), (rollback, rollback_force) = ip.batches
+        self.assertEqual((force, rollback_force), (False, True))
+        self.assertEqual(rollback, rollback_commands(create_steps('br0', ['eth0', 'eth1']),
+                                                     result.error))
+        # Back where it started: no bridge, no enslaved ports
+        self.assertEqual(sorted(os.listdir(self.sysfs.root)), ['eth0', 'eth1'])
+        self.assertFalse(os.path.lexists(os.path.join(self.sysfs.root, 'eth0', 'master')))
+
+    def test_failure_on_first_line_runs_no_rollback(self):
+        ip = FakeIp(self.sysfs, fail_at=1)
+        self.assertFalse(self.manager(ip).create('br0', ['eth0']).success)
+        self.assertEqual(len(ip.batches), 1)
+
+    def test_bridge_never_ready(self):
+        class Silent:
+            def execute(self, commands, force=False):
+                return None
+
+        result = self.manager(Silent()).create('br0', ['eth0'])
+        self.assertTrue(result.success)
+        self.assertIsNone(result.ready_after)
+
+    def test_invalid_names_run_nothing(self):
+        ip = FakeIp(self.sysfs)
+        with self.assertRaises(ValueError):
+            self.manager(ip).create('br0', ['eth0 master br1'])
+        self.assertEqual(ip.batches, [])
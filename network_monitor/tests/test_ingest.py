@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import TransactionTestCase
+
+from network_monitor import ingest
+from network_monitor.ingest import AlertBatchWriter
+from network_monitor.models import SnortAlert
+
+START = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def alert(i):
+    return {
+        'timestamp': START + timedelta(seconds=i),
+        'priority': 2,
+        'classification': 'Misc activity',
+        'source_ip': '10.0.0.1',
+        'destination_ip': '10.0.0.2',
+        'message': f"alert {i}",
+        'packet_data': None,
+        'gid': 1,
+        'sid': 1000001,
+        'rev': 1,
+    }
+
+
+class Sink:
+    def __init__(self):
+        self.committed = []
+
+    def commit(self, position):
+        self.committed.append(position)
+
+
+def failing(times):
+    """update_rollups raising DatabaseError for its first `times` calls"""
+    update_rollups = ingest.update_rollups
+    calls = []
+
+    def fail_then_write(batch):
+        calls.append(len(batch))
+        if len(calls) <= times:
+            raise DatabaseError('database is locked')
+        update_rollups(batch)
+    return mock.patch.object(ingest, 'update_rollups', fail_then_write)
+
+
+class AlertBatchWriterRetryTests(TransactionTestCase):
+    # Written through the writer alias, which must commit before default reads
+    databases = {'default', 'writer'}
+
+    def writer(self, **kwargs):
+        return AlertBatchWriter(batch_size=10, publish=False, **kwargs)
+
+    def test_failed_batch_is_retried_before_positions_are_saved(self):
+        writer, sink = self.writer(retry_interval=60), Sink()
+        with failing(1):
+            for i in range(5):
+                writer.add(alert(i))
+            writer.mark(sink, (1, 100))
+            self.assertEqual(writer.flush(), 0)
+            self.assertEqual((writer.pending, sink.committed), (5, []))
+            # Backing off: neither a due check nor a full buffer retries yet
+            self.assertGreater(writer.time_until_due(), 30)
+            for i in range(5, 15):
+                writer.add(alert(i))
+            writer.mark(sink, (1, 200))
+            writer.flush_if_due()
+            self.assertEqual((writer.pending, sink.committed), (15, []))
+
+            self.assertEqual(writer.flush(), 15)
+        self.assertEqual(SnortAlert.objects.count(), 15)
+        self.assertEqual((writer.pending, sink.committed), (0, [(1, 200)]))
+        self.assertIsNone(writer.time_until_due())
+
+    def test_retry_is_due_after_the_interval(self):
+        writer = self.writer(retry_interval=0)
+        with failing(1):
+            writer.add(alert(0))
+            writer.flush()
+            self.assertEqual(writer.time_until_due(), 0)
+            writer.flush_if_due()
+        self.assertEqual(SnortAlert.objects.count(), 1)
+
+    def test_positions_are_not_saved_once_alerts_are_dropped(self):
+        writer, sink = self.writer(max_retained=8), Sink()
+        with failing(1):
+            for i in range(9):
+                writer.add(alert(i))
+            writer.mark(sink, (1, 100))
+            writer.flush()
+            self.assertEqual(writer.pending, 0)
+            writer.add(alert(9))
+            writer.mark(sink, (1, 200))
+            writer.flush()
+        self.assertEqual(SnortAlert.objects.count(), 1)
+        # A restart must read the dropped alerts again
+        self.assertEqual(sink.committed, [])
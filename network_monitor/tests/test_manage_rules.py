@@ -0,0 +1,15 @@
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from network_monitor.models import SnortRule
+
+
+class ManageRulesTests(TestCase):
+    def test_delete_rejects_several_rule_ids(self):
+        rules = [SnortRule.objects.create(rule_content=f"alert tcp any any -> any any "
+                                                       f"(msg:\"r{i}\"; sid:{1000001 + i};)")
+                 for i in range(2)]
+        with self.assertRaisesMessage(CommandError, 'use bulk-delete'):
+            call_command('manage_rules', 'delete', '--rule-id', str(rules[0].pk),
+                         str(rules[1].pk))
+        self.assertEqual(SnortRule.objects.count(), 2)
@@ -0,0 +1,75 @@
+import socket
+import tempfile
+from collections import namedtuple
+
+from django.test import SimpleTestCase
+
+from network_monitor.netstate import NetStateCollector, read_ipv4_addresses, read_netstate
+from network_monitor.tests.sysfs import FakeSysfs
+
+Address = namedtuple('Address', ['family', 'address'])
+
+
+def addresses():
+    return {
+        'eth0': [Address(socket.AF_INET6, 'fe80::1'), Address(socket.AF_INET, '192.0.2.10')],
+        'eth1': [Address(socket.AF_INET6, 'fe80::2')],
+    }
+
+
+class NetStateTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.sysfs = FakeSysfs(directory.name)
+        self.sysfs.add_interface('lo', mac='00:00:00:00:00:00', operstate='unknown', mtu=65536)
+        self.sysfs.add_interface('eth0', mac='52:54:00:00:00:01')
+        self.sysfs.add_interface('eth1', mac='52:54:00:00:00:02', operstate='down', carrier=None)
+        self.sysfs.add_interface('eth2', mac='52:54:00:00:00:03')
+        self.sysfs.add_bridge('br0', ports=['eth0', 'eth2'])
+
+    def collector(self, ttl=60):
+        return NetStateCollector(root=self.sysfs.root, ttl=ttl, net_if_addrs=addresses)
+
+    def test_read_netstate(self):
+        state = read_netstate(self.sysfs.root, read_ipv4_addresses(addresses))
+        eth0, eth1 = state.interfaces['eth0'], state.interfaces['eth1']
+        self.assertEqual((eth0.mac, eth0.operstate, eth0.carrier, eth0.mtu, eth0.master, eth0.ip),
+                         ('52:54:00:00:00:01', 'up', 1, 1500, 'br0', '192.0.2.10'))
+        # carrier can't be read while the link is down
+        self.assertEqual((eth1.operstate, eth1.carrier, eth1.master, eth1.ip),
+                         ('down', None, None, None))
+        self.assertTrue(state.interfaces['br0'].is_bridge)
+        self.assertFalse(eth0.is_bridge)
+        self.assertEqual(state.bridges, {'br0': ['eth0', 'eth2']})
+
+    def test_missing_root_is_empty(self):
+        state = read_netstate(f"{self.sysfs.root}/missing")
+        self.assertEqual((state.interfaces, state.bridges), ({}, {}))
+
+    def test_interfaces_skip_loopback(self):
+        collector = self.collector()
+        self.assertEqual([iface.name for iface in collector.interfaces()],
+                         ['br0', 'eth0', 'eth1', 'eth2'])
+        self.assertIn('lo', [iface.name for iface in collector.interfaces(include_loopback=True)])
+
+    def test_bridge_status(self):
+        collector = self.collector()
+        self.assertEqual(collector.bridge_status('br0'),
+                         {'active': True, 'interfaces': ['eth0', 'eth2'], 'operstate': 'up'})
+        self.assertEqual(collector.bridge_status('eth0'), {'active': False, 'interfaces': []})
+        self.assertEqual(collector.bridge_status('br1'), {'active': False, 'interfaces': []})
+
+    def test_snapshot_is_cached_until_invalidated(self):
+        collector = self.collector()
+        self.assertEqual(len(collector.bridge_status('br0')['interfaces']), 2)
+        self.sysfs.enslave('eth1', 'br0')
+        self.assertEqual(len(collector.bridge_status('br0')['interfaces']), 2)
+        collector.invalidate()
+        self.assertEqual(collector.bridge_status('br0')['interfaces'], ['eth0', 'eth1', 'eth2'])
+
+    def test_snapshot_expires_after_ttl(self):
+        collector = self.collector(ttl=0)
+        collector.bridge_status('br0')
+        self.sysfs.write('br0', 'operstate', 'down')
+        self.assertEqual(collector.bridge_status('br0')['operstate'], 'down')
@@ -0,0 +1,117 @@
+import os
+import sys
+import time
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from network_monitor.parsers import SnortAlertParser, parse_many, split_records
+
+# Lines in the generated corpus; set PARSER_BENCHMARK_LINES=5000000 to track
+# lines/sec across releases on a multi-million-line corpus
+BENCHMARK_LINES = int(os.environ.get('PARSER_BENCHMARK_LINES', 200000))
+
+FAST = ('01/15/25-10:23:45.123456  [**] [1:1000001:2] "ET SCAN Probe" [**] '
+        '[Classification: Attempted Information Leak] [Priority: 2] {TCP} '
+        '10.0.0.1:1234 -> 10.0.0.2:80')
+FULL = [
+    '[**] [1:2000002:3] Suspicious payload [**]',
+    '[Classification: Potentially Bad Traffic] [Priority: 1]',
+    '01/15/25-10:23:46.5 192.168.1.5:5353 -> 192.168.1.9:53',
+    'UDP TTL:64 TOS:0x0 ID:1 IpLen:20 DgmLen:60',
+    'Len: 32',
+    '',
+]
+
+
+def fast_line(i):
+    return (f"01/15/25-10:{i // 60 % 60:02d}:{i % 60:02d}.{i % 1000000:06d}  [**] "
+            f"[1:{1000000 + i % 500}:1] Generated alert {i % 500} [**] "
+            f"[Classification: Misc activity] [Priority: {i % 3 + 1}] {{TCP}} "
+            f"10.{i % 256}.{i // 256 % 256}.1:{1024 + i % 60000} -> 10.0.0.2:443")
+
+
+def generate_corpus(lines):
+    """Fast alerts with a full alert every hundredth record, about `lines` long"""
+    corpus = []
+    i = 0
+    while len(corpus) < lines:
+        if i % 100 == 99:
+            corpus.extend(FULL)
+        else:
+            corpus.append(fast_line(i))
+        i += 1
+    return corpus
+
+
+class SnortAlertParserTests(SimpleTestCase):
+    def test_fast_alert(self):
+        alert = SnortAlertParser(dt_timezone.utc).parse_line(FAST)
+        self.assertEqual(alert, {
+            'timestamp': datetime(2025, 1, 15, 10, 23, 45, 123456, tzinfo=dt_timezone.utc),
+            'priority': 2,
+            'classification': 'Attempted Information Leak',
+            'source_ip': '10.0.0.1',
+            'destination_ip': '10.0.0.2',
+            'message': 'ET SCAN Probe',
+            'packet_data': None,
+            'gid': 1,
+            'sid': 1000001,
+            'rev': 2,
+        })
+
+    def test_fast_alert_ipv6_endpoints(self):
+        line = ('01/15/25-10:23:45.1  [**] [1:1:1] v6 [**] [Priority: 3] {TCP} '
+                '2001:db8::1:443 -> [2001:db8::2]:8080')
+        alert = SnortAlertParser(dt_timezone.utc).parse_line(line)
+        self.assertEqual((alert['source_ip'], alert['destination_ip']),
+                         ('2001:db8::1', '2001:db8::2'))
+
+    def test_full_alert(self):
+        alert, = parse_many(FULL, dt_timezone.utc)
+        self.assertEqual(alert['sid'], 2000002)
+        self.assertEqual(alert['priority'], 1)
+        self.assertEqual(alert['classification'], 'Potentially Bad Traffic')
+        self.assertEqual((alert['source_ip'], alert['destination_ip']),
+                         ('192.168.1.5', '192.168.1.9'))
+        self.assertEqual(alert['timestamp'].microsecond, 500000)
+        self.assertEqual(alert['packet_data'], 'UDP TTL:64 TOS:0x0 ID:1 IpLen:20 DgmLen:60\nLen: 32')
+
+    def test_full_alert_split_across_calls(self):
+        parser = SnortAlertParser(dt_timezone.utc)
+        self.assertEqual(list(parser.parse_many(FULL[:3])), [])
+        alert, = parser.parse_many(FULL[3:])
+        self.assertEqual(alert['sid'], 2000002)
+
+    def test_split_records_holds_back_unfinished_full_alert(self):
+        complete, carry = split_records([FAST] + FULL[:3])
+        self.assertEqual(complete, [FAST])
+        self.assertEqual(carry, FULL[:3])
+
+    def test_invalid_dates_skip_only_their_line(self):
+        lines = [FAST.replace('01/15/25', '02/29'), FAST.replace('01/15/25', '13/45'), FAST]
+        now = datetime(2027, 6, 1, tzinfo=dt_timezone.utc)
+        with mock.patch('network_monitor.parsers.timezone.now', return_value=now):
+            alerts = parse_many(lines, dt_timezone.utc)
+        self.assertEqual([alert['timestamp'].date().isoformat() for alert in alerts],
+                         ['2024-02-29', '2025-01-15'])
+
+    def test_yearless_timestamp_in_the_future_is_last_year(self):
+        line = FAST.replace('01/15/25', '12/31')
+        now = datetime(2027, 1, 1, tzinfo=dt_timezone.utc)
+        with mock.patch('network_monitor.parsers.timezone.now', return_value=now):
+            alert = SnortAlertParser(dt_timezone.utc).parse_line(line)
+        self.assertEqual(alert['timestamp'].year, 2026)
+
+
+class ParserBenchmark(SimpleTestCase):
+    def test_parse_many_throughput(self):
+        corpus = generate_corpus(BENCHMARK_LINES)
+        started = time.perf_counter()
+        alerts = parse_many(corpus, dt_timezone.utc)
+        elapsed = time.perf_counter() - started
+        full = corpus.count(FULL[0])
+        self.assertEqual(len(alerts), len(corpus) - full * (len(FULL) - 1))
+        sys.stderr.write(f"\nparse_many: {len(corpus)} lines in {elapsed:.2f}s "
+                         f"({len(corpus) / elapsed:,.0f} lines/s)\n")
@@ -0,0 +1,96 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from network_monitor import retention
+from network_monitor.dbconfig import writer_alias
+from network_monitor.models import AlertArchive, SnortAlert
+from network_monitor.retention import ArchiveMissingError, prune_day, query_archive
+
+DAY = date(2025, 1, 1)
+
+
+def seed(count, day=DAY, first=0):
+    start = datetime.combine(day, datetime.min.time(), tzinfo=dt_timezone.utc)
+    for i in range(first, first + count):
+        SnortAlert.objects.create(
+            timestamp=start + timedelta(minutes=i), priority=2, classification='seed',
+            source_ip='10.0.0.1', destination_ip='10.0.0.2', message=f"alert {i}",
+        )
+
+
+def archived_messages(archive):
+    with gzip.open(archive.path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line)['message'] for line in f]
+
+
+@mock.patch.object(retention, 'pyarrow', None)
+class PruneDayTests(TransactionTestCase):
+    # Deletes run on the writer alias, which must commit before default reads
+    databases = {'default', 'writer'}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        archive_dir = override_settings(SNORT_ARCHIVE_DIR=directory.name)
+        archive_dir.enable()
+        self.addCleanup(archive_dir.disable)
+        seed(25)
+        seed(3, day=DAY + timedelta(days=1))
+
+    def test_day_is_deleted_in_bounded_batches(self):
+        with CaptureQueriesContext(connections[writer_alias()]) as queries:
+            result = prune_day(DAY, batch_size=10)
+        deletes = [query['sql'] for query in queries if query['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 3)
+        self.assertEqual(result.rows, 25)
+        self.assertEqual(SnortAlert.objects.count(), 3)
+        self.assertEqual(result.archive.rows, 25)
+        self.assertEqual(len(archived_messages(result.archive)), 25)
+
+    def test_interrupted_prune_does_not_archive_twice(self):
+        delete_in_batches = retention.delete_in_batches
+
+        def interrupted(alerts, batch_size):
+            # Killed after the first batch is deleted
+            first = alerts.order_by('id').values_list('id', flat=True)[:batch_size]
+            delete_in_batches(alerts.filter(id__in=list(first)), batch_size)
+            raise KeyboardInterrupt
+
+        with mock.patch.object(retention, 'delete_in_batches', interrupted):
+            with self.assertRaises(KeyboardInterrupt):
+                prune_day(DAY, batch_size=10)
+        self.assertEqual(SnortAlert.objects.count(), 18)
+
+        result = prune_day(DAY, batch_size=10)
+        self.assertEqual(result.rows, 15)
+        self.assertEqual(AlertArchive.objects.count(), 1)
+        self.assertEqual(SnortAlert.objects.count(), 3)
+
+    def test_late_alerts_go_to_another_part(self):
+        first = prune_day(DAY)
+        seed(2, first=100)
+        second = prune_day(DAY)
+        self.assertNotEqual(first.archive.path, second.archive.path)
+        self.assertEqual(archived_messages(second.archive), ['alert 100', 'alert 101'])
+        self.assertEqual(second.rows, 2)
+
+    def test_missing_archive_file_is_gone(self):
+        archive = prune_day(DAY).archive
+        self.assertEqual(len(query_archive(archive, {'priority': '2'})), 25)
+        os.unlink(archive.path)
+        with self.assertRaises(ArchiveMissingError):
+            query_archive(archive)
+
+        self.client.force_login(User.objects.create_user('analyst'))
+        url = f"/api/alerts/archive/{archive.pk}/"
+        self.assertEqual(self.client.get(url).status_code, 410)
+        self.assertEqual(self.client.get(url, {'download': 1}).status_code, 410)
@@ -0,0 +1,64 @@
+import tempfile
+from types import SimpleNamespace
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from network_monitor.models import SnortRule
+from network_monitor.utils import SnortRuleManager
+
+RULE_TABLE = SnortRule._meta.db_table
+
+
+def rule(sid):
+    return f'alert tcp any any -> any {sid % 60000} (msg:"test {sid}"; sid:{sid}; rev:1;)'
+
+
+class ReloadingController:
+    def reload(self):
+        return SimpleNamespace(success=True)
+
+
+class RuleTransactionSyncTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.manager = SnortRuleManager(directory.name, controller=ReloadingController())
+        with self.manager.transaction() as txn:
+            for sid in range(1000001, 1000051):
+                txn.add(rule(sid))
+
+    def rule_reads(self, edit):
+        """Run `edit` in a transaction, returning the SnortRule SELECTs it made"""
+        with CaptureQueriesContext(connection) as queries:
+            with self.manager.transaction() as txn:
+                edit(txn)
+        return [query['sql'] for query in queries
+                if query['sql'].startswith('SELECT') and RULE_TABLE in query['sql']]
+
+    def test_add_reads_only_the_added_rule(self):
+        reads = self.rule_reads(lambda txn: txn.add(rule(1000100)))
+        self.assertEqual(len(reads), 1)
+        self.assertIn('IN (', reads[0])
+        self.assertEqual(SnortRule.objects.count(), 51)
+        self.assertTrue(SnortRule.objects.filter(sid=1000100, is_active=True).exists())
+
+    def test_remove_deletes_only_the_removed_rule(self):
+        reads = self.rule_reads(lambda txn: txn.remove(rule(1000001)))
+        self.assertEqual(len(reads), 1)
+        self.assertIn('IN (', reads[0])
+        self.assertFalse(SnortRule.objects.filter(sid=1000001).exists())
+        self.assertEqual(SnortRule.objects.count(), 49)
+
+    def test_unchanged_commit_reads_nothing(self):
+        self.assertEqual(self.rule_reads(lambda txn: txn.add(rule(1000001))), [])
+
+    def test_replace_all_repairs_drifted_rows(self):
+        SnortRule.objects.filter(sid=1000002).update(is_active=False)
+        SnortRule.objects.create(rule_content=rule(1000200), rule_hash='drifted', sid=1000200)
+        with self.manager.transaction() as txn:
+            txn.replace_all([rule(sid) for sid in range(1000001, 1000051)])
+        self.assertFalse(SnortRule.objects.filter(rule_hash='drifted').exists())
+        self.assertTrue(SnortRule.objects.get(sid=1000002).is_active)
+        self.assertEqual(SnortRule.objects.count(), 50)
@@ -0,0 +1,125 @@
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from network_monitor.snort_control import PidFileSnortService, SnortController
+
+# Stands in for Snort: writes its pid file once started, then on SIGHUP
+# reloads without stopping ('hot'), re-initialises in place, removing the
+# pid file until it is done ('inplace'), or exits ('die')
+FAKE_SNORT = '''
+import os, signal, sys, time
+
+pid_file, mode, delay = sys.argv[1], sys.argv[2], float(sys.argv[3])
+
+def write_pid_file():
+    with open(pid_file + '.tmp', 'w') as f:
+        f.write(str(os.getpid()))
+    os.replace(pid_file + '.tmp', pid_file)
+
+def hup(signum, frame):
+    if mode == 'inplace':
+        os.unlink(pid_file)
+        time.sleep(delay)
+        write_pid_file()
+    elif mode == 'die':
+        sys.exit(1)
+
+signal.signal(signal.SIGHUP, hup)
+write_pid_file()
+while True:
+    time.sleep(0.01)
+'''
+
+
+class FakeSnort:
+    """Start the fake Snort and reap it as soon as it exits, so a dead one isn't seen running"""
+    def __init__(self, directory):
+        self.script = os.path.join(directory, 'fake_snort.py')
+        with open(self.script, 'w') as f:
+            f.write(FAKE_SNORT)
+        self.pid_file = os.path.join(directory, 'snort.pid')
+        self.processes = []
+
+    def start(self, mode, delay=0.5):
+        process = subprocess.Popen([sys.executable, self.script, self.pid_file, mode, str(delay)])
+        self.processes.append(process)
+        threading.Thread(target=process.wait, daemon=True).start()
+        deadline = time.monotonic() + 10
+        while self._pid() != process.pid:
+            if time.monotonic() > deadline:
+                raise RuntimeError('fake Snort did not write its pid file')
+            time.sleep(0.01)
+        return process
+
+    def _pid(self):
+        try:
+            with open(self.pid_file) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def stop(self):
+        for process in self.processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+                process.wait()
+
+
+class SnortControllerTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.snort = FakeSnort(directory.name)
+        self.addCleanup(self.snort.stop)
+        self.restarts = []
+
+    def controller(self):
+        def run(command):
+            # restart_command: a new fake Snort replacing the one that died
+            self.restarts.append(self.snort.start('hot'))
+            return subprocess.CompletedProcess(command, 0)
+        service = PidFileSnortService(self.snort.pid_file, restart_command=['restart'], run=run)
+        return SnortController(service, reload_grace=0.3, restart_timeout=5, poll_interval=0.02)
+
+    def test_hot_reload_keeps_inspecting(self):
+        process = self.snort.start('hot')
+        result = self.controller().reload()
+        self.assertEqual((result.mode, result.success, result.interruption), ('reload', True, 0.0))
+        self.assertIsNone(process.poll())
+        self.assertEqual(self.restarts, [])
+
+    def test_in_place_reload_is_timed_from_the_pid_file(self):
+        self.snort.start('inplace', delay=0.5)
+        result = self.controller().reload()
+        self.assertEqual((result.mode, result.success), ('reload', True))
+        # Longer than the grace period: the missing pid file extends the wait
+        self.assertGreaterEqual(result.interruption, 0.4)
+        self.assertLess(result.interruption, 3)
+        self.assertEqual(self.restarts, [])
+
+    def test_snort_dying_on_reload_is_restarted(self):
+        process = self.snort.start('die')
+        result = self.controller().reload()
+        self.assertEqual((result.mode, result.success), ('restart', True))
+        self.assertIsNotNone(process.poll())
+        self.assertEqual(len(self.restarts), 1)
+
+    def test_snort_not_running_is_restarted(self):
+        result = self.controller().reload()
+        self.assertEqual((result.mode, result.success), ('restart', True))
+        self.assertEqual(len(self.restarts), 1)
+
+    def test_interruption_unknown_without_pid_file(self):
+        self.snort.start('hot')
+        controller = self.controller()
+        controller.service.initialised_at = lambda: None
+        result = controller.reload()
+        self.assertEqual((result.mode, result.success, result.interruption),
+                         ('reload', True, None))
@@ -0,0 +1,100 @@
+import random
+import tempfile
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+
+from network_monitor import talkers
+from network_monitor.ingest import AlertBatchWriter, AlertCoalescer
+from network_monitor.talkers import TALKER_DIMENSIONS, exact_top_talkers, top_talkers
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                            'LOCATION': 'talkers'}}
+
+
+def alert(i, now, source, destination, priority=2, classification='Misc activity'):
+    return {
+        'timestamp': datetime.fromtimestamp(now - 300 + i % 240, dt_timezone.utc),
+        'priority': priority,
+        'classification': classification,
+        'source_ip': source,
+        'destination_ip': destination,
+        'message': f"alert from {source}",
+        'packet_data': None,
+        'gid': 1,
+        'sid': 1000001,
+        'rev': 1,
+    }
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class TopTalkersTests(TransactionTestCase):
+    """The sketches ingest publishes agree with counting SnortAlert exactly"""
+    # Written through the writer alias, which must commit before default reads
+    databases = {'default', 'writer'}
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # No dashboards are listening, so published alerts go nowhere
+        push_dir = override_settings(SNORT_PUSH_SOCKET_DIR=directory.name)
+        push_dir.enable()
+        self.addCleanup(push_dir.disable)
+        cache.clear()
+        talkers._aggregator = None
+        self.addCleanup(setattr, talkers, '_aggregator', None)
+        self.now = time.time()
+
+    def ingest(self, alerts, coalescer=None):
+        writer = AlertBatchWriter(batch_size=200, coalescer=coalescer)
+        for alert_data in alerts:
+            writer.add(alert_data)
+        writer.flush()
+
+    def assertAgree(self, exact_when_complete=True, **kwargs):
+        for by in TALKER_DIMENSIONS:
+            estimated = top_talkers(by, now=self.now, **kwargs)
+            if exact_when_complete:
+                self.assertEqual(estimated, exact_top_talkers(by, now=self.now, **kwargs), by)
+                continue
+            counts = {tuple(row[field] for field in TALKER_DIMENSIONS[by]): row['count']
+                      for row in exact_top_talkers(by, now=self.now, limit=None, **kwargs)}
+            # Every estimate bounds the true count from above, within its error
+            for row in estimated:
+                key = tuple(row[field] for field in TALKER_DIMENSIONS[by])
+                self.assertLessEqual(row['count'] - row['error'], counts.get(key, 0), by)
+                self.assertGreaterEqual(row['count'], counts.get(key, 0), by)
+
+    def test_counts_match_while_sketches_hold_every_key(self):
+        alerts = [alert(i, self.now, f"10.0.0.{i % 7 + 1}", f"192.0.2.{i % 3 + 1}",
+                        priority=i % 3 + 1, classification=f"class {i % 4}")
+                  for i in range(600)]
+        self.ingest(alerts)
+        self.assertAgree()
+        self.assertAgree(priority=1)
+
+    def test_coalesced_alerts_count_every_repeat(self):
+        # Repeats fold into a few rows, some grown again by the second batch
+        alerts = [alert(i, self.now, f"10.0.0.{i % 5 + 1}", '192.0.2.1') for i in range(400)]
+        coalescer = AlertCoalescer(window=600)
+        self.ingest(alerts[:250], coalescer)
+        self.ingest(alerts[250:], coalescer)
+        self.assertEqual(talkers.SnortAlert.objects.count(), 5)
+        self.assertAgree()
+        self.assertEqual(top_talkers('destination_ip', now=self.now)[0]['count'], 400)
+
+    @override_settings(SNORT_TALKER_CAPACITY=16)
+    def test_heavy_hitters_survive_a_full_sketch(self):
+        rng = random.Random(7)
+        heavy = ['10.0.0.1'] * 600 + ['10.0.0.2'] * 400 + ['10.0.0.3'] * 250
+        sources = heavy + [f"10.1.{rng.randrange(256)}.{rng.randrange(256)}" for _ in range(1500)]
+        rng.shuffle(sources)
+        alerts = [alert(i, self.now, source, f"192.0.2.{rng.randrange(64)}")
+                  for i, source in enumerate(sources)]
+        self.ingest(alerts)
+        self.assertAgree(exact_when_complete=False)
+        estimated = top_talkers('source_ip', limit=3, now=self.now)
+        self.assertEqual([row['source_ip'] for row in estimated],
+                         ['10.0.0.1', '10.0.0.2', '10.0.0.3'])
@@ -0,0 +1,118 @@
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from network_monitor.telemetry import (
+    COUNTERS, InterfaceSeries, RollupRing, TelemetrySampler, counter_rates, read_counters,
+    telemetry_points,
+)
+from network_monitor.tests.sysfs import FakeSysfs
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                            'LOCATION': 'telemetry'}}
+
+
+def write_counters(sysfs, name, **values):
+    statistics = os.path.join(sysfs.root, name, 'statistics')
+    os.makedirs(statistics, exist_ok=True)
+    for counter in COUNTERS:
+        with open(os.path.join(statistics, counter), 'w') as f:
+            f.write(f"{values.get(counter, 0)}\n")
+
+
+class CounterRateTests(SimpleTestCase):
+    def test_rates_sum_drops_and_errors_in_both_directions(self):
+        previous = (1000, 2000, 10, 20, 1, 2, 0, 1)
+        current = (3000, 2500, 30, 25, 5, 4, 2, 1)
+        self.assertEqual(counter_rates(previous, current, 2.0),
+                         (1000.0, 250.0, 10.0, 2.5, 3.0, 1.0))
+
+    def test_reset_counters_give_no_rate(self):
+        self.assertIsNone(counter_rates((100,) * 8, (0,) * 8, 1.0))
+        self.assertIsNone(counter_rates((0,) * 8, (0,) * 8, 0))
+
+    def test_read_counters_skips_loopback_and_unreadable_interfaces(self):
+        with tempfile.TemporaryDirectory() as root:
+            sysfs = FakeSysfs(root)
+            for name in ('lo', 'eth0', 'eth1'):
+                sysfs.add_interface(name)
+            write_counters(sysfs, 'lo', rx_bytes=1)
+            write_counters(sysfs, 'eth0', rx_bytes=5, tx_errors=2)
+            self.assertEqual(read_counters(root), {'eth0': (5, 0, 0, 0, 0, 0, 0, 2)})
+
+
+class DownsamplingTests(SimpleTestCase):
+    def test_rollup_keeps_mean_and_peak_per_period(self):
+        ring = RollupRing(60, size=10)
+        closed = [ring.add(t, (float(t % 60), 1.0)) for t in (0, 30, 59, 60, 119)]
+        self.assertEqual(closed, [False, False, False, True, False])
+        self.assertEqual(list(ring.points), [(0, (89 / 3, 1.0), (59.0, 1.0))])
+        self.assertEqual(ring.open_period(), (60, 2, (59.0, 2.0), (59.0, 1.0)))
+
+    def test_rings_are_bounded(self):
+        ring = RollupRing(1, size=3)
+        for t in range(10):
+            ring.add(t, (1.0,))
+        self.assertEqual([point[0] for point in ring.points], [6, 7, 8])
+
+    def test_one_second_samples_roll_up_to_minutes_and_hours(self):
+        series = InterfaceSeries(raw_points=120)
+        changed = set()
+        # Two hours of samples: 1 byte/s in the first hour, 3 in the second
+        for t in range(7200):
+            changed |= series.add(t, (1.0 if t < 3600 else 3.0,) * 6)
+        series.add(7200, (0.0,) * 6)
+        self.assertEqual(changed, {'1s', '1m', '1h'})
+        self.assertEqual(len(series.points('1s')), 120)
+        minutes = series.points('1m')
+        self.assertEqual(len(minutes), 120)
+        self.assertEqual((minutes[0]['t'], minutes[0]['rx_bytes_s']), (0, 1.0))
+        self.assertEqual((minutes[-1]['t'], minutes[-1]['drops_s']), (7140, 3.0))
+        hours = series.points('1h')
+        self.assertEqual([(point['t'], point['rx_bytes_s']) for point in hours],
+                         [(0, 1.0), (3600, 3.0)])
+        self.assertEqual(hours[1]['peak']['errors_s'], 3.0)
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class TelemetrySamplerTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.sysfs = FakeSysfs(directory.name)
+        self.sysfs.add_interface('eth0')
+        cache.clear()
+
+    def test_samples_are_published_for_other_processes(self):
+        self.assertIsNone(telemetry_points())
+        sampler = TelemetrySampler(root=self.sysfs.root, interval=0.5)
+        write_counters(self.sysfs, 'eth0', rx_bytes=0)
+        sampler.publish(sampler.sample())
+        write_counters(self.sysfs, 'eth0', rx_bytes=1000, rx_dropped=10)
+        sampler.publish(sampler.sample())
+
+        interval, interfaces = telemetry_points()
+        self.assertEqual(interval, 0.5)
+        point, = interfaces['eth0']
+        self.assertGreater(point['rx_bytes_s'], 0)
+        self.assertAlmostEqual(point['rx_bytes_s'] / point['drops_s'], 100)
+
+    def test_history_survives_a_restart(self):
+        sampler = TelemetrySampler(root=self.sysfs.root)
+        for t in range(150):
+            sampler.series.setdefault('eth0', InterfaceSeries()).add(t, (float(t),) * 6)
+        sampler.publish({'1s', '1m', '1h'})
+
+        restarted = TelemetrySampler(root=self.sysfs.root)
+        restarted.load()
+        self.assertEqual(restarted.points('1m'), sampler.points('1m'))
+        self.assertEqual(restarted.points('1s'), sampler.points('1s'))
+        # The minute still being filled carries on where it left off
+        series = restarted.series['eth0']
+        self.assertEqual(series.minutes.open_period(),
+                         sampler.series['eth0'].minutes.open_period())
+        series.add(180, (0.0,) * 6)
+        self.assertEqual(series.points('1m')[-1]['t'], 120)
+        self.assertEqual(series.points('1m')[-1]['rx_bytes_s'], sum(range(120, 150)) / 30)
@@ -0,0 +1,155 @@
+import os
+import socket
+import tempfile
+
+from django.test import SimpleTestCase, TransactionTestCase
+
+from network_monitor.ingest import AlertBatchWriter
+from network_monitor.models import SnortAlert
+from network_monitor.unified2 import (
+    EVENT_FORMATS, EXTRA_DATA_HEADER, PACKET_HEADER, RECORD_HEADER, UNIFIED2_EXTRA_DATA,
+    UNIFIED2_IDS_EVENT_IPV6_V2, UNIFIED2_IDS_EVENT_V2, UNIFIED2_PACKET, WALDO, Event, ExtraData,
+    Packet, Unified2Spool, decode_record, iter_records,
+)
+from network_monitor.utils import monitor_unified2_alerts
+
+
+def record(record_type, body):
+    return RECORD_HEADER.pack(record_type, len(body)) + body
+
+
+def event(event_id, sid=1000001, priority=2, source='10.0.0.1', destination='10.0.0.2',
+          ipv6=False):
+    record_type = UNIFIED2_IDS_EVENT_IPV6_V2 if ipv6 else UNIFIED2_IDS_EVENT_V2
+    fmt, family = EVENT_FORMATS[record_type]
+    body = fmt.pack(1, event_id, 1700000000 + event_id, 250000, sid, 1, 3, 1, priority,
+                    socket.inet_pton(family, source), socket.inet_pton(family, destination),
+                    1234, 80, 6, 0, 0, 0, 0, 0, 0)
+    return record(record_type, body)
+
+
+def packet(event_id, data=b'\x45\x00payload'):
+    body = PACKET_HEADER.pack(1, event_id, 1700000000 + event_id, 1700000000 + event_id, 0, 1,
+                              len(data)) + data
+    return record(UNIFIED2_PACKET, body)
+
+
+def extra_data(event_id, data=b'user'):
+    body = EXTRA_DATA_HEADER.pack(4, len(data) + 8, 1, event_id, 1700000000 + event_id, 7, 1,
+                                  len(data) + 8) + data
+    return record(UNIFIED2_EXTRA_DATA, body)
+
+
+class RecordDecodingTests(SimpleTestCase):
+    def test_event(self):
+        decoded = decode_record(UNIFIED2_IDS_EVENT_V2, event(7)[RECORD_HEADER.size:])
+        self.assertIsInstance(decoded, Event)
+        self.assertEqual((decoded.event_id, decoded.signature_id, decoded.priority_id),
+                         (7, 1000001, 2))
+        self.assertEqual((decoded.source_ip, decoded.destination_ip), ('10.0.0.1', '10.0.0.2'))
+
+    def test_ipv6_event(self):
+        data = event(8, source='2001:db8::1', destination='2001:db8::2', ipv6=True)
+        decoded = decode_record(UNIFIED2_IDS_EVENT_IPV6_V2, data[RECORD_HEADER.size:])
+        self.assertEqual((decoded.source_ip, decoded.destination_ip),
+                         ('2001:db8::1', '2001:db8::2'))
+
+    def test_packet_and_extra_data_are_views(self):
+        records = list(iter_records(packet(3) + extra_data(3)))
+        decoded = [decode_record(record_type, body) for record_type, body, _ in records]
+        self.assertIsInstance(decoded[0], Packet)
+        self.assertIsInstance(decoded[0].data, memoryview)
+        self.assertEqual(bytes(decoded[0].data), b'\x45\x00payload')
+        self.assertIsInstance(decoded[1], ExtraData)
+        self.assertEqual(bytes(decoded[1].data), b'user')
+
+    def test_iteration_stops_at_truncated_record(self):
+        data = event(1) + packet(1)
+        records = list(iter_records(data + event(2)[:-5]))
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[-1][2], len(data))
+
+
+class Unified2SpoolTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.spool_dir = os.path.join(self.directory.name, 'spool')
+        os.makedirs(self.spool_dir)
+        self.waldo_file = os.path.join(self.directory.name, 'snort.waldo')
+
+    def write(self, timestamp, data, mode='ab'):
+        with open(os.path.join(self.spool_dir, f"snort.u2.{timestamp}"), mode) as f:
+            f.write(data)
+
+    def spool(self):
+        return Unified2Spool(self.spool_dir, waldo_file=self.waldo_file,
+                             classifications={1: 'Attempted Recon'},
+                             messages={(1, 1000001): 'Probe'})
+
+    def test_events_across_spool_files(self):
+        self.write(100, event(1) + packet(1) + extra_data(1) + event(2) + packet(2))
+        self.write(200, event(3) + packet(3))
+        alerts = self.spool().read_alerts()
+        self.assertEqual([alert['timestamp'].timestamp() for alert in alerts],
+                         [1700000001.25, 1700000002.25, 1700000003.25])
+        self.assertEqual(alerts[0]['message'], 'Probe')
+        self.assertEqual(alerts[0]['classification'], 'Attempted Recon')
+        self.assertEqual(alerts[0]['packet_data'], b'\x45\x00payload'.hex())
+
+    def test_newest_event_waits_for_its_packet(self):
+        self.write(100, event(1) + packet(1) + event(2))
+        spool = self.spool()
+        self.assertEqual(len(spool.read_alerts()), 1)
+        self.write(100, packet(2))
+        alert, = spool.read_alerts()
+        self.assertEqual(alert['packet_data'], b'\x45\x00payload'.hex())
+
+    def test_bounded_passes_resume_from_waldo(self):
+        self.write(100, b''.join(event(i) + packet(i) for i in range(1, 26)))
+        spool = self.spool()
+        first = spool.read_alerts(10)
+        self.assertEqual(len(first), 10)
+        self.assertEqual(spool.position, (100, 20))
+        spool.save()
+
+        restarted = self.spool()
+        self.assertEqual(restarted.position, (100, 20))
+        rest = restarted.read_alerts(10) + restarted.read_alerts(10)
+        self.assertEqual(len(rest), 15)
+        self.assertEqual(len({alert['timestamp'] for alert in first + rest}), 25)
+
+    def test_waldo_is_barnyard2_compatible(self):
+        self.write(100, event(1) + packet(1))
+        spool = self.spool()
+        spool.read_alerts()
+        spool.save()
+        with open(self.waldo_file, 'rb') as f:
+            directory, filebase, timestamp, record_idx = WALDO.unpack(f.read())
+        self.assertEqual(directory.rstrip(b'\0').decode(), self.spool_dir)
+        self.assertEqual(filebase.rstrip(b'\0'), b'snort.u2')
+        self.assertEqual((timestamp, record_idx), (100, 2))
+
+
+class MonitorUnified2Tests(TransactionTestCase):
+    # The writer alias is its own connection to the test database, so its
+    # inserts must commit before the default connection can read them
+    databases = {'default', 'writer'}
+
+    def test_waldo_saved_once_alerts_are_stored(self):
+        with tempfile.TemporaryDirectory() as directory:
+            waldo_file = os.path.join(directory, 'snort.waldo')
+            with open(os.path.join(directory, 'snort.u2.100'), 'wb') as f:
+                f.write(b''.join(event(i) + packet(i) for i in range(1, 6)))
+            spool = Unified2Spool(directory, waldo_file=waldo_file, classifications={},
+                                  messages={})
+            writer = AlertBatchWriter(batch_size=100, publish=False)
+
+            monitor_unified2_alerts(spool, writer, max_alerts=2)
+            self.assertEqual(writer.pending, 5)
+            self.assertFalse(os.path.exists(waldo_file))
+
+            writer.flush()
+            self.assertEqual(SnortAlert.objects.count(), 5)
+            with open(waldo_file, 'rb') as f:
+                self.assertEqual(WALDO.unpack(f.read())[2:], (100, 10))
@@ -0,0 +1,76 @@
+import gzip
+import json
+from datetime import datetime, timezone as dt_timezone
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from network_monitor.export import accepts_gzip
+from network_monitor.models import AlertRollup, SnortAlert
+
+START = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class AlertApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i, source in enumerate(('10.0.0.1', '10.0.0.2', '192.0.2.1')):
+            SnortAlert.objects.create(timestamp=START, priority=2, classification='Misc',
+                                      source_ip=source, destination_ip='192.0.2.9',
+                                      message=f"alert {i}")
+        AlertRollup.objects.create(bucket=START, priority=2, classification='Misc', count=3)
+        cls.user = User.objects.create_user('analyst')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_approximate_count_from_rollups(self):
+        response = self.client.get('/api/alerts/')
+        self.assertEqual(response.json()['approximate_count'], 3)
+
+    def test_no_approximate_count_for_ip_filters(self):
+        for params in ({'source_ip': '10.0.0.0/8'}, {'destination_ip': '192.0.2.9'}):
+            data = self.client.get('/api/alerts/', params).json()
+            self.assertIsNone(data['approximate_count'], params)
+        data = self.client.get('/api/alerts/', {'source_ip': '10.0.0.0/8'}).json()
+        self.assertEqual(len(data['results']), 2)
+
+    def test_invalid_dates_are_rejected(self):
+        for params in ({'start_date': 'yesterday'}, {'end_date': '2025-13-01'}):
+            self.assertEqual(self.client.get('/api/alerts/', params).status_code, 400, params)
+            self.assertEqual(self.client.get('/api/alerts/export/', params).status_code, 400,
+                             params)
+
+    def test_export_date_range(self):
+        response = self.client.get('/api/alerts/export/', {'start_date': '2025-01-01',
+                                                           'end_date': '2025-01-01T00:00:00Z'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 3)
+
+    def test_export_gzip_only_when_accepted(self):
+        response = self.client.get('/api/alerts/export/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(gzip.decompress(b''.join(response.streaming_content)).splitlines()),
+                         3)
+        response = self.client.get('/api/alerts/export/', HTTP_ACCEPT_ENCODING='gzip;q=0, br')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+
+class AcceptsGzipTests(SimpleTestCase):
+    def test_accept_encoding(self):
+        cases = {
+            'gzip': True,
+            'deflate, gzip;q=0.5': True,
+            'GZIP': True,
+            '*': True,
+            '': False,
+            'gzip;q=0': False,
+            'gzip; q=0.0, br': False,
+            'x-gzip-foo': False,
+            'br, *;q=0': False,
+            '*;q=0.1, gzip;q=0': False,
+            'gzip;q=bogus': False,
+        }
+        for header, accepted in cases.items():
+            self.assertEqual(accepts_gzip(header), accepted, header)
@@ -0,0 +1,297 @@
+import logging
+import mmap
+import os
+import socket
+import struct
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from .tailer import Inotify, default_state_file
+
+logger = logging.getLogger(__name__)
+
+# Record types written by Snort's unified2 output plugin
+UNIFIED2_PACKET = 2
+UNIFIED2_IDS_EVENT = 7
+UNIFIED2_IDS_EVENT_IPV6 = 72
+UNIFIED2_IDS_EVENT_V2 = 104
+UNIFIED2_IDS_EVENT_IPV6_V2 = 105
+UNIFIED2_EXTRA_DATA = 110
+
+RECORD_HEADER = struct.Struct('>II')
+# sensor_id, event_id, event_second, event_microsecond, signature_id,
+# generator_id, signature_revision, classification_id, priority_id,
+# ip_source, ip_destination, sport_itype, dport_icode, protocol,
+# impact_flag, impact, blocked[, mpls_label, vlan_id, pad]
+EVENT_FORMATS = {
+    UNIFIED2_IDS_EVENT: (struct.Struct('>9I4s4sHHBBBB'), socket.AF_INET),
+    UNIFIED2_IDS_EVENT_IPV6: (struct.Struct('>9I16s16sHHBBBB'), socket.AF_INET6),
+    UNIFIED2_IDS_EVENT_V2: (struct.Struct('>9I4s4sHHBBBBIHH'), socket.AF_INET),
+    UNIFIED2_IDS_EVENT_IPV6_V2: (struct.Struct('>9I16s16sHHBBBBIHH'), socket.AF_INET6),
+}
+# sensor_id, event_id, event_second, packet_second, packet_microsecond,
+# linktype, packet_length
+PACKET_HEADER = struct.Struct('>7I')
+# event_type, event_length, sensor_id, event_id, event_second, type,
+# data_type, blob_length
+EXTRA_DATA_HEADER = struct.Struct('>8I')
+
+# barnyard2-compatible bookmark: spool_dir, spool_filebase, timestamp, record_idx
+WALDO = struct.Struct('=256s256sII')
+
+Event = namedtuple('Event', [
+    'sensor_id', 'event_id', 'event_second', 'event_microsecond', 'signature_id',
+    'generator_id', 'signature_revision', 'classification_id', 'priority_id',
+    'source_ip', 'destination_ip', 'sport_itype', 'dport_icode', 'protocol',
+    'blocked',
+])
+Packet = namedtuple('Packet', [
+    'sensor_id', 'event_id', 'event_second', 'packet_second', 'packet_microsecond',
+    'linktype', 'data',
+])
+ExtraData = namedtuple('ExtraData', ['sensor_id', 'event_id', 'event_second', 'type',
+                                     'data_type', 'data'])
+
+
+def decode_record(record_type, body):
+    """Decode one record body, or return None for record types we skip.
+
+    Packet and extra-data payloads are returned as slices of `body`, so
+    nothing is copied until the caller converts them.
+    """
+    if record_type in EVENT_FORMATS:
+        fmt, family = EVENT_FORMATS[record_type]
+        fields = fmt.unpack_from(body)
+        return Event(*fields[:9],
+                     socket.inet_ntop(family, fields[9]),
+                     socket.inet_ntop(family, fields[10]),
+                     fields[11], fields[12], fields[13], fields[16])
+    if record_type == UNIFIED2_PACKET:
+        fields = PACKET_HEADER.unpack_from(body)
+        start = PACKET_HEADER.size
+        return Packet(*fields[:6], body[start:start + fields[6]])
+    if record_type == UNIFIED2_EXTRA_DATA:
+        fields = EXTRA_DATA_HEADER.unpack_from(body)
+        start = EXTRA_DATA_HEADER.size
+        return ExtraData(fields[2], fields[3], fields[4], fields[5], fields[6],
+                         body[start:start + max(fields[7] - 8, 0)])
+    return None
+
+
+def iter_records(buffer, offset=0):
+    """Yield (record_type, body, next_offset) for every complete record.
+
+    Iteration stops at the first truncated record, which is where Snort
+    is still writing; resume from the last `next_offset` later.
+    """
+    view = memoryview(buffer)
+    end = len(view)
+    while offset + RECORD_HEADER.size <= end:
+        record_type, length = RECORD_HEADER.unpack_from(view, offset)
+        start = offset + RECORD_HEADER.size
+        if start + length > end:
+            break
+        offset = start + length
+        yield record_type, view[start:offset], offset
+
+
+def load_classifications(path='/etc/snort/classification.config'):
+    """Map classification ids to descriptions, numbered in file order"""
+    classifications = {}
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line.startswith('config classification:'):
+                    continue
+                parts = line.split(':', 1)[1].split(',')
+                if len(parts) >= 2:
+                    classifications[len(classifications) + 1] = parts[1].strip()
+    except OSError as e:
+        logger.warning(f"Could not read classifications from {path}: {e}")
+    return classifications
+
+
+def load_sid_msg_map(path='/etc/snort/sid-msg.map'):
+    """Map (gid, sid) to rule messages from a v1 or v2 sid-msg.map"""
+    messages = {}
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                parts = [part.strip() for part in line.split('||')]
+                if len(parts) < 2 or not parts[0].isdigit():
+                    continue
+                if len(parts) >= 6 and parts[1].isdigit():
+                    messages[(int(parts[0]), int(parts[1]))] = parts[5]
+                else:
+                    messages[(1, int(parts[0]))] = parts[1]
+    except OSError as e:
+        logger.warning(f"Could not read rule messages from {path}: {e}")
+    return messages
+
+
+class Unified2Spool:
+    """Read alerts from a directory of Snort unified2 spool files.
+
+    Spool files are named `<filebase>.<unix timestamp>` and memory-mapped
+    for reading. Progress is tracked in a barnyard2-compatible waldo file
+    (spool file timestamp plus record index), so ingestion resumes from
+    the bookmark after a restart. Each call to `read_alerts` decodes at
+    most `limit` events, so catching up on a large spool takes several
+    bounded passes rather than one unbounded list.
+    """
+    def __init__(self, directory='/var/log/snort', filebase='snort.u2', waldo_file=None,
+                 classifications=None, messages=None):
+        self.directory = directory
+        self.filebase = filebase
+        self.waldo_file = waldo_file or default_state_file(
+            os.path.join(directory, filebase), suffix='.waldo')
+        self.classifications = classifications if classifications is not None \
+            else load_classifications()
+        self.messages = messages if messages is not None else load_sid_msg_map()
+        self.timestamp = 0
+        self.record_idx = 0
+        self._offset = None
+        self._inotify = None
+        self._load_waldo()
+
+    def _load_waldo(self):
+        try:
+            with open(self.waldo_file, 'rb') as f:
+                data = f.read(WALDO.size)
+        except FileNotFoundError:
+            return
+        if len(data) != WALDO.size:
+            logger.warning(f"Ignoring malformed waldo file {self.waldo_file}")
+            return
+        _, _, self.timestamp, self.record_idx = WALDO.unpack(data)
+
+    @property
+    def position(self):
+        """(spool file timestamp, record index) just past the last event read"""
+        return self.timestamp, self.record_idx
+
+    def save(self, position=None):
+        """Persist `position`, or the current bookmark if not given"""
+        timestamp, record_idx = position or self.position
+        os.makedirs(os.path.dirname(self.waldo_file) or '.', exist_ok=True)
+        tmp_path = f"{self.waldo_file}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(WALDO.pack(os.fsencode(self.directory), os.fsencode(self.filebase),
+                               timestamp, record_idx))
+        os.replace(tmp_path, self.waldo_file)
+
+    def commit(self, position):
+        """Persist a bookmark the writer has stored every alert before"""
+        self.save(position)
+
+    def spool_files(self):
+        """Return (timestamp, path) for every spool file, oldest first"""
+        prefix = f"{self.filebase}."
+        files = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return files
+        for name in names:
+            suffix = name[len(prefix):]
+            if name.startswith(prefix) and suffix.isdigit():
+                files.append((int(suffix), os.path.join(self.directory, name)))
+        return sorted(files)
+
+    def read_alerts(self, limit=None):
+        """Return alert dicts for events recorded since the bookmark.
+
+        At most about `limit` alerts are returned; the bookmark stops at
+        the first event not returned, so call again until fewer come back.
+        """
+        alerts = []
+        files = [entry for entry in self.spool_files() if entry[0] >= self.timestamp]
+        for index, (timestamp, path) in enumerate(files):
+            if limit is not None and len(alerts) >= limit:
+                break
+            if timestamp != self.timestamp:
+                self.timestamp, self.record_idx, self._offset = timestamp, 0, None
+            is_active = index == len(files) - 1
+            self._read_file(path, alerts, is_active, limit)
+        return alerts
+
+    def _read_file(self, path, alerts, hold_last_event, limit):
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0 or (self._offset is not None and size <= self._offset):
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                self._read_records(mapped, alerts, hold_last_event, limit)
+
+    def _read_records(self, mapped, alerts, hold_last_event, limit):
+        offset, skip = self._offset, 0
+        if offset is None:
+            offset, skip = 0, self.record_idx
+        alert = body = record = None
+        for record_type, body, next_offset in iter_records(mapped, offset):
+            record_start, offset = offset, next_offset
+            if skip:
+                skip -= 1
+                continue
+            record = decode_record(record_type, body)
+            if isinstance(record, Event):
+                if alert is not None:
+                    alerts.append(alert)
+                    alert = None
+                if limit is not None and len(alerts) >= limit:
+                    # Leave this event for the next pass
+                    offset = record_start
+                    break
+                alert = self._event_to_alert(record)
+                event_id, event_start, event_idx = record.event_id, record_start, self.record_idx
+            elif isinstance(record, Packet) and alert is not None \
+                    and record.event_id == event_id and alert['packet_data'] is None:
+                alert['packet_data'] = record.data.hex()
+            self.record_idx += 1
+        # Drop every view into the map before it is closed
+        body = record = None
+        if alert is not None:
+            if hold_last_event and self.record_idx == event_idx + 1:
+                # The event is the newest record; Snort writes its packet next
+                offset, self.record_idx = event_start, event_idx
+            else:
+                alerts.append(alert)
+        self._offset = offset
+
+    def _event_to_alert(self, event):
+        key = (event.generator_id, event.signature_id)
+        message = self.messages.get(key) or \
+            f"Snort alert [{event.generator_id}:{event.signature_id}:{event.signature_revision}]"
+        return {
+            'timestamp': datetime.fromtimestamp(
+                event.event_second + event.event_microsecond / 1e6, tz=timezone.utc),
+            'priority': event.priority_id,
+            'classification': self.classifications.get(event.classification_id, ''),
+            'source_ip': event.source_ip,
+            'destination_ip': event.destination_ip,
+            'message': message,
+            'packet_data': None,
+            'gid': event.generator_id,
+            'sid': event.signature_id,
+            'rev': event.signature_revision,
+        }
+
+    def wait(self, timeout):
+        """Sleep until a spool file changes, or at most `timeout` seconds"""
+        if self._inotify is None:
+            try:
+                self._inotify = Inotify(os.path.join(self.directory, self.filebase))
+            except (OSError, AttributeError) as e:
+                logger.info(f"inotify unavailable ({e}), polling {self.directory}")
+                self._inotify = False
+        if self._inotify:
+            self._inotify.wait(timeout)
+        else:
+            time.sleep(timeout)
+
+    def close(self):
+        if self._inotify:
+            self._inotify.close()
+        self._inotify = None
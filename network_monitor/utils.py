@@ -1,95 +1,52 @@
 import subprocess
-import re
-import json
 import logging
-import psutil
-from datetime import datetime
-from .models import NetworkInterface, SnortAlert, BridgeConfiguration
+from .models import NetworkInterface
+from .netstate import get_collector
+from .parsers import SnortAlertParser
+from .stats import cached_stats
+from .rules import RuleTransaction, load_rule_index
+from .snort_control import SnortController
 
 logger = logging.getLogger(__name__)
 
 def get_network_interfaces():
     """Get all network interfaces except loopback"""
-    interfaces = []
-    for iface, addrs in psutil.net_if_addrs().items():
-        if iface != 'lo':
-            mac = next((addr.address for addr in addrs if addr.family == psutil.AF_LINK), None)
-            ip = next((addr.address for addr in addrs if addr.family == socket.AF_INET), None)
-            interfaces.append({
-                'name': iface,
-                'mac': mac,
-                'ip': ip
-            })
-    return interfaces
-
-def manage_bridge(action, bridge_name='br0', interfaces=None):
-    """Manage network bridge"""
-    try:
-        if action == 'create':
-            subprocess.run(['sudo', 'brctl', 'addbr', bridge_name], check=True)
-            for iface in interfaces:
-                subprocess.run(['sudo', 'ip', 'link', 'set', iface, 'down'], check=True)
-                subprocess.run(['sudo', 'brctl', 'addif', bridge_name, iface], check=True)
-                subprocess.run(['sudo', 'ip', 'link', 'set', iface, 'up'], check=True)
-            subprocess.run(['sudo', 'ip', 'link', 'set', bridge_name, 'up'], check=True)
-            return True
-        elif action == 'delete':
-            subprocess.run(['sudo', 'ip', 'link', 'set', bridge_name, 'down'], check=True)
-            subprocess.run(['sudo', 'brctl', 'delbr', bridge_name], check=True)
-            for iface in interfaces:
-                subprocess.run(['sudo', 'ip', 'link', 'set', iface, 'up'], check=True)
-            return True
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Bridge operation failed: {e}")
-        return False
+    return [
+        {
+            'name': iface.name,
+            'mac': iface.mac,
+            'ip': iface.ip,
+            'operstate': iface.operstate,
+            'master': iface.master,
+        }
+        for iface in get_collector().interfaces()
+    ]
 
 def parse_snort_alert(alert_line):
-    """Parse Snort alert from unified2 format"""
-    pattern = r'\[(?P<timestamp>.*?)\] \[(?P<classification>.*?)\] ' \
-             r'(?P<message>.*?) {(?P<protocol>.*?)} ' \
-             r'(?P<src_ip>\d+\.\d+\.\d+\.\d+):(?P<src_port>\d+) -> ' \
-             r'(?P<dst_ip>\d+\.\d+\.\d+\.\d+):(?P<dst_port>\d+)'
-    
-    match = re.match(pattern, alert_line)
-    if match:
-        return {
-            'timestamp': datetime.strptime(match.group('timestamp'), '%Y-%m-%d %H:%M:%S.%f'),
-            'classification': match.group('classification'),
-            'message': match.group('message'),
-            'protocol': match.group('protocol'),
-            'source_ip': match.group('src_ip'),
-            'source_port': match.group('src_port'),
-            'destination_ip': match.group('dst_ip'),
-            'destination_port': match.group('dst_port')
-        }
-    return None
+    """Parse a single Snort fast-alert line into SnortAlert fields"""
+    return SnortAlertParser().parse_line(alert_line)
+
+def monitor_unified2_alerts(spool, writer, max_alerts=10000):
+    """Ingest unified2 events recorded since the spool's waldo bookmark.
 
-def monitor_snort_alerts(alert_file='/var/log/snort/alert'):
-    """Monitor Snort alert file and update database"""
+    The spool is read `max_alerts` events at a time, and the bookmark after
+    each pass is saved once the writer has stored that pass's alerts.
+    """
     try:
-        with open(alert_file, 'r') as f:
-            for line in f:
-                alert_data = parse_snort_alert(line)
-                if alert_data:
-                    SnortAlert.objects.create(**alert_data)
+        while True:
+            alerts = spool.read_alerts(max_alerts)
+            for alert_data in alerts:
+                writer.add(alert_data)
+            writer.mark(spool, spool.position)
+            if len(alerts) < max_alerts:
+                break
+        writer.flush_if_due()
     except Exception as e:
-        logger.error(f"Error monitoring Snort alerts: {e}")
+        logger.error(f"Error monitoring unified2 spool: {e}")
 
 def get_bridge_status(bridge_name='br0'):
     """Get current bridge status"""
-    try:
-        result = subprocess.run(['brctl', 'show', bridge_name], 
-                              capture_output=True, text=True, check=True)
-        interfaces = re.findall(r'eth\d+|wlan\d+', result.stdout)
-        return {
-            'active': True,
-            'interfaces': interfaces
-        }
-    except subprocess.CalledProcessError:
-        return {
-            'active': False,
-            'interfaces': []
-        }
+    return get_collector().bridge_status(bridge_name)
 
 def manage_snort_service(action):
     """Manage Snort service"""
@@ -103,14 +60,7 @@ def manage_snort_service(action):
 def get_snort_stats():
     """Get Snort statistics"""
     try:
-        alerts = SnortAlert.objects.all()
-        return {
-            'total_alerts': alerts.count(),
-            'high_priority': alerts.filter(priority=1).count(),
-            'medium_priority': alerts.filter(priority=2).count(),
-            'low_priority': alerts.filter(priority=3).count(),
-            'recent_alerts': alerts.order_by('-timestamp')[:10]
-        }
+        return cached_stats()
     except Exception as e:
         logger.error(f"Error getting Snort stats: {e}")
         return None
@@ -128,23 +78,32 @@ def validate_bridge_config(interfaces):
 
 class SnortRuleManager:
     """Manage Snort rules"""
-    def __init__(self, rules_path='/etc/snort/rules'):
+    def __init__(self, rules_path='/etc/snort/rules', controller=None):
         self.rules_path = rules_path
+        self.controller = controller or SnortController()
+
+    @property
+    def rules_file(self):
+        return f"{self.rules_path}/local.rules"
+
+    def transaction(self, category='', force=False):
+        """Batch many rule edits into one file write and one reload"""
+        return RuleTransaction(self, category, force)
+
+    def lookup(self, sid, gid=1):
+        """Parsed rule for a gid:sid in local.rules, or None"""
+        return load_rule_index(self.rules_file).lookup(sid, gid)
 
-    def add_rule(self, rule_content):
-        with open(f"{self.rules_path}/local.rules", 'a') as f:
-            f.write(f"\n{rule_content}")
-        return self.reload_snort()
+    def add_rule(self, rule_content, category='', force=False):
+        with self.transaction(category, force) as txn:
+            txn.add(rule_content)
+        return txn.reloaded
 
     def remove_rule(self, rule_content):
-        with open(f"{self.rules_path}/local.rules", 'r') as f:
-            rules = f.readlines()
-        
-        with open(f"{self.rules_path}/local.rules", 'w') as f:
-            for rule in rules:
-                if rule.strip() != rule_content.strip():
-                    f.write(rule)
-        return self.reload_snort()
+        with self.transaction() as txn:
+            txn.remove(rule_content)
+        return txn.reloaded
 
     def reload_snort(self):
-        return manage_snort_service('restart')
\ No newline at end of file
+        """Reload rules in place, restarting Snort only if the reload fails"""
+        return self.controller.reload().success
\ No newline at end of file
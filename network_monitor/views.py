@@ -1,23 +1,49 @@
 # views.py
+import asyncio
+import json
+import os
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView, TemplateView
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.shortcuts import redirect, render
-from django.urls import reverse_lazy
-from django.http import JsonResponse
-from rest_framework.viewsets import ModelViewSet
-from .models import NetworkInterface, BridgeConfiguration, SnortAlert, SnortRule
-from .utils import manage_bridge, get_snort_stats, get_bridge_status, SnortRuleManager
-from .serializers import AlertSerializer, InterfaceSerializer
+from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse, reverse_lazy
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.dateparse import parse_datetime
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
+from .models import (NetworkInterface, BridgeConfiguration, ControlJob, SnortAlert, SnortRule,
+                     AlertArchive)
+from .backpressure import ingest_metrics
+from .broker import get_broker
+from .ipindex import IP_FILTERS, filter_alerts_by_ip
+from .jobs import bridge_target, get_runner
+from .export import (COLUMNAR_FORMATS, EXPORT_FORMATS, accepts_gzip, alert_rows, gzip_chunks,
+                     pyarrow)
+from .pagination import AlertCursorPagination, keyset_page
+from .retention import ArchiveMissingError, query_archive
+from .rules import RuleSyntaxError, filter_rules, parse_rule
+from .stats import approximate_alert_count, top_noisy_rules
+from .talkers import TALKER_DIMENSIONS, exact_top_talkers, top_talkers, window_minutes
+from .telemetry import RESOLUTIONS, telemetry_points
+from .utils import get_snort_stats, get_bridge_status
+from .serializers import SnortAlertSerializer, NetworkInterfaceSerializer, ControlJobSerializer
 
 class DashboardView(LoginRequiredMixin, TemplateView):
     template_name = 'network_monitor/dashboard.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        snort_stats = get_snort_stats()
         context.update({
-            'snort_stats': get_snort_stats(),
+            'snort_stats': snort_stats,
             'bridge_status': get_bridge_status(),
-            'recent_alerts': SnortAlert.objects.order_by('-timestamp')[:10],
+            'recent_alerts': snort_stats['recent_alerts'] if snort_stats else [],
             'interfaces': NetworkInterface.objects.all()
         })
         return context
@@ -30,29 +56,32 @@ class BridgeConfigView(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         response = super().form_valid(form)
-        success = manage_bridge('create', 
-                              interfaces=form.cleaned_data['interfaces'])
-        if not success:
-            form.add_error(None, "Failed to create bridge")
-            return self.form_invalid(form)
+        interfaces = [iface.name for iface in form.cleaned_data['interfaces']]
+        job = get_runner().submit('bridge.create', bridge_target('br0'), bridge_name='br0',
+                                  interfaces=interfaces, config_id=self.object.pk)
+        messages.info(self.request, f"Creating bridge as job {job.pk}")
         return response
 
 class BridgeDeleteView(LoginRequiredMixin, DeleteView):
     model = BridgeConfiguration
     success_url = reverse_lazy('dashboard')
 
-    def delete(self, request, *args, **kwargs):
+    def form_valid(self, form):
         bridge = self.get_object()
-        success = manage_bridge('delete', interfaces=bridge.interfaces.all())
-        if success:
-            return super().delete(request, *args, **kwargs)
-        return JsonResponse({'error': 'Failed to delete bridge'}, status=400)
+        interfaces = [iface.name for iface in bridge.interfaces.all()]
+        job = get_runner().submit('bridge.delete', bridge_target('br0'), bridge_name='br0',
+                                  interfaces=interfaces, config_id=bridge.pk,
+                                  delete_config=True)
+        return JsonResponse({'job_id': job.pk, 'status_url': job_status_url(job)}, status=202)
+
+    def delete(self, request, *args, **kwargs):
+        return self.form_valid(None)
 
 class AlertListView(LoginRequiredMixin, ListView):
     model = SnortAlert
     template_name = 'network_monitor/alert_list.html'
     context_object_name = 'alerts'
-    paginate_by = 50
+    page_size = 50
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -62,60 +91,155 @@ class AlertListView(LoginRequiredMixin, ListView):
         if priority:
             filters['priority'] = priority
             
-        source_ip = self.request.GET.get('source_ip')
-        if source_ip:
-            filters['source_ip'] = source_ip
+        try:
+            queryset = filter_alerts_by_ip(queryset, self.request.GET)
+        except ValueError as e:
+            messages.error(self.request, f"Invalid address filter: {e}")
+            queryset = queryset.none()
             
-        return queryset.filter(**filters).order_by('-timestamp')
+        return queryset.filter(**filters).order_by('-timestamp', '-id')
+
+    def get_context_data(self, **kwargs):
+        try:
+            page = keyset_page(self.object_list, self.request.GET.get('cursor'), self.page_size)
+        except ValueError:
+            page = keyset_page(self.object_list, None, self.page_size)
+        context = super().get_context_data(object_list=page.object_list, **kwargs)
+        context.update({
+            'next_url': self._page_url(page.next_cursor),
+            'previous_url': self._page_url(page.previous_cursor),
+            'approximate_count': None if any(self.request.GET.get(field) for field in IP_FILTERS)
+                                 else approximate_alert_count(self.request.GET.get('priority')),
+        })
+        return context
+
+    def _page_url(self, cursor):
+        if cursor is None:
+            return None
+        params = self.request.GET.copy()
+        params['cursor'] = cursor
+        return f"?{params.urlencode()}"
 
 class RuleManagementView(LoginRequiredMixin, ListView):
     model = SnortRule
     template_name = 'network_monitor/rule_management.html'
     context_object_name = 'rules'
+    paginate_by = 50
+
+    def get_queryset(self):
+        return filter_rules(super().get_queryset(), self.request.GET)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        params = self.request.GET.copy()
+        params.pop('page', None)
+        context['filter_query'] = params.urlencode()
+        return context
 
     def post(self, request):
         action = request.POST.get('action')
-        rule_manager = SnortRuleManager()
+        job = None
         
         if action == 'add':
-            content = request.POST.get('rule_content')
-            success = rule_manager.add_rule(content)
-            if success:
-                SnortRule.objects.create(rule_content=content)
-        
+            content = request.POST.get('rule_content', '')
+            try:
+                parse_rule(content)
+            except RuleSyntaxError as e:
+                messages.error(request, f"Rule not added: {e}")
+                return redirect('rules')
+            job = get_runner().submit('rules.add', 'snort', rule_content=content)
+
         elif action == 'delete':
             rule_id = request.POST.get('rule_id')
             rule = SnortRule.objects.get(id=rule_id)
-            success = rule_manager.remove_rule(rule.rule_content)
-            if success:
-                rule.delete()
-                
+            job = get_runner().submit('rules.remove', 'snort', rule_content=rule.rule_content)
+
+        if job is not None:
+            messages.info(request, f"Applying rule change as job {job.pk}")
         return redirect('rules')
 
+def filter_alerts_by_date(queryset, params):
+    """Filter on ?start_date= and ?end_date=, raising ValueError if either isn't a date"""
+    start_date = parse_date_param(params, 'start_date')
+    end_date = parse_date_param(params, 'end_date')
+
+    if start_date:
+        queryset = queryset.filter(timestamp__gte=start_date)
+    if end_date:
+        queryset = queryset.filter(timestamp__lte=end_date)
+
+    return queryset
+
+def parse_date_param(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValueError(f"{name} must be an ISO 8601 date or datetime, not {value!r}")
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
 class InterfaceViewSet(ModelViewSet):
     queryset = NetworkInterface.objects.all()
-    serializer_class = InterfaceSerializer
+    serializer_class = NetworkInterfaceSerializer
 
-class AlertViewSet(ModelViewSet):
-    queryset = SnortAlert.objects.all()
-    serializer_class = AlertSerializer
+class ControlJobViewSet(ReadOnlyModelViewSet):
+    """Status and progress of queued bridge and Snort control jobs"""
+    queryset = ControlJob.objects.order_by('-created_at')
+    serializer_class = ControlJobSerializer
 
     def get_queryset(self):
         queryset = super().get_queryset()
-        start_date = self.request.query_params.get('start_date', None)
-        end_date = self.request.query_params.get('end_date', None)
-        
-        if start_date:
-            queryset = queryset.filter(timestamp__gte=start_date)
-        if end_date:
-            queryset = queryset.filter(timestamp__lte=end_date)
-            
-        return queryset.order_by('-timestamp')
+        status = self.request.query_params.get('status')
+        if status:
+            queryset = queryset.filter(status=status)
+        return queryset[:100] if self.action == 'list' else queryset
+
+class AlertViewSet(ReadOnlyModelViewSet):
+    """Alerts are written only by snort_monitor, so the API is read-only"""
+    queryset = SnortAlert.objects.all()
+    serializer_class = SnortAlertSerializer
+    pagination_class = AlertCursorPagination
+
+    def get_queryset(self):
+        try:
+            queryset = filter_alerts_by_date(super().get_queryset(), self.request.query_params)
+        except ValueError as e:
+            raise ValidationError({'detail': str(e)})
+        try:
+            queryset = filter_alerts_by_ip(queryset, self.request.query_params)
+        except ValueError as e:
+            raise ValidationError({'detail': f"Invalid address filter: {e}"})
+        return queryset.order_by('-timestamp', '-id')
+
+    @action(detail=True)
+    def payload(self, request, pk=None):
+        """Packet data for one alert, decompressed only when asked for"""
+        alert = self.get_object()
+        payload = alert.payload
+        return Response({
+            'id': alert.id,
+            'digest': alert.payload_id,
+            'size': payload.size if payload else 0,
+            'packet_data': payload.text() if payload else None,
+        })
 
+    def approximate_count(self):
+        # The rollup table has no addresses, so it can't count an IP filter
+        params = self.request.query_params
+        if any(params.get(field) for field in IP_FILTERS):
+            return None
+        return approximate_alert_count(start=params.get('start_date'), end=params.get('end_date'))
+
+@login_required
 def bridge_status_api(request):
     status = get_bridge_status()
     return JsonResponse(status)
 
+@login_required
 def toggle_bridge_api(request):
     if request.method == 'POST':
         action = request.POST.get('action')
@@ -125,16 +249,217 @@ def toggle_bridge_api(request):
             return JsonResponse({
                 'error': 'No bridge configuration found'
             }, status=400)
+        if action not in ('create', 'delete'):
+            return JsonResponse({'error': 'Action must be create or delete'}, status=400)
             
-        success = manage_bridge(
-            action,
-            interfaces=bridge_config.interfaces.all()
+        job = get_runner().submit(
+            f"bridge.{action}", bridge_target('br0'), bridge_name='br0',
+            interfaces=[iface.name for iface in bridge_config.interfaces.all()],
+            config_id=bridge_config.pk,
         )
         
         return JsonResponse({
-            'success': success,
+            'job_id': job.pk,
+            'status_url': job_status_url(job),
             'status': get_bridge_status()
-        })
+        }, status=202)
+
+def job_status_url(job):
+    return reverse('controljob-detail', args=[job.pk])
 
+@login_required
+def telemetry_api(request):
+    """Per-interface byte, packet, drop and error rates at 1s, 1m or 1h resolution"""
+    resolution = request.GET.get('resolution', '1s')
+    if resolution not in RESOLUTIONS:
+        return JsonResponse({
+            'error': f"Unknown resolution, expected one of {', '.join(RESOLUTIONS)}"
+        }, status=400)
+    telemetry = telemetry_points(resolution, request.GET.get('interface'))
+    if telemetry is None:
+        return JsonResponse({
+            'error': 'No interface telemetry has been recorded; is sample_telemetry running?'
+        }, status=503)
+    interval, interfaces = telemetry
+    return JsonResponse({
+        'resolution': resolution,
+        'interval': interval,
+        'interfaces': interfaces,
+    })
+
+@login_required
 def alert_stats_api(request):
-    return JsonResponse(get_snort_stats())
\ No newline at end of file
+    return JsonResponse(get_snort_stats())
+
+class NoisyRulesView(LoginRequiredMixin, TemplateView):
+    template_name = 'network_monitor/noisy_rules.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        minutes = noisy_rules_window(self.request.GET)
+        context.update({
+            'minutes': minutes,
+            'noisy_rules': top_noisy_rules(minutes),
+        })
+        return context
+
+def noisy_rules_window(params):
+    """Window in minutes from ?minutes=, between one minute and a week"""
+    try:
+        minutes = int(params.get('minutes', 60))
+    except ValueError:
+        minutes = 60
+    return min(max(minutes, 1), 7 * 24 * 60)
+
+@login_required
+def noisy_rules_api(request):
+    try:
+        limit = min(max(int(request.GET.get('limit', 20)), 1), 500)
+    except ValueError:
+        limit = 20
+    minutes = noisy_rules_window(request.GET)
+    return JsonResponse({'minutes': minutes, 'rules': top_noisy_rules(minutes, limit)})
+
+@login_required
+def top_talkers_api(request):
+    """Top source IPs, destination IPs, pairs or classifications over the last minutes.
+
+    Answered from the ingest sketches; ?exact=1 counts from the alert
+    table instead, to check the estimates.
+    """
+    by = request.GET.get('by', 'source_ip')
+    if by not in TALKER_DIMENSIONS:
+        return JsonResponse({
+            'error': f"Unknown dimension, expected one of {', '.join(TALKER_DIMENSIONS)}"
+        }, status=400)
+    try:
+        minutes = min(max(int(request.GET.get('minutes', 15)), 1), window_minutes())
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 100)
+        priority = int(request.GET['priority']) if request.GET.get('priority') else None
+    except ValueError:
+        return JsonResponse({'error': 'minutes, limit and priority must be integers'}, status=400)
+    exact = bool(request.GET.get('exact'))
+    query = exact_top_talkers if exact else top_talkers
+    return JsonResponse({
+        'by': by,
+        'minutes': minutes,
+        'priority': priority,
+        'exact': exact,
+        'results': query(by, minutes, priority, limit),
+    })
+
+@login_required
+def alert_export_api(request):
+    """Stream alerts as NDJSON, CSV, Arrow or Parquet without loading them into memory.
+
+    ?payload=0 leaves packet data out and skips reading the payload table.
+    """
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({
+            'error': f"Unknown format, expected one of {', '.join(EXPORT_FORMATS)}"
+        }, status=400)
+    if export_format in COLUMNAR_FORMATS and pyarrow is None:
+        return JsonResponse({
+            'error': f"{export_format} export requires pyarrow"
+        }, status=501)
+
+    generate, content_type, extension, compressible = EXPORT_FORMATS[export_format]
+    try:
+        queryset = filter_alerts_by_date(SnortAlert.objects.all(), request.GET)
+    except ValueError as e:
+        # Checked here: once streaming starts, an error can only cut the response short
+        return JsonResponse({'error': str(e)}, status=400)
+    payloads = request.GET.get('payload', '1') != '0'
+    chunks = generate(alert_rows(queryset.order_by('timestamp', 'id'), payloads=payloads))
+
+    gzip = compressible and accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    response = StreamingHttpResponse(gzip_chunks(chunks) if gzip else chunks,
+                                     content_type=content_type)
+    if gzip:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    response['Content-Disposition'] = f'attachment; filename="alerts.{extension}"'
+    return response
+
+@login_required
+def alert_archive_api(request):
+    """Archived alert days, oldest first"""
+    archives = AlertArchive.objects.order_by('day', 'id')
+    return JsonResponse({'archives': [
+        {
+            'id': archive.id,
+            'day': archive.day,
+            'format': archive.format,
+            'rows': archive.rows,
+            'size': archive.size,
+            'url': reverse('alert_archive_detail', args=[archive.id]),
+        }
+        for archive in archives
+    ]})
+
+def archive_missing(archive):
+    return JsonResponse({'error': f"The archive for {archive.day} is no longer on disk"},
+                        status=410)
+
+@login_required
+def alert_archive_detail_api(request, pk):
+    """Query an archived day by exact field values, or download it with ?download=1"""
+    archive = get_object_or_404(AlertArchive, pk=pk)
+    if request.GET.get('download'):
+        try:
+            f = open(archive.path, 'rb')
+        except FileNotFoundError:
+            return archive_missing(archive)
+        return FileResponse(f, as_attachment=True, filename=os.path.basename(archive.path))
+    try:
+        limit = min(max(int(request.GET.get('limit', 100)), 1), 1000)
+        alerts = query_archive(archive, request.GET, limit)
+    except ArchiveMissingError:
+        return archive_missing(archive)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except RuntimeError as e:
+        return JsonResponse({'error': str(e)}, status=501)
+    return JsonResponse({'day': archive.day, 'alerts': alerts})
+
+@login_required
+async def alert_stream(request):
+    """Server-Sent Events stream of new alerts and stat deltas.
+
+    Needs an ASGI server (riotdtp.asgi); under WSGI the response would
+    never finish.
+    """
+    broker = get_broker()
+    subscription = broker.subscribe()
+
+    async def events():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ': keepalive\n\n'
+                    continue
+                data = json.dumps(event, cls=DjangoJSONEncoder)
+                yield f"event: {event['type']}\ndata: {data}\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@login_required
+def alert_stream_metrics_api(request):
+    return JsonResponse(get_broker().metrics())
+
+@login_required
+def ingest_metrics_api(request):
+    """Queue depth, shedding, spill volume and lag of snort_monitor's writer"""
+    metrics = ingest_metrics()
+    if metrics is None:
+        return JsonResponse({'error': 'snort_monitor is not publishing ingest metrics'}, status=503)
+    return JsonResponse(metrics)
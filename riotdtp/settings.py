@@ -79,7 +79,30 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # snort_monitor writes alerts through this second connection to the
+    # same file; IMMEDIATE transactions take the write lock up front
+    'writer': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['network_monitor.dbconfig.AlertWriterRouter']
+
+# Applied to every SQLite connection when it opens. WAL lets page renders
+# read while snort_monitor writes; busy_timeout is in milliseconds
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 268435456,
 }
 
 
@@ -123,3 +146,63 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Snort monitor
+
+# Where snort_monitor persists its read position in each alert file
+SNORT_MONITOR_STATE_DIR = BASE_DIR / 'var'
+
+# Each ASGI worker binds a socket here to receive live alerts from snort_monitor
+SNORT_PUSH_SOCKET_DIR = BASE_DIR / 'var' / 'push'
+
+# Dashboard statistics are cached briefly and invalidated by snort_monitor
+# whenever it ingests alerts, so the cache must be shared between processes
+SNORT_STATS_CACHE_TTL = 5
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'var' / 'cache',
+    }
+}
+
+# prune_alerts keeps this many days of alerts in the database and moves
+# older days to compressed files in SNORT_ARCHIVE_DIR
+SNORT_ALERT_RETENTION_DAYS = 30
+SNORT_ARCHIVE_DIR = BASE_DIR / 'var' / 'archive'
+# Alerts deleted per writer transaction, so pruning never blocks ingest for long
+SNORT_PRUNE_BATCH_SIZE = 5000
+
+# Top talker sketches: counters per one-minute pane, and minutes of panes kept
+SNORT_TALKER_CAPACITY = 256
+SNORT_TALKER_WINDOW_MINUTES = 60
+
+# snort_monitor folds alerts repeating these fields within the window (in
+# seconds) into one row with a count; 0 stores every alert as its own row
+SNORT_COALESCE_FIELDS = ('message', 'source_ip', 'destination_ip')
+SNORT_COALESCE_WINDOW = 60
+SNORT_COALESCE_MAX_OPEN = 10000
+
+# snort_monitor hands parsed alerts to its database writer through a queue
+# of this many alerts. Past SNORT_INGEST_HIGH_WATER (a fraction of it),
+# priority 2+ alerts are blocked on, sampled or spilled to a journal under
+# SNORT_MONITOR_STATE_DIR for replay; priority 1 alerts are never shed
+SNORT_INGEST_QUEUE_SIZE = 50000
+SNORT_INGEST_HIGH_WATER = 0.8
+SNORT_INGEST_OVERLOAD_POLICY = 'spill'
+SNORT_INGEST_SAMPLE_RATE = 0.1
+
+# The API needs the same login as the pages that use it
+REST_FRAMEWORK = {
+    'DEFAULT_PERMISSION_CLASSES': [
+        'rest_framework.permissions.IsAuthenticated',
+    ],
+}
+
+# Pid file Snort writes once initialised (--create-pidfile), used to time
+# how long a rule reload interrupts inspection; None leaves it unmeasured
+SNORT_PID_FILE = None
+
+# Seconds between interface counter samples taken by sample_telemetry, which
+# publishes them through the shared cache for the dashboard
+SNORT_TELEMETRY_INTERVAL = 1.0
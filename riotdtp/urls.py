@@ -15,14 +15,38 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import include, path
+from rest_framework.routers import DefaultRouter
+from network_monitor.views import (
+    DashboardView, BridgeConfigView, AlertListView, RuleManagementView,
+    InterfaceViewSet, AlertViewSet, ControlJobViewSet, bridge_status_api, toggle_bridge_api,
+    alert_stats_api, telemetry_api, top_talkers_api,
+    alert_export_api, alert_archive_api, alert_archive_detail_api, alert_stream,
+    alert_stream_metrics_api, ingest_metrics_api, NoisyRulesView, noisy_rules_api,
+)
+
+router = DefaultRouter()
+router.register('interfaces', InterfaceViewSet)
+router.register('alerts', AlertViewSet)
+router.register('jobs', ControlJobViewSet)
 
 urlpatterns = [
     path('', DashboardView.as_view(), name='dashboard'),
     path('bridge/', BridgeConfigView.as_view(), name='bridge_config'),
     path('alerts/', AlertListView.as_view(), name='alerts'),
     path('rules/', RuleManagementView.as_view(), name='rules'),
+    path('rules/noisy/', NoisyRulesView.as_view(), name='noisy_rules'),
     path('api/bridge/status/', bridge_status_api, name='bridge_status'),
     path('api/bridge/toggle/', toggle_bridge_api, name='toggle_bridge'),
+    path('api/bridge/telemetry/', telemetry_api, name='telemetry'),
     path('api/alerts/stats/', alert_stats_api, name='alert_stats'),
+    path('api/alerts/top/', top_talkers_api, name='top_talkers'),
+    path('api/alerts/export/', alert_export_api, name='alert_export'),
+    path('api/alerts/archive/', alert_archive_api, name='alert_archive'),
+    path('api/alerts/archive/<int:pk>/', alert_archive_detail_api, name='alert_archive_detail'),
+    path('api/alerts/stream/', alert_stream, name='alert_stream'),
+    path('api/alerts/stream/metrics/', alert_stream_metrics_api, name='alert_stream_metrics'),
+    path('api/alerts/ingest/metrics/', ingest_metrics_api, name='ingest_metrics'),
+    path('api/rules/noisy/', noisy_rules_api, name='noisy_rules_api'),
+    path('api/', include(router.urls)),
 ]